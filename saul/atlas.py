@@ -0,0 +1,191 @@
+import threading
+import time
+
+from loguru import logger
+from model import CivilAtomizedCase, CriminalAtomizedCase
+from store import OutputStore
+
+CRIMINAL_FIELDS = list(CriminalAtomizedCase.model_fields)
+CIVIL_FIELDS = list(CivilAtomizedCase.model_fields)
+GROUP_FIELDS = ["case_type", *CRIMINAL_FIELDS, *CIVIL_FIELDS]
+
+# Version checks are cheap but not free; queries within this window reuse the last one.
+REFRESH_INTERVAL = 2.0
+
+
+def bucket_label(field: str, value) -> str:
+    """Group label for a single value; mirrors the buckets the Case Atlas has always shown."""
+    if value is None:
+        return "N/A"
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if field == "victim_count":
+        if value == 0:
+            return "0 victims"
+        if value == 1:
+            return "1 victim"
+        return "2-5 victims" if value <= 5 else "6+ victims"
+    if field == "proximate_causation_score":
+        if value <= 0.25:
+            return "Low (0-25%)"
+        if value <= 0.5:
+            return "Medium (26-50%)"
+        return "High (51-75%)" if value <= 0.75 else "Very High (76-100%)"
+    if field == "damages_claimed":
+        if value < 10_000:
+            return "Under $10K"
+        if value < 100_000:
+            return "$10K - $100K"
+        return "$100K - $1M" if value < 1_000_000 else "Over $1M"
+    return str(value)
+
+
+def _labels(field: str, value) -> tuple[str, ...]:
+    # A case without a usable value is left out of groupings on that field.
+    if value is None:
+        return ()
+    if isinstance(value, list):
+        return tuple(dict.fromkeys(bucket_label(field, item) for item in value))
+    if isinstance(value, str) and not value.strip():
+        return ()
+    return (bucket_label(field, value),)
+
+
+def _field_value(record: dict, field: str):
+    if field == "case_type":
+        return record.get("case_type") or "Unknown"
+    for section in ("criminal", "civil"):
+        data = record.get(section)
+        if data and field in data:
+            return data[field]
+    return None
+
+
+def _sort_labels(labels) -> list[str]:
+    return sorted(labels, key=lambda label: (label == "N/A", label.casefold()))
+
+
+class AtlasIndex:
+    """In-memory, column-oriented index over stage 2 outputs.
+
+    Outputs are parsed once and re-read only when their update time changes.
+    Each group-able field is kept as a column of typed values plus a column of
+    precomputed bucket labels, so filtering and grouping never touch the store.
+    Queries run in worker threads, one at a time, so a refresh never swaps the
+    columns under another query.
+    """
+
+    def __init__(self, store: OutputStore):
+        self.store = store
+        self._files: dict[str, tuple[int, dict]] = {}
+        self._refreshed_at = 0.0
+        self.filenames: list[str] = []
+        self.records: list[dict] = []
+        self.values: dict[str, list] = {}
+        self.labels: dict[str, list[tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._refreshed_at = 0.0
+
+    def refresh(self) -> None:
+        if time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        self._refreshed_at = time.monotonic()
+
+        changed = False
+        versions = self.store.versions(2)
+        for filename, updated_at in versions.items():
+            cached = self._files.get(filename)
+            if cached and cached[0] == updated_at:
+                continue
+            try:
+                data = self.store.get_atomized(filename)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable stage 2 output {filename}: {e}")
+                continue
+            if data is None:
+                continue
+            self._files[filename] = (updated_at, {"filename": filename, **data})
+            changed = True
+
+        for filename in set(self._files) - versions.keys():
+            del self._files[filename]
+            changed = True
+
+        if changed:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.records = sorted(
+            (record for _, record in self._files.values()),
+            key=lambda record: record["filename"],
+        )
+        self.filenames = [record["filename"] for record in self.records]
+        self.values = {
+            field: [_field_value(record, field) for record in self.records]
+            for field in GROUP_FIELDS
+        }
+        self.labels = {
+            field: [_labels(field, value) for value in column]
+            for field, column in self.values.items()
+        }
+
+    def _matching_rows(
+        self, case_type: str | None, filters: dict[str, str], required: list[str]
+    ) -> list[int]:
+        rows = range(len(self.records))
+        if case_type:
+            column = self.values["case_type"]
+            rows = [row for row in rows if column[row] == case_type]
+        for field, label in filters.items():
+            column = self.labels[field]
+            rows = [row for row in rows if label in column[row]]
+        for field in required:
+            column = self.labels[field]
+            rows = [row for row in rows if column[row]]
+        return list(rows)
+
+    def query(
+        self,
+        case_type: str | None = None,
+        filters: dict[str, str] | None = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> tuple[int, list[dict]]:
+        with self._lock:
+            self.refresh()
+            rows = self._matching_rows(case_type, filters or {}, [])
+            return len(rows), [self.records[row] for row in rows[offset : offset + limit]]
+
+    def groups(
+        self,
+        group_by: list[str],
+        case_type: str | None = None,
+        filters: dict[str, str] | None = None,
+    ) -> list[dict]:
+        """Nested group counts for `group_by`; cases lacking a value for any level are excluded."""
+        with self._lock:
+            self.refresh()
+            rows = self._matching_rows(case_type, filters or {}, group_by)
+            labels = self.labels
+
+        def build(rows: list[int], level: int) -> list[dict]:
+            if level >= len(group_by):
+                return []
+            column = labels[group_by[level]]
+            members: dict[str, list[int]] = {}
+            for row in rows:
+                for label in column[row]:
+                    members.setdefault(label, []).append(row)
+            return [
+                {
+                    "field": group_by[level],
+                    "label": label,
+                    "count": len(members[label]),
+                    "groups": build(members[label], level + 1),
+                }
+                for label in _sort_labels(members)
+            ]
+
+        return build(rows, 0)
@@ -0,0 +1,205 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import AsyncGenerator, Awaitable, Callable, Iterable, Literal, TypeVar
+
+from llm import LLM_PROVIDER
+from providers import ollama_capacity
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Workers per provider when neither the caller nor BATCH_CONCURRENCY sets one.
+# Each Ollama host only runs OLLAMA_NUM_PARALLEL requests at once, so Ollama
+# gets one worker per request slot across OLLAMA_HOSTS, while the remote
+# providers spend most of each case waiting on the network.
+DEFAULT_CONCURRENCY = {"openrouter": 4, "openai": 8}
+
+
+def default_concurrency(provider: str = LLM_PROVIDER) -> int:
+    override = os.getenv("BATCH_CONCURRENCY", "").strip()
+    if override:
+        return max(1, int(override))
+    if provider == "ollama":
+        return ollama_capacity()
+    return DEFAULT_CONCURRENCY.get(provider, 1)
+
+
+@dataclass
+class BatchEvent:
+    status: Literal["started", "processed", "skipped", "error"]
+    name: str
+    detail: str = ""
+    stage: int | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != "started"
+
+    def message(self) -> str:
+        prefix = f"[stage {self.stage}] " if self.stage else ""
+        if self.status == "started":
+            return f"{prefix}Processing {self.name}..."
+        if self.status == "processed":
+            return f"{prefix}Completed {self.name}"
+        if self.status == "skipped":
+            return f"{prefix}Skipped {self.name} ({self.detail})"
+        return f"{prefix}Error processing {self.name}: {self.detail}"
+
+
+@dataclass
+class BatchStats:
+    processed: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+    def record(self, event: BatchEvent) -> None:
+        if event.status == "processed":
+            self.processed += 1
+        elif event.status == "skipped":
+            self.skipped += 1
+        elif event.status == "error":
+            self.errors += 1
+
+    def counts(self) -> str:
+        return (
+            f"Processed: {self.processed}, Skipped: {self.skipped}, "
+            f"Errors: {self.errors}"
+        )
+
+    def summary(self) -> str:
+        return f"Done. {self.counts()}"
+
+
+def sse(message: str) -> str:
+    return f"data: {message}\n\n"
+
+
+async def run_batch(
+    items: Iterable[T],
+    process: Callable[[T], Awaitable[object]],
+    skip_reason: Callable[[T], Awaitable[str | None]] | None = None,
+    concurrency: int | None = None,
+    name: Callable[[T], str] = lambda item: item.name,
+) -> AsyncGenerator[BatchEvent, None]:
+    """Run `process` over `items` with a bounded worker pool, yielding events as they happen.
+
+    `skip_reason` is async so implementations can check the store off the event loop.
+    """
+    concurrency = max(1, concurrency or default_concurrency())
+    events: asyncio.Queue[BatchEvent | None] = asyncio.Queue()
+    pending = iter(items)
+
+    async def worker() -> None:
+        # Workers share one iterator, so each item is handed out exactly once.
+        for item in pending:
+            label = name(item)
+            try:
+                reason = await skip_reason(item) if skip_reason else None
+                if reason:
+                    await events.put(BatchEvent("skipped", label, reason))
+                    continue
+                await events.put(BatchEvent("started", label))
+                await process(item)
+            except Exception as e:
+                await events.put(BatchEvent("error", label, str(e)))
+            else:
+                await events.put(BatchEvent("processed", label))
+
+    async def supervise() -> None:
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            events.put_nowait(None)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        # The consumer went away (e.g. the browser closed the SSE stream).
+        supervisor.cancel()
+
+
+async def run_pipeline(
+    items: Iterable[T],
+    stage1: Callable[[T], Awaitable[R]],
+    stage2: Callable[[T, R], Awaitable[object]],
+    stage1_skip_reason: Callable[[T], Awaitable[str | None]],
+    stage1_load: Callable[[T], Awaitable[R]],
+    stage2_skip_reason: Callable[[T], Awaitable[str | None]],
+    concurrency: int | None = None,
+    name: Callable[[T], str] = lambda item: item.name,
+) -> AsyncGenerator[BatchEvent, None]:
+    """Run stage 1 and stage 2 concurrently, handing each stage 1 result straight to stage 2.
+
+    Every item produces exactly one terminal event per stage, so progress can be
+    tracked against 2 * len(items).
+    """
+    concurrency = max(1, concurrency or default_concurrency())
+    events: asyncio.Queue[BatchEvent | None] = asyncio.Queue()
+    # Bounded so a fast stage 1 cannot run arbitrarily far ahead of stage 2.
+    handoff: asyncio.Queue[tuple[T, R] | None] = asyncio.Queue(maxsize=concurrency * 2)
+    pending = iter(items)
+
+    async def emit(status, label: str, stage: int, detail: str = "") -> None:
+        await events.put(BatchEvent(status, label, detail, stage))
+
+    async def stage1_worker() -> None:
+        for item in pending:
+            label = name(item)
+            result = None
+            try:
+                reason = await stage1_skip_reason(item)
+                if not reason:
+                    await emit("started", label, 1)
+                    result = await stage1(item)
+            except Exception as e:
+                await emit("error", label, 1, str(e))
+                await emit("skipped", label, 2, "stage 1 failed")
+                continue
+            await emit("skipped" if reason else "processed", label, 1, reason or "")
+
+            # Stage 1 has had its terminal event; failures from here on are stage 2's.
+            try:
+                reason2 = await stage2_skip_reason(item)
+                if not reason2 and reason:
+                    result = await stage1_load(item)
+            except Exception as e:
+                await emit("error", label, 2, str(e))
+                continue
+            if reason2:
+                await emit("skipped", label, 2, reason2)
+            else:
+                await handoff.put((item, result))
+
+    async def stage2_worker() -> None:
+        while (job := await handoff.get()) is not None:
+            item, result = job
+            label = name(item)
+            await emit("started", label, 2)
+            try:
+                await stage2(item, result)
+            except Exception as e:
+                await emit("error", label, 2, str(e))
+            else:
+                await emit("processed", label, 2)
+
+    async def supervise() -> None:
+        consumers = [asyncio.create_task(stage2_worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*(stage1_worker() for _ in range(concurrency)))
+            for _ in consumers:
+                await handoff.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            events.put_nowait(None)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        supervisor.cancel()
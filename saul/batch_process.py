@@ -1,87 +1,118 @@
 import asyncio
 import sys
+from itertools import islice
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent))
 
-from llm import get_case_analysis_stream
+from batch import BatchStats, run_batch, run_pipeline
+from config import CORPUS, DATA_DIR
+from ingest import CaseDocument, Corpus
+from llm import PIPELINE_MODE, analyze_case, analyze_case_fused, atomize_analysis
+from model import Analysis, AtomizedCaseOutput
+from providers import close_providers
+from store import output_store
 from tqdm import tqdm
 
-# Data directories
-# File is in Project/saul/saul/batch_process.py
-# parent -> Project/saul/saul
-# parent.parent -> Project/saul (Project Root)
-BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data" / "1"
-JSON_DIR = DATA_DIR / "json"
-OUTPUT_STAGE1_DIR = DATA_DIR / "output_stage1"
+# The corpus is chosen with the CORPUS env var (default "1", i.e. data/1/)
+corpus = Corpus(CORPUS, DATA_DIR)
 
 
-async def process_case(json_file: Path):
+async def process_case(json_file: CaseDocument) -> Analysis:
     """
     Process a single case file: read JSON, extract text, run analysis, save output.
     """
-    filename = json_file.name
-    output_file = OUTPUT_STAGE1_DIR / filename
+    return await analyze_case(json_file, json_file.name)
 
-    try:
-        stream = await get_case_analysis_stream(
-            json_file, output_file, skip_if_exists=True
-        )
-        if stream is None:
-            return "skipped"
 
-        async for _ in stream:
-            pass
+async def process_case_pipelined(
+    json_file: CaseDocument,
+) -> tuple[Analysis, AtomizedCaseOutput | None]:
+    """Stage 1 for the pipeline; in fused mode the same call also yields stage 2."""
+    if PIPELINE_MODE == "fused":
+        return await analyze_case_fused(json_file, json_file.name)
+    return await analyze_case(json_file, json_file.name), None
 
-        return "processed"
 
-    except Exception as e:
-        print(f"Error processing {filename}: {e}")
-        return "error"
+async def atomize_case(
+    json_file: CaseDocument, result: tuple[Analysis, AtomizedCaseOutput | None]
+):
+    analysis, atomized = result
+    await atomize_analysis(analysis, output_name=json_file.name, atomized=atomized)
 
 
-async def main(limit: int | None = None):
-    # Ensure output directory exists
-    OUTPUT_STAGE1_DIR.mkdir(parents=True, exist_ok=True)
+async def skip_reason(json_file: CaseDocument) -> str | None:
+    if await asyncio.to_thread(output_store.exists, 1, json_file.name):
+        return "already processed"
+    return None
 
-    json_files = sorted(list(JSON_DIR.glob("*.json")))
 
-    if not json_files:
-        print(f"No JSON files found in {JSON_DIR}")
-        return
+async def load_stage1(json_file: CaseDocument) -> tuple[Analysis, None]:
+    return await asyncio.to_thread(output_store.get_analysis, json_file.name), None
 
-    print(f"Found {len(json_files)} cases.")
 
-    # Apply limit
-    to_process = json_files
-    if limit:
-        to_process = json_files[:limit]
+async def stage2_skip_reason(json_file: CaseDocument) -> str | None:
+    if await asyncio.to_thread(output_store.exists, 2, json_file.name):
+        return "already processed"
+    return None
 
-    processed_count = 0
-    skipped_count = 0
-    error_count = 0
 
-    pbar = tqdm(to_process, desc="Processing cases")
-    for json_file in pbar:
-        status = await process_case(json_file)
-        if status == "processed":
-            processed_count += 1
-        elif status == "skipped":
-            skipped_count += 1
-        else:
-            error_count += 1
+async def main(
+    limit: int | None = None, concurrency: int | None = None, pipeline: bool = False
+):
+    total = len(corpus)
 
+    if not total:
+        print(f"No cases found in {corpus.directory}")
+        return
+
+    print(f"Found {total} cases.")
+
+    # Apply limit; cases are streamed from the corpus as workers take them
+    count = min(limit, total) if limit else total
+    to_process = islice(corpus.iter_cases(), count)
+
+    if pipeline:
+        events = run_pipeline(
+            to_process,
+            process_case_pipelined,
+            atomize_case,
+            skip_reason,
+            load_stage1,
+            stage2_skip_reason,
+            concurrency=concurrency,
+        )
+    else:
+        events = run_batch(to_process, process_case, skip_reason, concurrency=concurrency)
+
+    stats = {1: BatchStats(), 2: BatchStats()}
+    pbar = tqdm(total=count * (2 if pipeline else 1), desc="Processing cases")
+    async for event in events:
+        if not event.done:
+            continue
+        if event.status == "error":
+            pbar.write(event.message())
+        stats[event.stage or 1].record(event)
+        pbar.update(1)
         pbar.set_postfix(
-            {"new": processed_count, "skip": skipped_count, "err": error_count}
+            {
+                "new": stats[1].processed,
+                "skip": stats[1].skipped,
+                "err": stats[1].errors,
+                **({"s2_new": stats[2].processed, "s2_err": stats[2].errors} if pipeline else {}),
+            }
         )
+    pbar.close()
+    await close_providers()
 
-    print(
-        f"\nDone. Processed: {processed_count}, Skipped: {skipped_count}, Errors: {error_count}"
-    )
+    print(f"\nDone. Processed: {stats[1].processed}, Skipped: {stats[1].skipped}, Errors: {stats[1].errors}")
+    if pipeline:
+        print(f"Stage 2: {stats[2].counts()}")
 
 
 if __name__ == "__main__":
     # Configure run here
     LIMIT = None  # Set to None for all
-    asyncio.run(main(limit=LIMIT))
+    CONCURRENCY = None  # None uses the provider default
+    PIPELINE = False  # Also run stage 2 on each case as soon as stage 1 finishes
+    asyncio.run(main(limit=LIMIT, concurrency=CONCURRENCY, pipeline=PIPELINE))
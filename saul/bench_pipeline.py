@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DESCRIPTION = """
+Offline pipeline benchmark: synthetic corpora of CAP-like cases, a mock LLM
+(mock_llm.py) with configurable latency, chunking and errors, and the real
+stage 1/2 code, batch endpoints and atlas endpoint in between. Each corpus
+size runs in fresh worker processes so peak RSS is per run; compare the JSON
+report across commits to spot regressions.
+"""
+
+SAUL_DIR = Path(__file__).resolve().parent
+BASE_DIR = SAUL_DIR.parent
+CORPUS_FILE = "cases.jsonl"
+
+WORDS = [
+    "the", "defendant", "plaintiff", "court", "trial", "appeal", "evidence",
+    "warrant", "search", "vehicle", "consent", "contract", "lease", "injury",
+    "officer", "witness", "statement", "property", "damages", "payment",
+    "employer", "driver", "weapon", "tenant", "notice", "loan", "jury", "held",
+    "that", "was", "not", "and", "of", "to", "in", "a", "because", "under",
+]
+COURTS = [
+    "Supreme Court of California",
+    "California Court of Appeal",
+    "United States District Court",
+    "Superior Court",
+]
+
+
+def write_corpus(path: Path, size: int, opinion_chars: int, seed: int = 0) -> None:
+    """Write `size` CAP-shaped case records as one JSONL file."""
+    rng = random.Random(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for case_id in range(1, size + 1):
+            words = rng.choices(WORDS, k=opinion_chars // 6)
+            paragraphs = [" ".join(words[i : i + 60]) + "." for i in range(0, len(words), 60)]
+            record = {
+                "id": case_id,
+                "name_abbreviation": f"People v. Case {case_id}",
+                "decision_date": f"{rng.randint(1950, 2020)}-01-01",
+                "court": {"name": rng.choice(COURTS)},
+                "casebody": {
+                    "opinions": [{"type": "majority", "text": "\n".join(paragraphs)}]
+                },
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summary(name: str, latencies: list[float], wall: float, errors: int = 0) -> dict:
+    return {
+        "scenario": name,
+        "cases": len(latencies),
+        "errors": errors,
+        "cases_per_second": len(latencies) / wall if wall else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 0.5),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# --- worker: runs inside a process whose env points the app at the mock ---
+
+
+async def _bounded(items, fn, concurrency: int) -> tuple[list[float], int, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(item) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await fn(item)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def bench_direct(sample: int, concurrency: int) -> list[dict]:
+    """get_case_analysis_stream and atomize_analysis called directly, nothing stored."""
+    from config import CORPUS, DATA_DIR
+    from ingest import Corpus
+    from llm import atomize_analysis, get_case_analysis_stream
+    from mock_llm import sample_instance
+    from model import Analysis
+
+    corpus = Corpus(CORPUS, DATA_DIR)
+    docs = [doc for doc, _ in zip(corpus.iter_cases(), range(sample))]
+
+    async def stage1(doc) -> None:
+        stream = await get_case_analysis_stream(doc)
+        async for _ in stream:
+            pass
+
+    rng = random.Random(0)
+    analyses = [
+        Analysis.model_validate(sample_instance(Analysis.model_json_schema(), rng))
+        for _ in docs
+    ]
+
+    results = []
+    latencies, errors, wall = await _bounded(docs, stage1, concurrency)
+    results.append(_summary("stage1_stream", latencies, wall, errors))
+    latencies, errors, wall = await _bounded(analyses, atomize_analysis, concurrency)
+    results.append(_summary("stage2_atomize", latencies, wall, errors))
+    return results
+
+
+async def bench_batch(client, path: str, body: dict) -> dict:
+    """Time one SSE batch endpoint; per-case latency is started -> completed."""
+    started: dict[str, float] = {}
+    latencies: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+    async with client.stream("POST", path, json=body, timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            message = line[len("data: ") :]
+            now = time.perf_counter()
+            if message.endswith("...") and "Processing " in message and not message.startswith("Found"):
+                started[message[: -len("...")].replace("Processing ", "")] = now
+            elif "Completed " in message:
+                key = message.replace("Completed ", "")
+                if key in started:
+                    latencies.append(now - started.pop(key))
+            elif "Error processing " in message:
+                errors += 1
+    return _summary(path.rsplit("/", 1)[-1], latencies, time.perf_counter() - start, errors)
+
+
+async def bench_atlas(client, requests: int) -> dict:
+    latencies: list[float] = []
+    start = time.perf_counter()
+    queries = [
+        ("/api/atlas/groups", {"group_by": ["case_type", "offense_severity"]}),
+        ("/api/atlas/cases", {"case_type": "criminal", "limit": 50}),
+        ("/api/atlas/cases", {"case_type": "civil", "offset": 50, "limit": 50}),
+    ]
+    for i in range(requests):
+        path, params = queries[i % len(queries)]
+        t = time.perf_counter()
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - t)
+    return {**_summary("atlas", latencies, time.perf_counter() - start), "requests": requests}
+
+
+async def worker(mode: str, size: int, sample: int, concurrency: int, atlas_requests: int) -> list[dict]:
+    import httpx
+    import uvicorn
+
+    from saul import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            body = {"concurrency": concurrency}
+            if mode == "pipeline":
+                results.append(await bench_batch(client, "/api/batch/run-pipeline", body))
+            else:
+                results.extend(await bench_direct(min(sample, size), concurrency))
+                results.append(await bench_batch(client, "/api/batch/run", body))
+                results.append(await bench_batch(client, "/api/batch/run-stage2", body))
+                results.append(await bench_atlas(client, atlas_requests))
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+# --- orchestrator ---
+
+
+def _run_worker(env: dict, args: list[str]) -> list[dict]:
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--worker", *args],
+        env=env,
+        cwd=BASE_DIR,  # saul.py serves static/ relative to the repo root
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(config: dict) -> None:
+    with tempfile.TemporaryDirectory(prefix="saul-bench-") as tmp:
+        corpora = Path(tmp)
+        mock_port = _free_port()
+        mock_env = {
+            **os.environ,
+            "MOCK_LLM_PORT": str(mock_port),
+            "MOCK_LLM_TTFT": str(config["ttft"]),
+            "MOCK_LLM_CHUNK_CHARS": str(config["chunk_chars"]),
+            "MOCK_LLM_CHUNK_DELAY": str(config["chunk_delay"]),
+            "MOCK_LLM_ERROR_RATE": str(config["error_rate"]),
+            "MOCK_LLM_MALFORMED_RATE": str(config["malformed_rate"]),
+        }
+        mock = subprocess.Popen([sys.executable, str(SAUL_DIR / "mock_llm.py")], env=mock_env)
+        mock_url = f"http://127.0.0.1:{mock_port}"
+        try:
+            _wait_for(mock_url)
+            report = []
+            for size in config["sizes"]:
+                source = corpora / f"source-{size}" / CORPUS_FILE
+                write_corpus(source, size, config["opinion_chars"])
+                for mode in ("staged", "pipeline"):
+                    corpus = f"{size}-{mode}"
+                    (corpora / corpus).mkdir()
+                    (corpora / corpus / CORPUS_FILE).symlink_to(source)
+                    env = {
+                        **os.environ,
+                        "CORPORA_DIR": str(corpora),
+                        "CORPUS": corpus,
+                        "LLM_PROVIDER": config["provider"],
+                        "OLLAMA_HOSTS": f"{mock_url}={config['concurrency']}",
+                        "OPENROUTER_URL": f"{mock_url}/v1/chat/completions",
+                        "OPENROUTER_RPM": "0",
+                        "OPENROUTER_MAX_CONCURRENCY": str(config["concurrency"]),
+                        "BATCH_CONCURRENCY": str(config["concurrency"]),
+                        "LLM_CACHE": "0",
+                        "EMBED_ON_SAVE": "0",
+                        "OUTPUT_STORE": "sqlite",
+                    }
+                    args = [
+                        mode,
+                        str(size),
+                        str(config["sample"]),
+                        str(config["concurrency"]),
+                        str(config["atlas_requests"]),
+                    ]
+                    for row in _run_worker(env, args):
+                        report.append({"size": size, **row})
+                        _print_row(report[-1])
+        finally:
+            mock.terminate()
+            mock.wait()
+
+    if config["output"]:
+        Path(config["output"]).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {config['output']}")
+
+
+def _wait_for(url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/api/tags", timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Mock LLM server did not start at {url}")
+
+
+def _print_row(row: dict) -> None:
+    print(
+        f"{row['size']:>7} {row['scenario']:<16} {row['cases']:>7} cases "
+        f"{row['errors']:>5} err {row['cases_per_second']:>9.1f}/s "
+        f"p50 {row['p50_ms']:>8.1f}ms p99 {row['p99_ms']:>8.1f}ms "
+        f"rss {row['peak_rss_mb']:>7.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--worker", nargs=5, metavar=("MODE", "SIZE", "SAMPLE", "CONCURRENCY", "ATLAS"))
+    args = parser.parse_args()
+    if args.worker:
+        mode, size, sample, concurrency, atlas_requests = args.worker
+        rows = asyncio.run(
+            worker(mode, int(size), int(sample), int(concurrency), int(atlas_requests))
+        )
+        print(json.dumps(rows))
+    else:
+        # Configure run here
+        main(
+            {
+                "sizes": [1_000, 10_000],  # up to 100_000; each size runs twice
+                "opinion_chars": 3_000,
+                "provider": "ollama",  # or "openrouter" (chat completions API)
+                "concurrency": 16,
+                "sample": 500,  # cases for the direct stage 1/2 scenarios
+                "atlas_requests": 300,
+                "ttft": 0.05,
+                "chunk_chars": 16,
+                "chunk_delay": 0.0,
+                "error_rate": 0.0,
+                "malformed_rate": 0.0,
+                "output": "bench_results.json",
+            }
+        )
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from cache import response_cache
+from chunking import estimate_tokens
+from config import CORPUS, DATA_DIR
+from ingest import CaseDocument, Corpus, read_opinions
+from llm import LLM_PROVIDER, analyze_opinion, build_full_opinion
+from model import Analysis
+from preprocess import STEPS, enabled_steps, preprocess_opinions
+from providers import close_providers
+from retrieval import fact_terms
+
+
+def fact_overlap(a: Analysis, b: Analysis) -> float:
+    """Jaccard overlap of the normalized fact terms of two analyses of one case.
+
+    Extraction is not fully deterministic even at temperature 0, so read this
+    against the overlap of two raw runs rather than against 1.0.
+    """
+    terms_a = {term for fact in a.facts for term in fact_terms(fact)}
+    terms_b = {term for fact in b.facts for term in fact_terms(fact)}
+    if not terms_a and not terms_b:
+        return 1.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+async def _timed(text: str) -> tuple[Analysis, float]:
+    start = time.perf_counter()
+    analysis = await analyze_opinion(text)
+    return analysis, time.perf_counter() - start
+
+
+async def bench_case(doc: CaseDocument, steps: tuple[str, ...], raw_first: bool) -> dict:
+    opinions = read_opinions(doc.read_text())
+    cleaned, stats = preprocess_opinions(opinions, steps)
+    raw_text = build_full_opinion({"casebody": {"opinions": opinions}})
+    clean_text = build_full_opinion({"casebody": {"opinions": cleaned}})
+
+    # Alternate which variant runs first so server-side warm-up and prompt
+    # prefix caching do not favour one of them.
+    if raw_first:
+        raw, raw_seconds = await _timed(raw_text)
+        clean, clean_seconds = await _timed(clean_text)
+    else:
+        clean, clean_seconds = await _timed(clean_text)
+        raw, raw_seconds = await _timed(raw_text)
+
+    return {
+        "name": doc.name,
+        "raw_tokens": estimate_tokens(raw_text),
+        "clean_tokens": estimate_tokens(clean_text),
+        "removed_by_step": dict(stats.removed),
+        "raw_seconds": raw_seconds,
+        "clean_seconds": clean_seconds,
+        "fact_overlap": fact_overlap(raw, clean),
+        "raw_facts": len(raw.facts),
+        "clean_facts": len(clean.facts),
+        "same_case_type": raw.case_type == clean.case_type,
+    }
+
+
+async def main(sample: int, seed: int, steps: tuple[str, ...]):
+    corpus = Corpus(CORPUS, DATA_DIR)
+    names = corpus.names()
+    if not names:
+        print(f"No cases found in {corpus.directory}")
+        return
+
+    # Both variants must reach the model every time.
+    response_cache.enabled = False
+    picked = random.Random(seed).sample(names, min(sample, len(names)))
+    print(f"Benchmarking {len(picked)} cases on {LLM_PROVIDER} with steps: {', '.join(steps)}")
+
+    rows = []
+    for index, name in enumerate(picked):
+        try:
+            row = await bench_case(corpus.get(name), steps, raw_first=index % 2 == 0)
+        except Exception as e:
+            print(f"{name}: error: {e}")
+            continue
+        rows.append(row)
+        print(
+            f"{name}: {row['raw_tokens']} -> {row['clean_tokens']} tokens, "
+            f"{row['raw_seconds']:.1f}s -> {row['clean_seconds']:.1f}s, "
+            f"fact overlap {row['fact_overlap']:.2f}"
+        )
+    await close_providers()
+
+    if not rows:
+        return
+    raw_tokens = sum(row["raw_tokens"] for row in rows)
+    clean_tokens = sum(row["clean_tokens"] for row in rows)
+    raw_seconds = sum(row["raw_seconds"] for row in rows)
+    clean_seconds = sum(row["clean_seconds"] for row in rows)
+    by_step = {step: sum(row["removed_by_step"].get(step, 0) for row in rows) for step in steps}
+
+    print(f"\nCases: {len(rows)}")
+    print(
+        f"Prompt tokens: {raw_tokens} -> {clean_tokens} "
+        f"(-{100 * (1 - clean_tokens / max(raw_tokens, 1)):.1f}%)"
+    )
+    print(f"Removed by step: {by_step}")
+    print(
+        f"Latency: {raw_seconds:.1f}s -> {clean_seconds:.1f}s "
+        f"(-{100 * (1 - clean_seconds / max(raw_seconds, 1e-9)):.1f}%)"
+    )
+    print(
+        "Fact term overlap: "
+        f"mean {statistics.mean(row['fact_overlap'] for row in rows):.2f}, "
+        f"min {min(row['fact_overlap'] for row in rows):.2f}"
+    )
+    print(
+        f"Same case type: {sum(row['same_case_type'] for row in rows)}/{len(rows)}; "
+        f"facts per case: {statistics.mean(row['raw_facts'] for row in rows):.1f} -> "
+        f"{statistics.mean(row['clean_facts'] for row in rows):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    # Configure run here
+    SAMPLE = 10  # Cases drawn from the corpus
+    SEED = 0
+    STEPS_UNDER_TEST = enabled_steps() or STEPS  # OPINION_PREPROCESS, else every step
+    asyncio.run(main(sample=SAMPLE, seed=SEED, steps=STEPS_UNDER_TEST))
@@ -0,0 +1,189 @@
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from ingest import Corpus
+from loguru import logger
+
+# Page size of the case list when the client does not ask for one.
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+# Filtered listings kept per search string, so paging through results does
+# not rescan the index.
+SEARCH_CACHE_SIZE = 32
+# Differences larger than this replace the sorted list instead of patching it.
+INCREMENTAL_LIMIT = 1000
+
+
+class CaseIndex:
+    """Sorted listing of the corpus's cases with their names, for paging and search.
+
+    The filename list is patched from the corpus listing only when the corpus
+    revision changes. Case names (`name_abbreviation`) are read once per case
+    and kept in an append-only JSONL log, like `FactIndex`, so restarts do not
+    re-open every case.
+    """
+
+    def __init__(self, corpus: Corpus, log_path: Path):
+        self.corpus = corpus
+        self.log_path = log_path
+        self.filenames: list[str] = []
+        self.names: dict[str, str] = {}
+        self._keys: dict[str, tuple[str, str]] = {}
+        self._revision: tuple | None = None
+        self._searches: OrderedDict[tuple[str, bool], list[str]] = OrderedDict()
+        self._log_lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def _load(self) -> None:
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, encoding="utf-8") as f:
+            for line in f:
+                self._log_lines += 1
+                entry = json.loads(line)
+                if entry.get("deleted"):
+                    self.names.pop(entry["filename"], None)
+                else:
+                    self.names[entry["filename"]] = entry["name"]
+        if self._log_lines > 2 * len(self.names) + 100:
+            self._compact()
+
+    def _append(self, entries: list[dict]) -> None:
+        if not entries:
+            return
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+        self._log_lines += len(entries)
+
+    def _compact(self) -> None:
+        tmp_path = self.log_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for filename, name in self.names.items():
+                f.write(json.dumps({"filename": filename, "name": name}) + "\n")
+        os.replace(tmp_path, self.log_path)
+        self._log_lines = len(self.names)
+
+    def _read_names(self, filenames: set[str]) -> dict[str, str]:
+        # JSONL corpora keep names from their indexing pass; other cases are
+        # read once each.
+        names = {}
+        if len(filenames) > INCREMENTAL_LIMIT:
+            logger.info(f"Reading case names for {len(filenames)} cases")
+        for filename in filenames:
+            try:
+                fields = self.corpus.case_fields(filename)
+            except Exception as e:
+                logger.warning(f"Could not read the case name of {filename}: {e}")
+                fields = ("",)
+            # Unreadable cases get "" so they are not retried on every refresh.
+            if fields is not None:
+                names[filename] = fields[0]
+        return names
+
+    def _key(self, filename: str) -> tuple[str, str]:
+        return filename.lower(), self.names.get(filename, "").lower()
+
+    def refresh(self) -> None:
+        """Bring the listing up to date if the corpus changed since the last call."""
+        with self._lock:
+            revision = self.corpus.revision()
+            if revision == self._revision:
+                return
+            current = self.corpus.names()
+            known = set(self.filenames)
+            present = set(current)
+            added = present - known
+            removed = known - present
+
+            if len(added) + len(removed) > INCREMENTAL_LIMIT:
+                self.filenames = current
+            else:
+                for filename in removed:
+                    del self.filenames[bisect.bisect_left(self.filenames, filename)]
+                for filename in added:
+                    bisect.insort(self.filenames, filename)
+
+            unnamed = {filename for filename in added if filename not in self.names}
+            named = self._read_names(unnamed) if unnamed else {}
+            self.names.update(named)
+            self._append([{"filename": f, "name": n} for f, n in named.items()])
+            gone = [filename for filename in self.names if filename not in present]
+            for filename in gone:
+                del self.names[filename]
+            self._append([{"filename": filename, "deleted": True} for filename in gone])
+            if self._log_lines > 2 * len(self.names) + 100:
+                self._compact()
+
+            for filename in removed:
+                self._keys.pop(filename, None)
+            for filename in added:
+                self._keys[filename] = self._key(filename)
+            self._searches.clear()
+            self._revision = revision
+
+    def _matches(self, query: str, prefix: bool) -> list[str]:
+        """Filenames whose filename or case name contains (or starts with) `query`, sorted."""
+        if not query:
+            return self.filenames
+        cache_key = (query, prefix)
+        cached = self._searches.get(cache_key)
+        if cached is not None:
+            self._searches.move_to_end(cache_key)
+            return cached
+        keys = self._keys
+        if prefix:
+            matches = [
+                filename
+                for filename in self.filenames
+                if keys[filename][0].startswith(query) or keys[filename][1].startswith(query)
+            ]
+        else:
+            matches = [
+                filename
+                for filename in self.filenames
+                if query in keys[filename][0] or query in keys[filename][1]
+            ]
+        self._searches[cache_key] = matches
+        if len(self._searches) > SEARCH_CACHE_SIZE:
+            self._searches.popitem(last=False)
+        return matches
+
+    def page(
+        self,
+        query: str = "",
+        cursor: str | None = None,
+        offset: int = 0,
+        limit: int = PAGE_SIZE,
+        prefix: bool = False,
+    ) -> dict:
+        """One page of the (filtered) listing.
+
+        `cursor` is the last filename of the previous page and stays valid when
+        cases are added or removed; `offset` lets a scrolled list jump straight
+        to a position.
+        """
+        self.refresh()
+        with self._lock:
+            matches = self._matches(query.strip().lower(), prefix)
+            start = bisect.bisect_right(matches, cursor) if cursor is not None else offset
+            start = min(max(start, 0), len(matches))
+            filenames = matches[start : start + min(max(limit, 1), MAX_PAGE_SIZE)]
+            end = start + len(filenames)
+            return {
+                "items": [
+                    {"filename": filename, "name": self.names.get(filename, "")}
+                    for filename in filenames
+                ],
+                "offset": start,
+                "total": len(matches),
+                "next_cursor": filenames[-1] if end < len(matches) else None,
+            }
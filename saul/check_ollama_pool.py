@@ -0,0 +1,169 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+import providers
+from providers import OllamaHost, OllamaPool, close_providers
+
+# End-to-end check of OllamaPool against two mock_llm.py servers: per-host
+# caps hold under load, requests fail over when a host stops, the stopped host
+# stays out of rotation while it backs off, and it rejoins once it answers
+# again. Exits non-zero on the first failed expectation.
+
+SAUL_DIR = Path(__file__).resolve().parent
+# Long enough that concurrent requests overlap on each host.
+MOCK_TTFT = 0.1
+# Shortened backoff so the downed host is re-probed within the run.
+RETRY_BASE = 1.0
+REJOIN_TIMEOUT = 15.0
+MESSAGES = [{"role": "user", "content": "ping"}]
+FORMAT = {"type": "object", "properties": {"ok": {"type": "boolean"}}}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_mock(port: int) -> subprocess.Popen:
+    env = {**os.environ, "MOCK_LLM_PORT": str(port), "MOCK_LLM_TTFT": str(MOCK_TTFT)}
+    mock = subprocess.Popen([sys.executable, str(SAUL_DIR / "mock_llm.py")], env=env)
+    deadline = time.monotonic() + 30.0
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/tags", timeout=1.0)
+            return mock
+        except httpx.TransportError:
+            time.sleep(0.2)
+    mock.terminate()
+    raise RuntimeError(f"Mock LLM server did not start on port {port}")
+
+
+def _stop_mock(mock: subprocess.Popen) -> None:
+    mock.terminate()
+    mock.wait()
+
+
+def _expect(condition: bool, message: str) -> None:
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+class Run:
+    """Sends chat requests through a pool and records what the hosts saw."""
+
+    def __init__(self, pool: OllamaPool):
+        self.pool = pool
+        self.retries = 0
+        self.peak = {host.url: 0 for host in pool.hosts}
+
+    def _on_retry(self) -> None:
+        self.retries += 1
+
+    async def _chat(self, stream: bool) -> None:
+        if stream:
+            chunks = self.pool.stream(
+                lambda client: client.chat(
+                    model="mock", messages=MESSAGES, format=FORMAT, stream=True
+                ),
+                on_retry=self._on_retry,
+            )
+            async for _ in chunks:
+                pass
+        else:
+            await self.pool.run(
+                lambda client: client.chat(model="mock", messages=MESSAGES, format=FORMAT),
+                on_retry=self._on_retry,
+            )
+
+    async def _watch(self) -> None:
+        while True:
+            for host in self.pool.hosts:
+                self.peak[host.url] = max(self.peak[host.url], host.outstanding)
+            await asyncio.sleep(0.005)
+
+    async def requests(self, count: int, stream: bool = False) -> None:
+        watcher = asyncio.create_task(self._watch())
+        try:
+            await asyncio.gather(*(self._chat(stream and i % 2 == 0) for i in range(count)))
+        finally:
+            watcher.cancel()
+
+
+async def check(port_a: int, port_b: int) -> None:
+    pool = OllamaPool([(f"http://127.0.0.1:{port_a}", 2), (f"http://127.0.0.1:{port_b}", 1)])
+    host_a, host_b = pool.hosts
+    try:
+        await caps(pool, host_a, host_b)
+        await failover(pool, host_b, port_b)
+        await backoff(pool, host_b)
+        await rejoin(pool, host_b, port_b)
+    finally:
+        await pool.close()
+        await close_providers()
+
+
+async def caps(pool: OllamaPool, host_a: OllamaHost, host_b: OllamaHost) -> None:
+    run = Run(pool)
+    await run.requests(12, stream=True)
+    _expect(run.peak[host_a.url] == 2, f"host A peaked at its cap of 2 ({run.peak[host_a.url]})")
+    _expect(run.peak[host_b.url] == 1, f"host B peaked at its cap of 1 ({run.peak[host_b.url]})")
+    _expect(host_a.completed + host_b.completed == 12, "every request completed")
+
+
+async def failover(pool: OllamaPool, host_b: OllamaHost, port_b: int) -> None:
+    _stop_mock(MOCKS.pop(port_b))
+    run = Run(pool)
+    completed = sum(host.completed for host in pool.hosts)
+    await run.requests(6, stream=True)
+    _expect(run.retries >= 1, f"requests routed to the stopped host failed over ({run.retries})")
+    _expect(
+        sum(host.completed for host in pool.hosts) == completed + 6,
+        "every request completed on the remaining host",
+    )
+    _expect(not host_b.healthy, "the stopped host was removed from the pool")
+
+
+async def backoff(pool: OllamaPool, host_b: OllamaHost) -> None:
+    run = Run(pool)
+    await run.requests(4)
+    _expect(
+        run.retries == 0 and run.peak[host_b.url] == 0,
+        "the removed host got no requests while backing off",
+    )
+
+
+async def rejoin(pool: OllamaPool, host_b: OllamaHost, port_b: int) -> None:
+    MOCKS[port_b] = _start_mock(port_b)
+    completed = host_b.completed
+    deadline = time.monotonic() + REJOIN_TIMEOUT
+    run = Run(pool)
+    while host_b.completed == completed and time.monotonic() < deadline:
+        await run.requests(3)
+        await asyncio.sleep(0.2)
+    _expect(host_b.healthy, "the restarted host was re-added to the pool")
+    _expect(host_b.completed > completed, "the re-added host served requests again")
+
+
+MOCKS: dict[int, subprocess.Popen] = {}
+
+
+if __name__ == "__main__":
+    providers.HOST_RETRY_BASE = RETRY_BASE
+    port_a, port_b = _free_port(), _free_port()
+    try:
+        for port in (port_a, port_b):
+            MOCKS[port] = _start_mock(port)
+        asyncio.run(check(port_a, port_b))
+    finally:
+        for mock in MOCKS.values():
+            _stop_mock(mock)
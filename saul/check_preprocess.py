@@ -0,0 +1,59 @@
+import sys
+
+from preprocess import _citations, _footnotes
+
+# Regression checks for the citation and footnote steps of preprocess.py:
+# string citations collapse, but date runs and numbered lists that only look
+# like them are kept. Exits non-zero on the first failed expectation.
+
+DATES = (
+    "filed on 12 March 2001; the answer followed on 3 April 2001; "
+    "the defendant was arrested on 5 May 2002; trial began on 9 June 2002"
+)
+ABBREVIATED_DATES = (
+    "filed on 12 Jan. 2001; answered on 3 Feb. 2001; "
+    "arrested on 5 Sept. 2002; tried on 9 Oct. 2002"
+)
+CITATIONS = (
+    "See People v. Ault (2004) 33 Cal.4th 1250; People v. Cromer (2001) 24 Cal.4th 889; "
+    "Apprendi v. New Jersey (2000) 530 U.S. 466; Blakely v. Washington (2004) 124 S.Ct. 2531; "
+    "Brown v. Smith (1994) 48 Cal. App. 4th 1010"
+)
+FOOTNOTED = (
+    "The officers searched the car without a warrant.1 The court denied the motion.2\n"
+    "We affirm.\n"
+    "1 The record does not show who owned the car.\n"
+    "2 The People do not argue consent."
+)
+HOLDINGS = (
+    "For these reasons we hold as follows, and the opinion runs on long enough "
+    "that the holdings are well under half of it.\n"
+    "1 The search of the car was unlawful.\n"
+    "2 The statements must be suppressed."
+)
+
+
+def _expect(condition: bool, message: str) -> None:
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+if __name__ == "__main__":
+    _expect(_citations(DATES, set()) == DATES, "a run of dates is kept")
+    _expect(
+        _citations(ABBREVIATED_DATES, set()) == ABBREVIATED_DATES,
+        "a run of abbreviated dates is kept",
+    )
+    collapsed = _citations(CITATIONS, set())
+    _expect("[3 citations omitted]" in collapsed, "a string citation keeps its first and last cite")
+    _expect(
+        collapsed.startswith("See People v. Ault") and collapsed.endswith("48 Cal. App. 4th 1010"),
+        "prose around a string citation survives",
+    )
+    _expect(
+        _footnotes(FOOTNOTED, set()) == FOOTNOTED.split("\n1 ")[0],
+        "footnotes the opinion refers to are dropped",
+    )
+    _expect(_footnotes(HOLDINGS, set()) == HOLDINGS, "a trailing numbered list is kept")
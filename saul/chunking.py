@@ -0,0 +1,115 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from model import Analysis
+
+# Rough chars-per-token ratio for English legal prose with the Gemma/GPT
+# tokenizers; good enough for budgeting without loading a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class Chunk:
+    text: str
+    opinion_index: int
+    opinion_type: str
+    last_in_opinion: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _paragraphs(text: str, max_chars: int) -> list[str]:
+    paragraphs = []
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            continue
+        # A single paragraph over budget is hard-split on whitespace.
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            paragraphs.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        paragraphs.append(paragraph)
+    return paragraphs
+
+
+def split_opinions(
+    opinions: list[dict], max_tokens: int, overlap_tokens: int
+) -> list[Chunk]:
+    """Split each opinion into paragraph-aligned chunks of at most `max_tokens`.
+
+    Chunks never span two opinions, so the majority's disposition can be told
+    apart from a dissent's. Consecutive chunks share up to `overlap_tokens` of
+    trailing paragraphs so facts on a boundary are seen whole at least once.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+    chunks: list[Chunk] = []
+
+    for index, opinion in enumerate(opinions):
+        opinion_type = opinion.get("type", "majority" if index == 0 else "other")
+        current: list[str] = []
+        size = 0
+        opinion_chunks: list[Chunk] = []
+
+        for paragraph in _paragraphs(opinion.get("text", ""), max_chars):
+            if current and size + len(paragraph) + 1 > max_chars:
+                opinion_chunks.append(Chunk("\n".join(current), index, opinion_type))
+                overlap: list[str] = []
+                overlap_size = 0
+                for previous in reversed(current):
+                    if overlap_size + len(previous) + 1 > overlap_chars:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_size += len(previous) + 1
+                if overlap_size + len(paragraph) + 1 > max_chars:
+                    overlap, overlap_size = [], 0
+                current, size = overlap, overlap_size
+            current.append(paragraph)
+            size += len(paragraph) + 1
+
+        if current:
+            opinion_chunks.append(Chunk("\n".join(current), index, opinion_type))
+        if opinion_chunks:
+            opinion_chunks[-1].last_in_opinion = True
+        chunks.extend(opinion_chunks)
+
+    return chunks
+
+
+def _dedupe_key(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _merge_lists(lists: list[list[str]]) -> list[str]:
+    seen = set()
+    merged = []
+    for items in lists:
+        for item in items:
+            key = _dedupe_key(item)
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(item.strip())
+    return merged
+
+
+def merge_analyses(parts: list[tuple[Chunk, Analysis]]) -> Analysis:
+    """Reduce per-chunk analyses into one, deduping facts, issues and reasonings."""
+    votes = Counter(analysis.case_type for _, analysis in parts)
+    case_type = max(votes, key=lambda value: (votes[value], value == parts[0][1].case_type))
+
+    # The holding is stated at the end of the majority opinion, not in a dissent.
+    endings = [(chunk, analysis) for chunk, analysis in parts if chunk.last_in_opinion]
+    majority = [analysis for chunk, analysis in endings if chunk.opinion_type == "majority"]
+    outcome_source = majority[0] if majority else endings[0][1]
+
+    return Analysis(
+        case_type=case_type,
+        facts=_merge_lists([analysis.facts for _, analysis in parts]),
+        issues=_merge_lists([analysis.issues for _, analysis in parts]),
+        reasonings=_merge_lists([analysis.reasonings for _, analysis in parts]),
+        outcomes=outcome_source.outcomes,
+    )
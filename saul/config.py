@@ -0,0 +1,29 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Each subdirectory of CORPORA_DIR is a named corpus (a reporter, a set of
+# volumes, ...) holding its cases and everything derived from them.
+CORPORA_DIR = Path(os.getenv("CORPORA_DIR", BASE_DIR / "data"))
+CORPUS = os.getenv("CORPUS", "1")
+
+DATA_DIR = CORPORA_DIR / CORPUS
+JSON_DIR = DATA_DIR / "json"
+HTML_DIR = DATA_DIR / "html"
+# Indexes and logs the app derives from a corpus. They live in a dot directory
+# because the corpus reads any JSONL file at its root as a case source.
+STATE_DIR = DATA_DIR / ".saul"
+
+
+def state_path(name: str) -> Path:
+    """Path of an app-generated file, moved over from the corpus root if an older version left it there."""
+    path = STATE_DIR / name
+    legacy = DATA_DIR / name
+    if legacy.exists() and not path.exists():
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        legacy.rename(path)
+    return path
@@ -0,0 +1,131 @@
+import threading
+from array import array
+from dataclasses import dataclass
+
+from retrieval import NEGATION_PREFIX, FactIndex, _stem
+
+# Outcome-determinative opposites that are not spelled as a negation of each
+# other. Negated forms ("non-consensual", "without a warrant") are already
+# folded into "not_" terms by retrieval.fact_terms and pair up automatically.
+ANTONYMS = [
+    ("public", "private"),
+    ("lawful", "unlawful"),
+    ("legal", "illegal"),
+    ("voluntary", "involuntary"),
+    ("consensual", "nonconsensual"),
+    ("intentional", "unintentional"),
+    ("intentional", "negligent"),
+    ("reasonable", "unreasonable"),
+    ("armed", "unarmed"),
+    ("admissible", "inadmissible"),
+    ("valid", "invalid"),
+    ("competent", "incompetent"),
+    ("adult", "minor"),
+    ("guilty", "innocent"),
+    ("warrant", "warrantless"),
+]
+
+
+def _counterparts() -> dict[str, set[str]]:
+    pairs: dict[str, set[str]] = {}
+    for a, b in ANTONYMS:
+        a, b = _stem(a), _stem(b)
+        pairs.setdefault(a, set()).add(b)
+        pairs.setdefault(b, set()).add(a)
+    return pairs
+
+
+COUNTERPARTS = _counterparts()
+
+
+def negations(term: str) -> set[str]:
+    """Terms whose presence in a precedent contradicts `term` in the target."""
+    if term.startswith(NEGATION_PREFIX):
+        return {term[len(NEGATION_PREFIX) :]}
+    return {NEGATION_PREFIX + term} | COUNTERPARTS.get(term, set())
+
+
+@dataclass
+class Distinction:
+    filename: str
+    delta: int  # |Δ_p|: precedent fact terms missing from the target
+    hazards: list[tuple[str, str]]  # (precedent term, contradicted target term)
+
+    @property
+    def hazardous(self) -> bool:
+        return bool(self.hazards)
+
+
+class DistinctionIndex:
+    """Compact fact-term sets for every case in a FactIndex (README Step 4).
+
+    Each unigram fact term gets an integer id and each case is a sorted
+    `array("I")` of its term ids, 4 bytes per term however large the
+    vocabulary grows. Terms with negation counterparts keep their ids in a
+    sparse map. For a target, Δ_p is the candidate's ids missing from the
+    target's set, and a hazard is an id in Δ_p that contradicts a target term.
+    """
+
+    def __init__(self, fact_index: FactIndex):
+        self.fact_index = fact_index
+        self.term_ids: dict[str, int] = {}
+        self.terms: list[str] = []
+        self.counterparts: dict[int, list[int]] = {}
+        self.term_sets: list[array] = []
+        self._lock = threading.Lock()
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        if term_id is not None:
+            return term_id
+        term_id = len(self.terms)
+        self.term_ids[term] = term_id
+        self.terms.append(term)
+        for other in negations(term):
+            other_id = self.term_ids.get(other)
+            if other_id is not None:
+                self.counterparts.setdefault(term_id, []).append(other_id)
+                self.counterparts.setdefault(other_id, []).append(term_id)
+        return term_id
+
+    def encode(self, terms) -> array:
+        return array("I", sorted({self._term_id(term) for term in terms if " " not in term}))
+
+    def _encode_new(self) -> None:
+        # FactIndex never reuses doc ids, so term sets line up with its slots
+        # and only the new tail needs encoding.
+        doc_terms = self.fact_index.doc_terms
+        for doc in range(len(self.term_sets), len(doc_terms)):
+            self.term_sets.append(self.encode(doc_terms[doc]))
+
+    def analyze(self, target: str, candidates: list[str]) -> list[Distinction]:
+        """Δ_p and outcome-determinative negations of each candidate against `target`."""
+        self.fact_index.refresh()
+        # Both locks, so no case is indexed between encoding and reading the term sets.
+        with self._lock, self.fact_index.lock:
+            self._encode_new()
+            doc_ids = self.fact_index.doc_ids
+            if target not in doc_ids:
+                raise KeyError(target)
+            target_ids = set(self.term_sets[doc_ids[target]])
+            # Counterpart id -> the target terms it contradicts.
+            contradicts: dict[int, list[int]] = {}
+            for term_id in target_ids:
+                for other in self.counterparts.get(term_id, ()):
+                    contradicts.setdefault(other, []).append(term_id)
+
+            results = []
+            for filename in candidates:
+                doc = doc_ids.get(filename)
+                if doc is None:
+                    continue
+                delta = 0
+                hazards = []
+                for term_id in self.term_sets[doc]:
+                    if term_id in target_ids:
+                        continue
+                    delta += 1
+                    for other in contradicts.get(term_id, ()):
+                        hazards.append((self.terms[term_id], self.terms[other]))
+                results.append(Distinction(filename, delta, hazards))
+        return results
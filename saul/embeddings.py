@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import threading
+from array import array
+from pathlib import Path
+
+import torch
+from loguru import logger
+from model import Analysis
+from providers import ollama_pool
+
+# A local embedding model served by the same (CPU) Ollama install as stage 1.
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Embed each new stage 1 output as it is saved; otherwise use /api/embeddings/sync.
+# Off by default: it calls Ollama whatever LLM_PROVIDER is, and competes with
+# stage 1 generation for the same CPU during a batch run.
+EMBED_ON_SAVE = os.getenv("EMBED_ON_SAVE", "0").strip().lower() in ("1", "true", "yes")
+# Rows scored per matrix multiply; bounds peak memory on large corpora.
+SCORE_BLOCK_ROWS = 65536
+# Rewrite the vector file once unreferenced rows outnumber live ones by this much.
+COMPACT_MIN_DEAD_ROWS = 4096
+
+
+async def embed_texts(texts: list[str]) -> torch.Tensor:
+    """Embed `texts` in batches and return L2-normalized float32 rows."""
+    rows = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start : start + EMBED_BATCH_SIZE]
+        response = await ollama_pool().run(
+            lambda client: client.embed(model=EMBED_MODEL, input=batch)
+        )
+        rows.extend(response["embeddings"])
+    vectors = torch.tensor(rows, dtype=torch.float32)
+    return torch.nn.functional.normalize(vectors, dim=1)
+
+
+class VectorStore:
+    """Append-only, memory-mapped matrix of fact embeddings with a case offset table.
+
+    `vectors.f32` holds every fact vector row-major; `offsets.jsonl` maps each
+    case to its (start, count) rows. Re-embedding a case appends new rows and
+    a new offset entry; the old rows are no longer referenced, and both files
+    are rewritten without them once they outnumber the live rows. Writes and
+    searches run in worker threads and hold `_lock`.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.vectors_path = directory / "vectors.f32"
+        self.offsets_path = directory / "offsets.jsonl"
+        self.dim: int | None = None
+        self.rows = 0
+        self.offsets: dict[str, tuple[int, int]] = {}
+        self._matrix: torch.Tensor | None = None
+        self._row_case: torch.Tensor | None = None
+        self._case_names: list[str] = []
+        self._case_slots: dict[str, int] = {}
+        self._log_lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.offsets
+
+    def _load(self) -> None:
+        if not self.offsets_path.exists():
+            return
+        with open(self.offsets_path, encoding="utf-8") as f:
+            for line in f:
+                self._log_lines += 1
+                entry = json.loads(line)
+                self.dim = entry.get("dim", self.dim)
+                if entry.get("deleted"):
+                    self.offsets.pop(entry["filename"], None)
+                else:
+                    self.offsets[entry["filename"]] = (entry["start"], entry["count"])
+        if self.dim and self.vectors_path.exists():
+            self.rows = self.vectors_path.stat().st_size // (4 * self.dim)
+        self._maybe_compact()
+
+    def _append_offset(self, entry: dict) -> None:
+        with open(self.offsets_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._log_lines += 1
+
+    def _maybe_compact(self) -> None:
+        live = sum(count for _, count in self.offsets.values())
+        if self.rows - live > live + COMPACT_MIN_DEAD_ROWS or (
+            self._log_lines > 2 * len(self.offsets) + 100
+        ):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the vector file and offset log with only the rows cases still reference."""
+        offsets: dict[str, tuple[int, int]] = {}
+        rows = 0
+        vectors_tmp = self.vectors_path.with_suffix(".tmp")
+        offsets_tmp = self.offsets_path.with_suffix(".tmp")
+        with open(vectors_tmp, "wb") as f:
+            if self.rows:
+                matrix, _ = self._mapped()
+                for filename, (start, count) in self.offsets.items():
+                    matrix[start : start + count].numpy().tofile(f)
+                    offsets[filename] = (rows, count)
+                    rows += count
+        with open(offsets_tmp, "w", encoding="utf-8") as f:
+            for filename, (start, count) in offsets.items():
+                f.write(
+                    json.dumps(
+                        {"filename": filename, "start": start, "count": count, "dim": self.dim}
+                    )
+                    + "\n"
+                )
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(offsets_tmp, self.offsets_path)
+        logger.info(f"Compacted the vector store from {self.rows} to {rows} rows")
+        self.offsets = offsets
+        self.rows = rows
+        self._log_lines = len(offsets)
+        self._matrix = None
+
+    def add(self, filename: str, vectors: torch.Tensor) -> None:
+        with self._lock:
+            self._add(filename, vectors)
+
+    def _add(self, filename: str, vectors: torch.Tensor) -> None:
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match store ({self.dim}); "
+                "delete the embeddings directory after changing EMBED_MODEL"
+            )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.vectors_path, "ab") as f:
+            array("f", vectors.flatten().tolist()).tofile(f)
+        start = self.rows
+        self.rows += vectors.shape[0]
+        self.offsets[filename] = (start, vectors.shape[0])
+        self._append_offset(
+            {"filename": filename, "start": start, "count": vectors.shape[0], "dim": self.dim}
+        )
+        self._matrix = None
+        self._maybe_compact()
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            if self.offsets.pop(filename, None) is not None:
+                self._append_offset({"filename": filename, "deleted": True})
+                self._matrix = None
+                self._maybe_compact()
+
+    def _mapped(self) -> tuple[torch.Tensor, torch.Tensor]:
+        """The vector file mapped as a (rows, dim) tensor plus each row's case slot."""
+        if self._matrix is None:
+            flat = torch.from_file(
+                str(self.vectors_path), shared=False, size=self.rows * self.dim, dtype=torch.float32
+            )
+            self._matrix = flat.view(self.rows, self.dim)
+            self._case_names = list(self.offsets)
+            self._case_slots = {name: slot for slot, name in enumerate(self._case_names)}
+            # Rows no longer referenced by any case point at a trailing dummy slot.
+            row_case = torch.full((self.rows,), len(self._case_names), dtype=torch.long)
+            for slot, (start, count) in enumerate(self.offsets.values()):
+                row_case[start : start + count] = slot
+            self._row_case = row_case
+        return self._matrix, self._row_case
+
+    def vectors_for(self, filename: str) -> torch.Tensor | None:
+        with self._lock:
+            if filename not in self.offsets or not self.rows:
+                return None
+            matrix, _ = self._mapped()
+            start, count = self.offsets[filename]
+            return matrix[start : start + count]
+
+    def search(
+        self, query: torch.Tensor, top: int = 20, exclude: str | None = None
+    ) -> list[tuple[str, float]]:
+        """Score every case as the mean, over query facts, of its best-matching fact's cosine."""
+        with self._lock:
+            return self._search(query, top, exclude)
+
+    def _search(
+        self, query: torch.Tensor, top: int, exclude: str | None
+    ) -> list[tuple[str, float]]:
+        if not self.offsets or not self.rows or query.shape[0] == 0:
+            return []
+        matrix, row_case = self._mapped()
+        slots = len(self._case_names)
+        q = query.shape[0]
+        best = torch.full((slots + 1, q), -1.0)
+        for start in range(0, self.rows, SCORE_BLOCK_ROWS):
+            block = matrix[start : start + SCORE_BLOCK_ROWS]
+            scores = block @ query.T
+            index = row_case[start : start + SCORE_BLOCK_ROWS].unsqueeze(1).expand(-1, q)
+            best.scatter_reduce_(0, index, scores, reduce="amax")
+
+        case_scores = best[:slots].mean(dim=1)
+        if exclude in self.offsets:
+            case_scores[self._case_slots[exclude]] = float("-inf")
+        values, indices = torch.topk(case_scores, min(top, slots))
+        return [
+            (self._case_names[i], round(v, 4))
+            for v, i in zip(values.tolist(), indices.tolist())
+            if v != float("-inf")
+        ]
+
+
+async def embed_analysis(store: VectorStore, filename: str, analysis: Analysis) -> None:
+    if not analysis.facts:
+        await asyncio.to_thread(store.remove, filename)
+        return
+    vectors = await embed_texts(analysis.facts)
+    await asyncio.to_thread(store.add, filename, vectors)
+    logger.info(f"Embedded {len(analysis.facts)} facts for {filename}")
@@ -0,0 +1,89 @@
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Responses smaller than this are sent uncompressed.
+GZIP_MIN_SIZE = 1024
+
+# Rendered HTML depends on the code as well as the stored output, so
+# validators issued before this process started are never trusted.
+_BOOT_NS = time.time_ns()
+
+
+@dataclass
+class Validators:
+    """ETag and Last-Modified for a response derived from stored versions."""
+
+    etag: str
+    last_modified: str | None
+    modified_seconds: int
+
+    @classmethod
+    def for_version(cls, *versions_ns: int | None) -> "Validators":
+        """Validators for the update times of everything in a response; None = absent."""
+        modified = max((v for v in versions_ns if v is not None), default=0)
+        modified = max(modified, _BOOT_NS)
+        parts = "-".join(f"{v:x}" if v is not None else "0" for v in versions_ns)
+        # Weak, because GZipMiddleware may re-encode the body under the same tag.
+        etag = f'W/"{parts}-{_BOOT_NS:x}"'
+        seconds = modified // 1_000_000_000
+        # A composite response can change by losing a part (an output deleted),
+        # which no modification date captures; those rely on the ETag alone.
+        last_modified = formatdate(seconds, usegmt=True) if len(versions_ns) == 1 else None
+        return cls(etag, last_modified, seconds)
+
+    def matches(self, request: Request) -> bool:
+        """Whether the client's cached copy is current (If-None-Match wins over If-Modified-Since)."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or any(_weak(tag) == _weak(self.etag) for tag in tags)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.modified_seconds <= since
+        return False
+
+    def headers(self) -> dict[str, str]:
+        # no-cache: keep a copy but revalidate on every use, so a re-run shows up at once.
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return headers
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers())
+
+    def apply(self, response: Response) -> Response:
+        response.headers.update(self.headers())
+        return response
+
+
+def _weak(tag: str) -> str:
+    return tag.removeprefix("W/")
+
+
+class StreamingAwareGZipMiddleware:
+    """GZipMiddleware, except for paths that stream HTML progressively.
+
+    zlib holds small writes back until it has a block to emit, which would
+    stall the incremental stage 1 rendering; SSE is already excluded by Starlette.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_prefixes: tuple[str, ...] = ()):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=GZIP_MIN_SIZE)
+        self.exclude_prefixes = exclude_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
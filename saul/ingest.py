@@ -0,0 +1,321 @@
+import gzip
+import json
+import lzma
+import os
+import re
+import sys
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from config import CORPORA_DIR
+
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.xz")
+_decoder = json.JSONDecoder()
+# First top-level "id" of a CAP record; it is the first key of every case.
+_ID_PATTERN = re.compile(rb'"id"\s*:\s*(\d+)')
+
+
+def extract_value(text: str, key: str):
+    """Decode just the value of the first `"key":` in a JSON document.
+
+    Only that value is materialized, so pulling `opinions` out of a CAP case
+    skips building head matter, citations, analysis and the rest.
+    """
+    match = re.search(rf'(?<!\\)"{re.escape(key)}"\s*:\s*', text)
+    if match is None:
+        return None
+    value, _ = _decoder.raw_decode(text, match.end())
+    return value
+
+
+def read_opinions(text: str) -> list[dict]:
+    """`casebody.opinions` of a CAP case, the only part stage 1 reads."""
+    opinions = extract_value(text, "opinions")
+    return opinions if isinstance(opinions, list) else []
+
+
+def read_case_fields(text: str) -> tuple[str, str | None, str | None]:
+    """(name_abbreviation, court name, jurisdiction name) of a CAP case.
+
+    These come before the case body in CAP records, so they are found without
+    scanning the opinions. Court and jurisdiction names are interned, since a
+    corpus has only a handful of them.
+    """
+    name = extract_value(text, "name_abbreviation")
+    court = extract_value(text, "court")
+    jurisdiction = extract_value(text, "jurisdiction")
+    court_name = court.get("name") if isinstance(court, dict) else None
+    jurisdiction_name = jurisdiction.get("name") if isinstance(jurisdiction, dict) else None
+    return (
+        name if isinstance(name, str) else "",
+        sys.intern(court_name) if isinstance(court_name, str) else None,
+        sys.intern(jurisdiction_name) if isinstance(jurisdiction_name, str) else None,
+    )
+
+
+class _JsonlCursor:
+    """An open, decompressed JSONL stream reused across reads of one source.
+
+    Compressed streams cannot seek backwards cheaply: gzip and lzma decompress
+    from the start again. Keeping the stream open makes reading cases in file
+    order (listings, rank refreshes) linear instead of quadratic.
+    """
+
+    def __init__(self, open_stream: Callable[[], object]):
+        self._open_stream = open_stream
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def read_line(self, offset: int) -> bytes:
+        with self._lock:
+            if self._stream is None or self._stream.tell() > offset:
+                if self._stream is not None:
+                    self._stream.close()
+                self._stream = self._open_stream()
+            self._stream.seek(offset)
+            return self._stream.readline()
+
+
+def _html_member(member: str) -> str:
+    # CAP volume exports keep json/<case>.json next to html/<case>.html.
+    parent, _, base = member.rpartition("json/")
+    return f"{parent}html/{base.removesuffix('.json')}.html"
+
+
+@dataclass
+class CaseDocument:
+    """One case in a corpus.
+
+    Behaves enough like the `Path` of an unpacked case JSON (`name`, `stem`,
+    `read_text`) to flow through the batch and analysis code unchanged, while
+    the bytes may come from a directory, a zip member or a JSONL line.
+    """
+
+    name: str
+    _read: Callable[[], bytes]
+    _read_html: Callable[[], bytes | None] = lambda: None
+    _html_version: Callable[[], int | None] = lambda: None
+
+    @property
+    def stem(self) -> str:
+        return Path(self.name).stem
+
+    def read_bytes(self) -> bytes:
+        return self._read()
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        return self._read().decode(encoding)
+
+    def read_html(self) -> bytes | None:
+        return self._read_html()
+
+    def html_version(self) -> int | None:
+        """Modification time in nanoseconds of the HTML view, or None if there is none."""
+        return self._html_version()
+
+
+class Corpus:
+    """A named set of cases streamed from directories, zip archives and JSONL files.
+
+    Sources are the corpus's `json/` directory plus any `*.zip` and
+    `*.jsonl[.gz|.xz]` files next to it. Nothing is extracted to disk: zip
+    members are read on demand, and JSONL files are streamed line by line,
+    with byte offsets remembered so a single case can be fetched again. The
+    indexing pass also keeps each JSONL case's name, court and jurisdiction
+    (`case_fields`), so listings and ranking need not re-read compressed lines.
+    """
+
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.directory = directory
+        self._locators: dict[str, tuple] = {}
+        self._indexed_revision: tuple | None = None
+        self._archives: dict[Path, zipfile.ZipFile] = {}
+        self._cursors: dict[tuple[Path, str | None], _JsonlCursor] = {}
+        self._fields: dict[str, tuple[str, str | None, str | None]] = {}
+        # Requests read the corpus from worker threads; one of them rescans at a time.
+        self._index_lock = threading.Lock()
+
+    def sources(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        sources = []
+        json_dir = self.directory / "json"
+        if json_dir.is_dir():
+            sources.append(json_dir)
+        for entry in sorted(self.directory.iterdir()):
+            # Dot entries are app state (config.STATE_DIR), never cases.
+            if entry.name.startswith("."):
+                continue
+            if entry.suffix == ".zip" or entry.name.endswith(JSONL_SUFFIXES):
+                sources.append(entry)
+        return sources
+
+    def revision(self) -> tuple:
+        """Changes when a source is added, removed or rewritten."""
+        return tuple((source, source.stat().st_mtime_ns) for source in self.sources())
+
+    def _archive(self, path: Path) -> zipfile.ZipFile:
+        archive = self._archives.get(path)
+        if archive is None:
+            archive = self._archives[path] = zipfile.ZipFile(path)
+        return archive
+
+    def _cursor(self, source: Path, member: str | None) -> _JsonlCursor:
+        key = (source, member)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            cursor = self._cursors[key] = _JsonlCursor(
+                lambda: self._open_jsonl(source, member)
+            )
+        return cursor
+
+    def _open_jsonl(self, source: Path, member: str | None):
+        name = member or source.name
+        raw = self._archive(source).open(member) if member else open(source, "rb")
+        if name.endswith(".gz"):
+            return gzip.open(raw, "rb")
+        if name.endswith(".xz"):
+            return lzma.open(raw, "rb")
+        return raw
+
+    def _iter_jsonl(self, source: Path, member: str | None) -> Iterator[tuple[str, tuple]]:
+        prefix = source.stem if member else source.name.split(".")[0]
+        with self._open_jsonl(source, member) as f:
+            offset = 0
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    match = _ID_PATTERN.search(line)
+                    case_id = match.group(1).decode() if match else f"line{line_number}"
+                    yield f"{prefix}_{case_id}.json", ("jsonl", source, member, offset, line)
+                offset += len(line)
+
+    def _iter_source(self, source: Path) -> Iterator[tuple[str, tuple]]:
+        """(case name, locator) for every case in one source, in order."""
+        if source.is_dir():
+            for path in sorted(source.glob("*.json")):
+                yield path.name, ("file", path)
+        elif source.suffix == ".zip":
+            archive = self._archive(source)
+            for member in sorted(archive.namelist()):
+                if member.endswith(".json") and "/json/" in f"/{member}":
+                    yield f"{source.stem}_{Path(member).name}", ("zip", source, member)
+                elif member.endswith(JSONL_SUFFIXES):
+                    yield from self._iter_jsonl(source, member)
+        else:
+            yield from self._iter_jsonl(source, None)
+
+    def _document(self, name: str, locator: tuple) -> CaseDocument:
+        kind = locator[0]
+        if kind == "file":
+            path = locator[1]
+            html_path = self.directory / "html" / f"{path.stem}.html"
+
+            def html_version() -> int | None:
+                try:
+                    return html_path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    return None
+
+            return CaseDocument(
+                name,
+                path.read_bytes,
+                lambda: html_path.read_bytes() if html_path.exists() else None,
+                html_version,
+            )
+        if kind == "zip":
+            _, source, member = locator
+
+            def read_html() -> bytes | None:
+                try:
+                    return self._archive(source).read(_html_member(member))
+                except KeyError:
+                    return None
+
+            def html_version() -> int | None:
+                if _html_member(member) not in self._archive(source).NameToInfo:
+                    return None
+                return source.stat().st_mtime_ns
+
+            return CaseDocument(
+                name, lambda: self._archive(source).read(member), read_html, html_version
+            )
+
+        _, source, member, offset, line = locator
+        if line is not None:
+            return CaseDocument(name, lambda: line)
+        if (member or source.name).endswith((".gz", ".xz")):
+            cursor = self._cursor(source, member)
+            return CaseDocument(name, lambda: cursor.read_line(offset))
+
+        def read_line() -> bytes:
+            with self._open_jsonl(source, member) as f:
+                f.seek(offset)
+                return f.readline()
+
+        return CaseDocument(name, read_line)
+
+    def iter_cases(self) -> Iterator[CaseDocument]:
+        """Stream every case; JSONL lines are handed out as they are read."""
+        for source in self.sources():
+            for name, locator in self._iter_source(source):
+                yield self._document(name, locator)
+
+    def _index(self) -> dict[str, tuple]:
+        with self._index_lock:
+            revision = self.revision()
+            if revision != self._indexed_revision:
+                # Readers in other threads may still hold the old handles; they
+                # close once nothing references them.
+                self._archives = {}
+                self._cursors = {}
+                locators = {}
+                fields = {}
+                for source in self.sources():
+                    for name, locator in self._iter_source(source):
+                        if locator[0] == "jsonl":
+                            try:
+                                fields[name] = read_case_fields(locator[4].decode("utf-8"))
+                            except ValueError:
+                                pass
+                            # Keep only the offset; the line is re-read on demand.
+                            locator = (*locator[:4], None)
+                        locators[name] = locator
+                self._locators = locators
+                self._fields = fields
+                self._indexed_revision = revision
+            return self._locators
+
+    def names(self) -> list[str]:
+        return sorted(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def get(self, name: str) -> CaseDocument | None:
+        locator = self._index().get(name)
+        return None if locator is None else self._document(name, locator)
+
+    def case_fields(self, name: str) -> tuple[str, str | None, str | None] | None:
+        """(name_abbreviation, court, jurisdiction) of a case, or None if it is not in the corpus.
+
+        Kept from the indexing pass for JSONL cases; other cases are read once
+        and remembered.
+        """
+        locator = self._index().get(name)
+        if locator is None:
+            return None
+        fields = self._fields.get(name)
+        if fields is None:
+            fields = read_case_fields(self._document(name, locator).read_text(encoding="utf-8"))
+            self._fields[name] = fields
+        return fields
+
+
+def list_corpora() -> list[str]:
+    if not CORPORA_DIR.exists():
+        return []
+    return sorted(entry.name for entry in os.scandir(CORPORA_DIR) if entry.is_dir())
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncGenerator, Callable, Hashable, Iterator
+
+from loguru import logger
+
+# Idle SSE subscribers get a comment line this often so proxies keep them open.
+JOB_KEEPALIVE = 15.0
+# Finished jobs whose progress log stays in memory for late subscribers.
+JOB_HISTORY = 20
+# Progress messages kept per job; older ones are dropped and counted.
+JOB_MESSAGES = 1000
+
+ACTIVE_STATES = ("queued", "running")
+
+Runner = Callable[[dict], AsyncGenerator[str, None]]
+
+
+@dataclass
+class JobKind:
+    name: str
+    # Resources the job holds while running, e.g. {1} for stage 1 or {1, 2}
+    # for the pipeline; jobs sharing one never run at the same time.
+    stages: frozenset[Hashable]
+    run: Runner
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: dict
+    state: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    summary: str = ""
+    resumed: int = 0
+    messages: list[str] = field(default_factory=list)
+    # Messages emitted so far, including ones dropped from `messages`.
+    emitted: int = 0
+    task: asyncio.Task | None = None
+    _waiters: set[asyncio.Event] = field(default_factory=set)
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def emit(self, message: str) -> None:
+        self.messages.append(message)
+        self.emitted += 1
+        if len(self.messages) > 2 * JOB_MESSAGES:
+            # Trimmed in batches so a long run does not shift the list per message.
+            del self.messages[:-JOB_MESSAGES]
+        self._notify()
+
+    def _notify(self) -> None:
+        for event in self._waiters:
+            event.set()
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "summary": self.summary,
+            "resumed": self.resumed,
+            "messages": self.emitted,
+        }
+
+
+class JobStore:
+    """Job metadata in SQLite so queued and interrupted runs survive a restart."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, "
+                "state TEXT NOT NULL, created REAL NOT NULL, started REAL, "
+                "finished REAL, summary TEXT NOT NULL, resumed INTEGER NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(id, kind, params, state, created, started, finished, summary, resumed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.kind,
+                    json.dumps(job.params),
+                    job.state,
+                    job.created,
+                    job.started,
+                    job.finished,
+                    job.summary,
+                    job.resumed,
+                ),
+            )
+            conn.commit()
+
+    def load(self, limit: int) -> list[Job]:
+        """Every unfinished job plus the most recent `limit` finished ones, oldest first."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, kind, params, state, created, started, finished, summary, resumed "
+                "FROM jobs WHERE state IN (?, ?) OR id IN "
+                "(SELECT id FROM jobs ORDER BY created DESC LIMIT ?) ORDER BY created",
+                (*ACTIVE_STATES, limit),
+            ).fetchall()
+        return [
+            Job(id, kind, json.loads(params), state, created, started, finished, summary, resumed)
+            for id, kind, params, state, created, started, finished, summary, resumed in rows
+        ]
+
+
+class JobManager:
+    """Queue of batch runs that execute independently of the HTTP request that started them.
+
+    Jobs are picked FIFO; one only starts once no running job holds any of its
+    stages, so two stage 1 runs never race on the same outputs. Submitting the
+    same kind and params as a queued or running job returns that job instead;
+    different params queue a new job behind it. Each job
+    keeps its progress log so any number of subscribers can replay and follow
+    it, and unfinished jobs are queued again when the server restarts.
+    """
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self.kinds: dict[str, JobKind] = {}
+        self.jobs: dict[str, Job] = {}
+        # (stage, case) pairs being processed by a job or a single-case request.
+        self.in_flight: set[tuple[Hashable, str]] = set()
+        self._stopping = False
+
+    def kind(self, name: str, stages: set[Hashable]) -> Callable[[Runner], Runner]:
+        """Register a job kind; the runner yields progress messages for its params."""
+
+        def register(run: Runner) -> Runner:
+            self.kinds[name] = JobKind(name, frozenset(stages), run)
+            return run
+
+        return register
+
+    def start(self) -> None:
+        """Load job history and queue again whatever a previous process left unfinished."""
+        self._stopping = False
+        for job in self.store.load(JOB_HISTORY):
+            if job.active:
+                if job.kind not in self.kinds:
+                    job.state = "failed"
+                    job.summary = f"Unknown job kind: {job.kind}"
+                    self.store.save(job)
+                    continue
+                job.state = "queued"
+                job.resumed += 1
+                self.store.save(job)
+                logger.info(f"Resuming {job.kind} job {job.id}")
+            self.jobs[job.id] = job
+        self._dispatch()
+
+    async def stop(self) -> None:
+        """Stop running jobs without marking them cancelled, so the next start resumes them."""
+        self._stopping = True
+        tasks = [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def list(self, active: bool = False) -> list[Job]:
+        jobs = sorted(self.jobs.values(), key=lambda job: job.created, reverse=True)
+        return [job for job in jobs if job.active] if active else jobs
+
+    def submit(self, kind: str, params: dict) -> tuple[Job, bool]:
+        """Queue a job; returns it and whether it was created (False if an identical one was active)."""
+        if kind not in self.kinds:
+            raise KeyError(kind)
+        for job in self.jobs.values():
+            if job.kind == kind and job.params == params and job.active:
+                return job, False
+        job = Job(uuid.uuid4().hex[:12], kind, params)
+        self.jobs[job.id] = job
+        self.store.save(job)
+        self._prune()
+        self._dispatch()
+        return job, True
+
+    def cancel(self, job: Job) -> None:
+        if job.state == "queued":
+            self._finish(job, "cancelled", "Cancelled before it started.")
+            self._dispatch()
+        elif job.task:
+            job.task.cancel()
+
+    def resume(self, job: Job) -> None:
+        """Queue a finished job again; cases it already completed are skipped."""
+        if job.active:
+            return
+        job.state = "queued"
+        job.started = job.finished = None
+        job.summary = ""
+        job.messages = []
+        job.emitted = 0
+        job.resumed += 1
+        self.store.save(job)
+        self._dispatch()
+
+    def busy(self, stage: Hashable, name: str) -> bool:
+        return (stage, name) in self.in_flight
+
+    @contextmanager
+    def claim(self, stage: Hashable, name: str) -> Iterator[None]:
+        """Mark a case as in flight for `stage` so other runs skip it meanwhile."""
+        self.in_flight.add((stage, name))
+        try:
+            yield
+        finally:
+            self.in_flight.discard((stage, name))
+
+    async def events(self, job: Job) -> AsyncGenerator[str | None, None]:
+        """Replay the job's log, then follow it until the job finishes; None is a keepalive."""
+        index = 0
+        while True:
+            # `index` counts every message emitted; those before `first` were dropped.
+            while index < job.emitted:
+                first = job.emitted - len(job.messages)
+                if index < first:
+                    yield f"({first - index} earlier messages omitted)"
+                    index = first
+                    continue
+                yield job.messages[index - first]
+                index += 1
+            if not job.active:
+                return
+            event = asyncio.Event()
+            job._waiters.add(event)
+            try:
+                await asyncio.wait_for(event.wait(), JOB_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield None
+            finally:
+                job._waiters.discard(event)
+
+    def _dispatch(self) -> None:
+        if self._stopping:
+            return
+        held: set[Hashable] = set()
+        for job in self.jobs.values():
+            if job.state == "running":
+                held |= self.kinds[job.kind].stages
+        # Oldest first; a queued job also reserves its stages so later jobs
+        # cannot overtake it.
+        for job in sorted(self.jobs.values(), key=lambda job: job.created):
+            if job.state != "queued":
+                continue
+            stages = self.kinds[job.kind].stages
+            if not stages & held:
+                self._run(job)
+            held |= stages
+
+    def _run(self, job: Job) -> None:
+        job.state = "running"
+        job.started = time.time()
+        self.store.save(job)
+        job.task = asyncio.get_running_loop().create_task(self._execute(job))
+
+    async def _execute(self, job: Job) -> None:
+        state, summary = "completed", ""
+        try:
+            async for message in self.kinds[job.kind].run(job.params):
+                job.emit(message)
+                summary = message
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Left as running in the store; start() queues it again.
+                job.task = None
+                raise
+            state, summary = "cancelled", "Cancelled."
+            job.emit(summary)
+        except Exception as e:
+            logger.exception(f"{job.kind} job {job.id} failed")
+            state, summary = "failed", f"Job failed: {e}"
+            job.emit(summary)
+        job.task = None
+        self._finish(job, state, summary)
+        self._dispatch()
+
+    def _finish(self, job: Job, state: str, summary: str) -> None:
+        job.state = state
+        job.summary = summary
+        job.finished = time.time()
+        self.store.save(job)
+        job._notify()
+
+    def _prune(self) -> None:
+        finished = [job for job in self.list() if not job.active]
+        for job in finished[JOB_HISTORY:]:
+            del self.jobs[job.id]
@@ -1,20 +1,48 @@
 import asyncio
-import html
 import json
 import os
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, TypeVar
 
 import httpx
-import requests
 from dotenv import load_dotenv
 from loguru import logger
-from model import Analysis, AtomizedCaseOutput
-from ollama import AsyncClient
-from openai import OpenAI
+from pydantic import BaseModel
+
+from cache import cache_key, response_cache
+from chunking import Chunk, estimate_tokens, merge_analyses, split_opinions
+from ingest import read_opinions
+from model import Analysis, AtomizedCaseOutput, FusedCaseOutput
+from preprocess import enabled_steps, preprocess_opinions
+from providers import (
+    OPENROUTER_URL,
+    check_ollama,
+    http_client,
+    ollama_pool,
+    openai_client,
+)
+from repair import validate_or_repair
+from scheduler import OUTPUT_TOKEN_ESTIMATE, scheduler_for
+from store import output_store
+from streaming import (
+    CARD_CLOSE,
+    CARD_OPEN,
+    LIST_SECTIONS,
+    REPLACE_MARKER,
+    SECTION_CLOSE,
+    AnalysisHtmlStream,
+    header_html,
+    item_html,
+    outcome_html,
+    section_open_html,
+)
+from telemetry import CallRecord, begin_case, case_summary, stage_for, track_call
 
 load_dotenv()
 
+M = TypeVar("M", bound=BaseModel)
+
 LLM_PROVIDER = (
     os.getenv("LLM_PROVIDER", "ollama").strip().lower()
 )  # "ollama", "openrouter", or "openai"
@@ -23,12 +51,31 @@ OPENROUTER_MODEL = "google/gemma-3-12b-it:free"
 OLLAMA_MODEL = "gemma3:12b"
 OPENAI_MODEL = "gpt-4o-mini"
 
+# "two-pass" runs stage 2 as its own LLM call on the stage 1 output; "fused"
+# extracts both stages with one call to a combined schema and splits the result.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two-pass").strip().lower()
+
+# Chunked (map-reduce) stage 1 for long opinions: "off", "auto" (only opinions
+# over the budget) or "always".
+CHUNKED_EXTRACTION = os.getenv("CHUNKED_EXTRACTION", "off").strip().lower()
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "300"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+
 PROMPT_TEMPLATE = """
 Extract facts, identify legal issues, analyze reasonings, determine conclusions, and classify the case type (criminal or civil) from this case:
 
 {text}
 """
 
+CHUNK_PROMPT_TEMPLATE = """
+The following is an excerpt from a longer case opinion.
+Extract facts, identify legal issues, analyze reasonings, determine conclusions, and classify the case type (criminal or civil) from this excerpt only.
+If the excerpt does not state the outcome, describe the outcome as not stated.
+
+{text}
+"""
+
 ATOMIZE_PROMPT_TEMPLATE = """
 You are given the facts, legal issues, reasonings, outcomes, and case type from a case.
 Return JSON that matches the schema using the case type provided.
@@ -41,9 +88,12 @@ Facts, issues, reasonings, outcomes, and case type:
 {stage1_json}
 """
 
+FUSED_PROMPT_TEMPLATE = """
+Extract facts, identify legal issues, analyze reasonings, determine conclusions, and classify the case type (criminal or civil) from this case.
+Then fill in the structured details for that case type: set only the matching object (criminal or civil) and set the other to null.
 
-class OllamaNotRunningError(Exception):
-    pass
+{text}
+"""
 
 
 def build_full_opinion(data: dict) -> str:
@@ -52,242 +102,651 @@ def build_full_opinion(data: dict) -> str:
 
 
 def format_analysis_html(analysis: Analysis) -> str:
-    html_output = "<div class='stage1-card'>"
-    
+    html_output = CARD_OPEN
+
     # Header with case type badge
-    case_type_display = analysis.case_type.upper()
-    html_output += f"<div class='stage1-header'><span class='stage1-label'>Case Type</span><span class='stage1-badge'>{html.escape(case_type_display)}</span></div>"
-    
-    # Facts section
-    html_output += "<div class='stage1-section'><div class='stage1-section-title'>Facts</div><ul class='stage1-list'>"
-    for fact in analysis.facts:
-        html_output += f"<li>{html.escape(fact)}</li>"
-    html_output += "</ul></div>"
-    
-    # Legal Issues section
-    html_output += "<div class='stage1-section'><div class='stage1-section-title'>Legal Issues</div><ul class='stage1-list'>"
-    for issue in analysis.issues:
-        html_output += f"<li>{html.escape(issue)}</li>"
-    html_output += "</ul></div>"
-    
-    # Reasonings section
-    html_output += "<div class='stage1-section'><div class='stage1-section-title'>Reasonings</div><ul class='stage1-list'>"
-    for reasoning in analysis.reasonings:
-        html_output += f"<li>{html.escape(reasoning)}</li>"
-    html_output += "</ul></div>"
-    
+    html_output += header_html(analysis.case_type)
+
+    # Facts, Legal Issues and Reasonings sections
+    for field, title in LIST_SECTIONS.items():
+        html_output += section_open_html(title)
+        for item in getattr(analysis, field):
+            html_output += item_html(item)
+        html_output += SECTION_CLOSE
+
     # Outcome section
-    html_output += f"<div class='stage1-section'><div class='stage1-section-title'>Outcome</div><p class='stage1-outcome'>{html.escape(analysis.outcomes)}</p></div>"
-    
-    html_output += "</div>"
+    html_output += outcome_html(analysis.outcomes)
+
+    html_output += CARD_CLOSE
     return html_output
 
 
-async def _check_ollama() -> None:
-    try:
-        async with httpx.AsyncClient() as http_client:
-            await http_client.get("http://localhost:11434/api/tags", timeout=2.0)
-    except (httpx.ConnectError, httpx.TimeoutException):
-        raise OllamaNotRunningError(
-            "Ollama server not running. Start it with 'ollama serve' or open the Ollama app."
-        )
+# Called with (filename, analysis) after every stage 1 output is stored, in
+# the worker thread that stored it.
+stage1_listeners: list[Callable[[str, Analysis], None]] = []
 
 
-async def call_ollama(
-    prompt: str, save_path: Path | None = None
-) -> AsyncGenerator[str, None]:
-    client = AsyncClient()
-    stream = await client.chat(
-        model=OLLAMA_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        format=Analysis.model_json_schema(),
-        options={"temperature": 0},
-        stream=True,
+def _save_telemetry(output_name: str | None) -> None:
+    """Store this case's LLM call summary next to its outputs, one entry per stage."""
+    summary = case_summary()
+    if output_name and summary:
+        stored = output_store.get_meta(output_name).get("telemetry", {})
+        output_store.set_meta(output_name, "telemetry", {**stored, **summary})
+
+
+def _store_analysis(analysis: Analysis, output_name: str) -> None:
+    output_store.put(1, output_name, analysis, model=_provider_model())
+    _save_telemetry(output_name)
+    for listener in stage1_listeners:
+        try:
+            listener(output_name, analysis)
+        except Exception as e:
+            logger.warning(f"Stage 1 listener failed for {output_name}: {e}")
+
+
+async def _save_analysis(analysis: Analysis, output_name: str | None) -> None:
+    # SQLite commits and index log appends run off the event loop; the
+    # telemetry context is copied into the thread.
+    if output_name:
+        await asyncio.to_thread(_store_analysis, analysis, output_name)
+
+
+def _store_atomized(atomized: AtomizedCaseOutput, output_name: str, extracted: bool) -> None:
+    output_store.put(2, output_name, atomized, model=_provider_model())
+    if extracted:
+        _save_telemetry(output_name)
+
+
+def _provider_model() -> str:
+    if LLM_PROVIDER == "openrouter":
+        return OPENROUTER_MODEL
+    if LLM_PROVIDER == "openai":
+        return OPENAI_MODEL
+    return OLLAMA_MODEL
+
+
+def _response_cache_key(template: str, schema: type[BaseModel], text: str) -> str:
+    return cache_key(
+        LLM_PROVIDER, _provider_model(), template, schema.model_json_schema(), text
     )
-    full_response = ""
-    async for chunk in stream:
-        full_response += chunk["message"]["content"]
-    analysis = Analysis.model_validate_json(full_response)
-    if save_path:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path.write_text(analysis.model_dump_json(indent=2), encoding="utf-8")
+
+
+async def _cached_analysis(key: str) -> Analysis | None:
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is None:
+        return None
+    logger.info("Stage 1 answered from the LLM response cache")
+    return Analysis.model_validate_json(cached)
+
+
+async def _analysis_html(analysis: Analysis) -> AsyncGenerator[str, None]:
     yield format_analysis_html(analysis)
 
 
-async def _call_ollama_atomize(prompt: str) -> AtomizedCaseOutput:
-    client = AsyncClient()
-    stream = await client.chat(
-        model=OLLAMA_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        format=AtomizedCaseOutput.model_json_schema(),
-        options={"temperature": 0},
-        stream=True,
-    )
+async def _stream_analysis_html(
+    deltas: AsyncGenerator[str, None],
+    output_name: str | None,
+    response_key: str | None,
+) -> AsyncGenerator[str, None]:
+    """Yield HTML for each fact, issue and reasoning as soon as the model closes it.
+
+    The stream ends with `REPLACE_MARKER` and the HTML of the validated (possibly
+    repaired) Analysis, which the client shows in place of the fragments.
+    """
+    renderer: AnalysisHtmlStream | None = AnalysisHtmlStream()
     full_response = ""
-    async for chunk in stream:
-        full_response += chunk["message"]["content"]
-    return AtomizedCaseOutput.model_validate_json(full_response)
+    async for delta in deltas:
+        full_response += delta
+        if renderer is None:
+            continue
+        try:
+            fragments = renderer.feed(delta)
+        except Exception as e:
+            # Only the preview is lost; validation and repair still see the full response.
+            logger.warning(f"Incremental stage 1 rendering stopped: {e}")
+            renderer = None
+            continue
+        for fragment in fragments:
+            yield fragment
+    analysis = await _validate(full_response, Analysis)
+    if response_key:
+        await asyncio.to_thread(response_cache.put, response_key, analysis.model_dump_json())
+    await _save_analysis(analysis, output_name)
+    yield REPLACE_MARKER + format_analysis_html(analysis)
+
+
+async def _ollama_chat_stream(
+    prompt: str, schema: dict, stage: str | None = None
+) -> AsyncGenerator[str, None]:
+    with track_call("ollama", stage or stage_for(schema)) as record:
+        chunks = ollama_pool().stream(
+            lambda client: client.chat(
+                model=OLLAMA_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                format=schema,
+                options={"temperature": 0},
+                stream=True,
+            ),
+            on_retry=record.retry,
+        )
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                if chunk.get("done"):
+                    # The final chunk carries Ollama's own token counts and timings.
+                    record.usage(
+                        chunk.get("prompt_eval_count"),
+                        chunk.get("eval_count"),
+                        (chunk.get("eval_duration") or 0) / 1e9,
+                    )
+                content = chunk["message"]["content"]
+                if content:
+                    record.first_token()
+                yield content
+
+
+async def _ollama_chat(prompt: str, schema: dict, stage: str | None = None) -> str:
+    full_response = ""
+    async for delta in _ollama_chat_stream(prompt, schema, stage):
+        full_response += delta
+    return full_response
 
 
-def _call_openrouter(prompt: str, save_path: Path | None = None) -> str:
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": OPENROUTER_MODEL,
-        "messages": [
-            {
-                "role": "system",
-                "content": f"Respond only with valid JSON matching this schema: {json.dumps(Analysis.model_json_schema())}",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0,
-    }
+async def _call_ollama_analysis(prompt: str) -> Analysis:
+    full_response = await _ollama_chat(prompt, Analysis.model_json_schema())
+    return await _validate(full_response, Analysis)
 
-    response = requests.post(url, headers=headers, json=payload, timeout=120)
-    response.raise_for_status()
-    data = response.json()
-    content = data["choices"][0]["message"]["content"]
-    analysis = Analysis.model_validate_json(content)
-    if save_path:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path.write_text(analysis.model_dump_json(indent=2), encoding="utf-8")
-    return format_analysis_html(analysis)
-
-
-def _call_openrouter_atomize(prompt: str) -> AtomizedCaseOutput:
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": OPENROUTER_MODEL,
-        "messages": [
-            {
-                "role": "system",
-                "content": (
-                    "Respond only with valid JSON matching this schema: "
-                    f"{json.dumps(AtomizedCaseOutput.model_json_schema())}"
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0,
+
+async def _call_ollama_fused(prompt: str) -> FusedCaseOutput:
+    full_response = await _ollama_chat(prompt, FusedCaseOutput.model_json_schema())
+    return await _validate(full_response, FusedCaseOutput)
+
+
+async def call_ollama(
+    prompt: str, output_name: str | None = None, response_key: str | None = None
+) -> AsyncGenerator[str, None]:
+    deltas = _ollama_chat_stream(prompt, Analysis.model_json_schema())
+    async for fragment in _stream_analysis_html(deltas, output_name, response_key):
+        yield fragment
+
+
+async def _call_ollama_atomize(prompt: str) -> AtomizedCaseOutput:
+    full_response = await _ollama_chat(prompt, AtomizedCaseOutput.model_json_schema())
+    return await _validate(full_response, AtomizedCaseOutput)
+
+
+def _openrouter_request(prompt: str, schema: dict, stream: bool = False) -> dict:
+    return {
+        "headers": {
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        "json": {
+            "model": OPENROUTER_MODEL,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": f"Respond only with valid JSON matching this schema: {json.dumps(schema)}",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0,
+            "stream": stream,
+        },
     }
 
-    response = requests.post(url, headers=headers, json=payload, timeout=120)
-    response.raise_for_status()
-    data = response.json()
-    content = data["choices"][0]["message"]["content"]
-    return AtomizedCaseOutput.model_validate_json(content)
+
+def _request_tokens(prompt: str) -> int:
+    """Tokens a request is charged against a provider's TPM limit."""
+    return estimate_tokens(prompt) + OUTPUT_TOKEN_ESTIMATE
+
+
+def _record_openrouter_usage(record: CallRecord, data: dict) -> None:
+    usage = data.get("usage")
+    if usage:
+        record.usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+
+
+async def _openrouter_chat(prompt: str, schema: dict, stage: str | None = None) -> str:
+    async def post() -> httpx.Response:
+        response = await http_client().post(
+            OPENROUTER_URL, **_openrouter_request(prompt, schema)
+        )
+        response.raise_for_status()
+        return response
+
+    with track_call("openrouter", stage or stage_for(schema)) as record:
+        response = await scheduler_for("openrouter").run(
+            _request_tokens(prompt), post, on_retry=record.retry
+        )
+        data = response.json()
+        _record_openrouter_usage(record, data)
+    return data["choices"][0]["message"]["content"]
+
+
+@asynccontextmanager
+async def _openrouter_lines(prompt: str, schema: dict) -> AsyncIterator[AsyncIterator[str]]:
+    async with http_client().stream(
+        "POST", OPENROUTER_URL, **_openrouter_request(prompt, schema, stream=True)
+    ) as response:
+        response.raise_for_status()
+        yield response.aiter_lines()
+
+
+async def _openrouter_chat_stream(prompt: str, schema: dict) -> AsyncGenerator[str, None]:
+    with track_call("openrouter", stage_for(schema)) as record:
+        lines = scheduler_for("openrouter").stream(
+            _request_tokens(prompt),
+            lambda: _openrouter_lines(prompt, schema),
+            on_retry=record.retry,
+        )
+        # aclosing hands the request slot back as soon as [DONE] arrives.
+        async with aclosing(lines):
+            async for line in lines:
+                # Server-sent events; lines starting with ":" are keep-alive comments.
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: ") :]
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                # Usage arrives on the last event, after the final delta.
+                _record_openrouter_usage(record, event)
+                choices = event.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    record.first_token()
+                    yield delta
+
+
+async def _call_openrouter(prompt: str) -> Analysis:
+    content = await _openrouter_chat(prompt, Analysis.model_json_schema())
+    return await _validate(content, Analysis)
+
+
+async def _call_openrouter_atomize(prompt: str) -> AtomizedCaseOutput:
+    content = await _openrouter_chat(prompt, AtomizedCaseOutput.model_json_schema())
+    return await _validate(content, AtomizedCaseOutput)
+
+
+async def _call_openrouter_fused(prompt: str) -> FusedCaseOutput:
+    content = await _openrouter_chat(prompt, FusedCaseOutput.model_json_schema())
+    return await _validate(content, FusedCaseOutput)
 
 
 async def call_openrouter(
-    prompt: str, save_path: Path | None = None
+    prompt: str, output_name: str | None = None, response_key: str | None = None
 ) -> AsyncGenerator[str, None]:
-    content = await asyncio.to_thread(_call_openrouter, prompt, save_path)
-    yield content
-
-
-def _call_openai(prompt: str, save_path: Path | None = None) -> str:
-    client = OpenAI()
-    response = client.responses.parse(
-        model=OPENAI_MODEL,
-        input=[
-            {
-                "role": "system",
-                "content": "Extract facts, reasonings, and conclusions from this case.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        text_format=Analysis,
-    )
-    if save_path:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path.write_text(
-            response.output_parsed.model_dump_json(indent=2), encoding="utf-8"
+    deltas = _openrouter_chat_stream(prompt, Analysis.model_json_schema())
+    async for fragment in _stream_analysis_html(deltas, output_name, response_key):
+        yield fragment
+
+
+OPENAI_ANALYSIS_INSTRUCTIONS = "Extract facts, reasonings, and conclusions from this case."
+REPAIR_INSTRUCTIONS = "Respond with the corrected JSON matching the provided schema."
+
+
+def _record_openai_usage(record: CallRecord, response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record.usage(usage.input_tokens, usage.output_tokens)
+
+
+def _strict_schema(node, defs: dict):
+    """Rewrite one schema node to the subset OpenAI's strict mode accepts."""
+    if isinstance(node, list):
+        return [_strict_schema(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    node = dict(node)
+    # Strict mode rejects $ref with sibling keywords (e.g. a field description);
+    # inline the definition instead.
+    ref = node.get("$ref")
+    if ref is not None and len(node) > 1:
+        node.pop("$ref")
+        node = {**defs[ref.split("/")[-1]], **node}
+    all_of = node.get("allOf")
+    if all_of is not None and len(all_of) == 1:
+        node.pop("allOf")
+        node = {**all_of[0], **node}
+    if node.get("default", ...) is None:
+        del node["default"]
+    node = {
+        key: (
+            {name: _strict_schema(value, defs) for name, value in child.items()}
+            if key in ("properties", "$defs")
+            else _strict_schema(child, defs)
+        )
+        for key, child in node.items()
+    }
+    if node.get("type") == "object":
+        # Every property must be listed as required; optional ones are nullable instead.
+        node["additionalProperties"] = False
+        node["required"] = list(node.get("properties", {}))
+    return node
+
+
+def strict_json_schema(output_type: type[BaseModel]) -> dict:
+    """`output_type`'s JSON schema in OpenAI strict mode form."""
+    schema = output_type.model_json_schema()
+    return _strict_schema(schema, schema.get("$defs", {}))
+
+
+def _openai_text_format(output_type: type[BaseModel]) -> dict:
+    # The same strict schema `responses.parse` would send, but the raw JSON comes
+    # back to us so a near-miss can be repaired instead of raising in the SDK.
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": output_type.__name__,
+            "schema": strict_json_schema(output_type),
+            "strict": True,
+        }
+    }
+
+
+async def _openai_json(
+    instructions: str,
+    prompt: str,
+    output_type: type[BaseModel],
+    stage: str | None = None,
+) -> str:
+    stage = stage or stage_for(output_type.model_json_schema())
+    with track_call("openai", stage) as record:
+        response = await scheduler_for("openai").run(
+            _request_tokens(prompt),
+            lambda: openai_client().responses.create(
+                model=OPENAI_MODEL,
+                input=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": prompt},
+                ],
+                text=_openai_text_format(output_type),
+            ),
+            on_retry=record.retry,
+        )
+        _record_openai_usage(record, response)
+    return response.output_text
+
+
+async def _call_openai(prompt: str) -> Analysis:
+    content = await _openai_json(OPENAI_ANALYSIS_INSTRUCTIONS, prompt, Analysis)
+    return await _validate(content, Analysis)
+
+
+async def _openai_stream(prompt: str) -> AsyncGenerator[str, None]:
+    with track_call("openai", "stage1") as record:
+        events = scheduler_for("openai").stream(
+            _request_tokens(prompt),
+            lambda: openai_client().responses.stream(
+                model=OPENAI_MODEL,
+                input=[
+                    {"role": "system", "content": OPENAI_ANALYSIS_INSTRUCTIONS},
+                    {"role": "user", "content": prompt},
+                ],
+                text=_openai_text_format(Analysis),
+            ),
+            on_retry=record.retry,
         )
-    return format_analysis_html(response.output_parsed)
-
-
-def _call_openai_atomize(prompt: str) -> AtomizedCaseOutput:
-    client = OpenAI()
-    response = client.responses.parse(
-        model=OPENAI_MODEL,
-        input=[
-            {
-                "role": "system",
-                "content": (
-                    "Respond with JSON matching the provided schema. Use the case type "
-                    "provided in the input."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        text_format=AtomizedCaseOutput,
+        async with aclosing(events):
+            async for event in events:
+                if event.type == "response.output_text.delta":
+                    record.first_token()
+                    yield event.delta
+                elif event.type == "response.completed":
+                    _record_openai_usage(record, event.response)
+
+
+async def _call_openai_atomize(prompt: str) -> AtomizedCaseOutput:
+    content = await _openai_json(
+        "Respond with JSON matching the provided schema. Use the case type "
+        "provided in the input.",
+        prompt,
+        AtomizedCaseOutput,
     )
-    return response.output_parsed
+    return await _validate(content, AtomizedCaseOutput)
+
+
+async def _call_openai_fused(prompt: str) -> FusedCaseOutput:
+    content = await _openai_json(
+        f"{OPENAI_ANALYSIS_INSTRUCTIONS} Also fill in the structured "
+        "details for the case type and leave the other type null.",
+        prompt,
+        FusedCaseOutput,
+    )
+    return await _validate(content, FusedCaseOutput)
+
+
+def _repair_call(output_type: type[M]) -> Callable[[str], Awaitable[str]]:
+    """A provider call for `validate_or_repair`, labelled "repair" in telemetry."""
+    schema = output_type.model_json_schema()
+
+    async def complete(prompt: str) -> str:
+        if LLM_PROVIDER == "openrouter":
+            return await _openrouter_chat(prompt, schema, stage="repair")
+        if LLM_PROVIDER == "openai":
+            return await _openai_json(
+                REPAIR_INSTRUCTIONS, prompt, output_type, stage="repair"
+            )
+        return await _ollama_chat(prompt, schema, stage="repair")
+
+    return complete
+
+
+async def _validate(content: str, output_type: type[M]) -> M:
+    return await validate_or_repair(content, output_type, _repair_call(output_type))
 
 
 async def call_openai(
-    prompt: str, save_path: Path | None = None
+    prompt: str, output_name: str | None = None, response_key: str | None = None
 ) -> AsyncGenerator[str, None]:
-    content = await asyncio.to_thread(_call_openai, prompt, save_path)
-    yield content
+    async for fragment in _stream_analysis_html(
+        _openai_stream(prompt), output_name, response_key
+    ):
+        yield fragment
 
 
 async def stream_analysis(
-    full_opinion: str, save_path: Path | None = None
+    full_opinion: str, output_name: str | None = None
 ) -> AsyncGenerator[str, None]:
-    """Check provider availability and return the streaming generator."""
+    """Check the response cache and provider availability, then return the streaming generator."""
+    key = _response_cache_key(PROMPT_TEMPLATE, Analysis, full_opinion)
+    if (analysis := await _cached_analysis(key)) is not None:
+        await _save_analysis(analysis, output_name)
+        return _analysis_html(analysis)
+
     prompt = PROMPT_TEMPLATE.format(text=full_opinion)
 
     logger.info(f"Using LLM provider: {LLM_PROVIDER}")
 
     if LLM_PROVIDER == "openrouter":
-        return call_openrouter(prompt, save_path)
+        return call_openrouter(prompt, output_name, key)
     elif LLM_PROVIDER == "openai":
-        return call_openai(prompt, save_path)
+        return call_openai(prompt, output_name, key)
     else:
-        await _check_ollama()
-        return call_ollama(prompt, save_path)
+        await check_ollama()
+        return call_ollama(prompt, output_name, key)
+
+
+def _load_case(json_file: Path, output_name: str | None = None) -> dict:
+    # Stage 1 only reads the opinions, so decode just those (see ingest.read_opinions).
+    opinions = read_opinions(json_file.read_text(encoding="utf-8"))
+    steps = enabled_steps()
+    if steps:
+        opinions, stats = preprocess_opinions(opinions, steps)
+        logger.info(
+            f"Preprocessing removed {stats.tokens_removed} of {stats.tokens_before} tokens"
+        )
+        if output_name:
+            output_store.set_meta(output_name, "preprocess", stats.as_dict())
+    return {"casebody": {"opinions": opinions}}
 
 
 async def get_case_analysis_stream(
-    json_file: Path, output_file: Path, skip_if_exists: bool = False
+    json_file: Path, output_name: str | None = None, skip_if_exists: bool = False
 ) -> AsyncGenerator[str, None] | None:
-    if skip_if_exists and output_file.exists():
+    if (
+        skip_if_exists
+        and output_name
+        and await asyncio.to_thread(output_store.exists, 1, output_name)
+    ):
         return None
 
-    data = json.loads(json_file.read_text(encoding="utf-8"))
+    begin_case()
+    data = await asyncio.to_thread(_load_case, json_file, output_name)
+    if _use_chunking(data):
+        return _chunked_analysis_html(data, output_name)
     full_opinion = build_full_opinion(data)
-    return await stream_analysis(full_opinion, save_path=output_file)
+    return await stream_analysis(full_opinion, output_name=output_name)
 
 
-async def atomize_analysis(
-    analysis: Analysis, save_path: Path | None = None
-) -> AtomizedCaseOutput:
-    prompt = ATOMIZE_PROMPT_TEMPLATE.format(
-        stage1_json=analysis.model_dump_json(indent=2)
-    )
+async def _extract_analysis(text: str, template: str = PROMPT_TEMPLATE) -> Analysis:
+    key = _response_cache_key(template, Analysis, text)
+    if (analysis := await _cached_analysis(key)) is not None:
+        return analysis
+
+    prompt = template.format(text=text)
+
+    logger.info(f"Using LLM provider: {LLM_PROVIDER}")
+
+    if LLM_PROVIDER == "openrouter":
+        analysis = await _call_openrouter(prompt)
+    elif LLM_PROVIDER == "openai":
+        analysis = await _call_openai(prompt)
+    else:
+        await check_ollama()
+        analysis = await _call_ollama_analysis(prompt)
+
+    await asyncio.to_thread(response_cache.put, key, analysis.model_dump_json())
+    return analysis
+
+
+async def analyze_opinion(
+    full_opinion: str, output_name: str | None = None
+) -> Analysis:
+    """Run stage 1 on an opinion and return the validated Analysis."""
+    analysis = await _extract_analysis(full_opinion)
+    await _save_analysis(analysis, output_name)
+    return analysis
+
+
+def _use_chunking(data: dict) -> bool:
+    if CHUNKED_EXTRACTION == "always":
+        return True
+    if CHUNKED_EXTRACTION == "auto":
+        return estimate_tokens(build_full_opinion(data)) > CHUNK_TOKEN_BUDGET
+    return False
+
+
+async def analyze_chunked(data: dict, output_name: str | None = None) -> Analysis:
+    """Map-reduce stage 1: extract each chunk of the opinions concurrently, then merge."""
+    opinions = data.get("casebody", {}).get("opinions", [])
+    chunks = split_opinions(opinions, CHUNK_TOKEN_BUDGET, CHUNK_OVERLAP_TOKENS)
+    if not chunks:
+        return await analyze_opinion(build_full_opinion(data), output_name)
+
+    logger.info(f"Extracting stage 1 from {len(chunks)} chunks")
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def extract(chunk: Chunk) -> Analysis:
+        async with semaphore:
+            return await _extract_analysis(chunk.text, CHUNK_PROMPT_TEMPLATE)
+
+    parts = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+    analysis = merge_analyses(list(zip(chunks, parts)))
+    await _save_analysis(analysis, output_name)
+    return analysis
+
+
+async def _chunked_analysis_html(
+    data: dict, output_name: str | None
+) -> AsyncGenerator[str, None]:
+    analysis = await analyze_chunked(data, output_name)
+    yield format_analysis_html(analysis)
+
+
+async def analyze_case(json_file: Path, output_name: str | None = None) -> Analysis:
+    begin_case()
+    data = await asyncio.to_thread(_load_case, json_file, output_name)
+    if _use_chunking(data):
+        return await analyze_chunked(data, output_name=output_name)
+    return await analyze_opinion(build_full_opinion(data), output_name=output_name)
+
+
+async def analyze_case_fused(
+    json_file: Path, output_name: str | None = None
+) -> tuple[Analysis, AtomizedCaseOutput | None]:
+    """Extract stages 1 and 2 with one LLM call (PIPELINE_MODE=fused).
+
+    The Analysis is saved as `analyze_case` would; the atomized half is
+    returned for `atomize_analysis(..., atomized=...)` to store. Opinions that
+    need chunking fall back to chunked stage 1 and return None for stage 2.
+    """
+    begin_case()
+    data = await asyncio.to_thread(_load_case, json_file, output_name)
+    if _use_chunking(data):
+        return await analyze_chunked(data, output_name=output_name), None
+
+    full_opinion = build_full_opinion(data)
+    key = _response_cache_key(FUSED_PROMPT_TEMPLATE, FusedCaseOutput, full_opinion)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        logger.info("Fused stages answered from the LLM response cache")
+        fused = FusedCaseOutput.model_validate_json(cached)
+    else:
+        prompt = FUSED_PROMPT_TEMPLATE.format(text=full_opinion)
+        logger.info(f"Using LLM provider for fused stages: {LLM_PROVIDER}")
+
+        if LLM_PROVIDER == "openrouter":
+            fused = await _call_openrouter_fused(prompt)
+        elif LLM_PROVIDER == "openai":
+            fused = await _call_openai_fused(prompt)
+        else:
+            await check_ollama()
+            fused = await _call_ollama_fused(prompt)
+        await asyncio.to_thread(response_cache.put, key, fused.model_dump_json())
+
+    analysis, atomized = fused.split()
+    await _save_analysis(analysis, output_name)
+    return analysis, atomized
+
+
+async def _extract_atomized(analysis: Analysis) -> AtomizedCaseOutput:
+    stage1_json = analysis.model_dump_json(indent=2)
+    key = _response_cache_key(ATOMIZE_PROMPT_TEMPLATE, AtomizedCaseOutput, stage1_json)
+    cached = await asyncio.to_thread(response_cache.get, key)
+    if cached is not None:
+        logger.info("Stage 2 answered from the LLM response cache")
+        return AtomizedCaseOutput.model_validate_json(cached)
+
+    prompt = ATOMIZE_PROMPT_TEMPLATE.format(stage1_json=stage1_json)
     logger.info(f"Using LLM provider for stage 2: {LLM_PROVIDER}")
 
     if LLM_PROVIDER == "openrouter":
-        atomized = await asyncio.to_thread(_call_openrouter_atomize, prompt)
+        atomized = await _call_openrouter_atomize(prompt)
     elif LLM_PROVIDER == "openai":
-        atomized = await asyncio.to_thread(_call_openai_atomize, prompt)
+        atomized = await _call_openai_atomize(prompt)
     else:
-        await _check_ollama()
+        await check_ollama()
         atomized = await _call_ollama_atomize(prompt)
+    await asyncio.to_thread(response_cache.put, key, atomized.model_dump_json())
+    return atomized
+
+
+async def atomize_analysis(
+    analysis: Analysis,
+    output_name: str | None = None,
+    atomized: AtomizedCaseOutput | None = None,
+) -> AtomizedCaseOutput:
+    """Run stage 2 on `analysis`, or just store `atomized` from a fused extraction."""
+    # A fused extraction already recorded its call under stage 1.
+    extracted = atomized is None
+    if extracted:
+        begin_case()
+        atomized = await _extract_atomized(analysis)
 
     # Copy case_type from stage 1 instead of using extracted value
     atomized.case_type = analysis.case_type
 
-    if save_path:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
-        save_path.write_text(atomized.model_dump_json(indent=2), encoding="utf-8")
+    if output_name:
+        await asyncio.to_thread(_store_atomized, atomized, output_name, extracted)
     return atomized
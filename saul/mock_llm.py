@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# A stand-in for Ollama (/api/chat, /api/embed, /api/tags) and
+# OpenAI-compatible chat completions (/v1/chat/completions, as used for
+# OpenRouter) that answers with random JSON matching the requested schema.
+# Used by bench_pipeline.py to time the pipeline without a real model.
+
+# Seconds before the first chunk of every response.
+MOCK_LLM_TTFT = float(os.getenv("MOCK_LLM_TTFT", "0.05"))
+# Characters of JSON per streamed chunk and seconds between chunks.
+MOCK_LLM_CHUNK_CHARS = int(os.getenv("MOCK_LLM_CHUNK_CHARS", "16"))
+MOCK_LLM_CHUNK_DELAY = float(os.getenv("MOCK_LLM_CHUNK_DELAY", "0"))
+# Share of requests answered with a 503 (Ollama) or a 429 with Retry-After.
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+# Share of responses cut off mid-JSON.
+MOCK_LLM_MALFORMED_RATE = float(os.getenv("MOCK_LLM_MALFORMED_RATE", "0"))
+MOCK_EMBED_DIM = 64
+
+# Small vocabulary so generated facts share terms across cases, like real ones.
+WORDS = [
+    f"{stem}{suffix}"
+    for stem in (
+        "warrant", "search", "vehicle", "consent", "contract", "lease", "injury",
+        "officer", "witness", "statement", "property", "damage", "payment",
+        "employer", "driver", "weapon", "evidence", "tenant", "notice", "loan",
+    )
+    for suffix in ("", "al", "ing", "ed", "less")
+]
+SCHEMA_PREFIX = "matching this schema: "
+
+
+def sample_instance(schema: dict, rng: random.Random, root: dict | None = None):
+    """A random value that validates against a Pydantic-generated JSON schema."""
+    root = root or schema
+    if "$ref" in schema:
+        return sample_instance(root["$defs"][schema["$ref"].split("/")[-1]], rng, root)
+    if "anyOf" in schema:
+        # Prefer the non-null branch so case-type objects are always present.
+        options = [o for o in schema["anyOf"] if o.get("type") != "null"] or schema["anyOf"]
+        return sample_instance(options[0], rng, root)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "const" in schema:
+        return schema["const"]
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            key: sample_instance(value, rng, root)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [sample_instance(schema.get("items", {}), rng, root) for _ in range(rng.randint(2, 6))]
+    if kind == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 5))
+    if kind == "number":
+        return round(rng.uniform(schema.get("minimum", 0), schema.get("maximum", 100_000)), 3)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return " ".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+
+
+def _response_text(schema: dict, rng: random.Random) -> str:
+    text = json.dumps(sample_instance(schema, rng))
+    if rng.random() < MOCK_LLM_MALFORMED_RATE:
+        text = text[: rng.randint(1, len(text) - 1)]
+    return text
+
+
+def _chunks(text: str) -> list[str]:
+    size = max(1, MOCK_LLM_CHUNK_CHARS)
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+app = FastAPI()
+rng = random.Random(int(os.getenv("MOCK_LLM_SEED", "0")))
+stats = {"requests": 0, "errors": 0}
+
+
+def _fail() -> bool:
+    stats["requests"] += 1
+    if rng.random() < MOCK_LLM_ERROR_RATE:
+        stats["errors"] += 1
+        return True
+    return False
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": []}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    inputs = body.get("input") or []
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    return {
+        "model": body.get("model"),
+        "embeddings": [
+            [random.Random(text).uniform(-1, 1) for _ in range(MOCK_EMBED_DIM)]
+            for text in inputs
+        ],
+    }
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    if _fail():
+        return JSONResponse({"error": "mock overloaded"}, status_code=503)
+    text = _response_text(body.get("format") or {}, rng)
+    prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+    model = body.get("model", "mock")
+    started = time.perf_counter_ns()
+
+    async def stream():
+        await asyncio.sleep(MOCK_LLM_TTFT)
+        for chunk in _chunks(text):
+            message = {"role": "assistant", "content": chunk}
+            yield json.dumps({"model": model, "message": message, "done": False}) + "\n"
+            if MOCK_LLM_CHUNK_DELAY:
+                await asyncio.sleep(MOCK_LLM_CHUNK_DELAY)
+        elapsed = time.perf_counter_ns() - started
+        yield json.dumps(
+            {
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": elapsed,
+                "prompt_eval_count": _tokens(prompt),
+                "prompt_eval_duration": int(MOCK_LLM_TTFT * 1e9),
+                "eval_count": _tokens(text),
+                "eval_duration": max(1, elapsed - int(MOCK_LLM_TTFT * 1e9)),
+            }
+        ) + "\n"
+
+    if body.get("stream", True):
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+    await asyncio.sleep(MOCK_LLM_TTFT)
+    return {"model": model, "message": {"role": "assistant", "content": text}, "done": True}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if _fail():
+        return JSONResponse(
+            {"error": {"message": "mock rate limit", "code": 429}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+    messages = body.get("messages", [])
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    schema = json.loads(system.split(SCHEMA_PREFIX, 1)[1]) if SCHEMA_PREFIX in system else {}
+    text = _response_text(schema, rng)
+    prompt = "".join(m.get("content", "") for m in messages)
+    usage = {
+        "prompt_tokens": _tokens(prompt),
+        "completion_tokens": _tokens(text),
+        "total_tokens": _tokens(prompt) + _tokens(text),
+    }
+
+    async def stream():
+        await asyncio.sleep(MOCK_LLM_TTFT)
+        for chunk in _chunks(text):
+            yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': chunk}}]})}\n\n"
+            if MOCK_LLM_CHUNK_DELAY:
+                await asyncio.sleep(MOCK_LLM_CHUNK_DELAY)
+        yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    if body.get("stream"):
+        return StreamingResponse(stream(), media_type="text/event-stream")
+    await asyncio.sleep(MOCK_LLM_TTFT)
+    return {
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+        "usage": usage,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host="127.0.0.1",
+        port=int(os.getenv("MOCK_LLM_PORT", "11500")),
+        log_level="warning",
+    )
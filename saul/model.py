@@ -44,6 +44,15 @@ class CivilAtomizedCase(BaseModel):
     is_settlement: bool = False
 
 
+def _check_case_data(output):
+    """Require the criminal or civil block that matches `case_type`."""
+    if output.case_type == "criminal" and output.criminal is None:
+        raise ValueError("criminal case_type requires criminal data")
+    if output.case_type == "civil" and output.civil is None:
+        raise ValueError("civil case_type requires civil data")
+    return output
+
+
 class AtomizedCaseOutput(BaseModel):
     case_type: Literal["criminal", "civil"]
     issues: List[str] = Field(
@@ -54,8 +63,26 @@ class AtomizedCaseOutput(BaseModel):
 
     @model_validator(mode="after")
     def validate_case_data(self):
-        if self.case_type == "criminal" and self.criminal is None:
-            raise ValueError("criminal case_type requires criminal data")
-        if self.case_type == "civil" and self.civil is None:
-            raise ValueError("civil case_type requires civil data")
-        return self
+        return _check_case_data(self)
+
+
+class FusedCaseOutput(Analysis):
+    """Stage 1 and stage 2 fields extracted in a single LLM call."""
+
+    criminal: Optional[CriminalAtomizedCase] = None
+    civil: Optional[CivilAtomizedCase] = None
+
+    @model_validator(mode="after")
+    def validate_case_data(self):
+        return _check_case_data(self)
+
+    def split(self) -> tuple[Analysis, AtomizedCaseOutput]:
+        """The stage 1 Analysis and stage 2 AtomizedCaseOutput this output combines."""
+        analysis = Analysis(**self.model_dump(include=set(Analysis.model_fields)))
+        atomized = AtomizedCaseOutput(
+            case_type=self.case_type,
+            issues=self.issues,
+            criminal=self.criminal if self.case_type == "criminal" else None,
+            civil=self.civil if self.case_type == "civil" else None,
+        )
+        return analysis, atomized
@@ -0,0 +1,189 @@
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from chunking import estimate_tokens
+
+# Comma-separated steps applied to opinion text before it reaches the prompt:
+# "off" (default), "all", or any of STEPS, e.g. "whitespace,footnotes".
+OPINION_PREPROCESS = os.getenv("OPINION_PREPROCESS", "off").strip().lower()
+
+# Order matters: markers and whitespace are normalized before paragraphs are
+# compared for duplicates and scanned for footnotes.
+STEPS = ("page_markers", "whitespace", "duplicates", "citations", "footnotes")
+
+# Star paging ("*1234", "**56") and bracketed editorial notes.
+_PAGE_MARKER = re.compile(r"\s?\*{1,2}\d{1,5}\b|\[(?:Editor's|Reporter's) [Nn]ote[^\]]*\]")
+# A reporter citation: volume, reporter abbreviation, first page
+# ("25 Cal.4th 1", "530 U.S. 466", "120 S.Ct. 2348", "2 F.3d 10",
+# "48 Cal. App. 4th 1"). Every word of the reporter ends in a period, so dates
+# ("12 March 2001") and other number-word-number prose do not match; month
+# abbreviations ("3 Jan. 2001") are excluded by name.
+_CITATION = re.compile(
+    r"\b\d{1,4} "
+    r"(?!(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\.)"
+    r"[A-Z][A-Za-z]{0,7}\.(?:\s?[A-Z][A-Za-z]{0,7}\.)*"
+    r"(?:\s?\d{1,2}(?:d|th|st|nd|rd)\.?)? \d{1,5}\b"
+)
+# A footnote paragraph as CAP renders it: its marker, then the note. Numbered
+# markers only count when the opinion body refers to them (see _referenced).
+_FOOTNOTE = re.compile(r"^(\[\d{1,3}\]|\*{1,3}|†|fn\.\s?\d{1,3}|\d{1,3})\s+\S")
+
+# Paragraphs this short that recur verbatim are captions and running heads.
+DUPLICATE_MAX_CHARS = 300
+# String citations of at least this many cites keep only the first and last.
+CITATION_RUN_MIN = 3
+CITATION_MAX_CHARS = 160
+# Never strip more than this share of an opinion as footnotes.
+FOOTNOTE_MAX_SHARE = 0.5
+
+
+def enabled_steps(setting: str = OPINION_PREPROCESS) -> tuple[str, ...]:
+    if setting in ("", "off", "0", "false", "no"):
+        return ()
+    if setting == "all":
+        return STEPS
+    requested = {step.strip() for step in setting.split(",") if step.strip()}
+    unknown = requested - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown OPINION_PREPROCESS steps: {sorted(unknown)}")
+    return tuple(step for step in STEPS if step in requested)
+
+
+@dataclass
+class PreprocessStats:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    removed: Counter = field(default_factory=Counter)
+
+    @property
+    def tokens_removed(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> dict:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_removed": self.tokens_removed,
+            "removed_by_step": dict(self.removed),
+        }
+
+
+def _page_markers(text: str, seen: set[str]) -> str:
+    return _PAGE_MARKER.sub("", text)
+
+
+def _whitespace(text: str, seen: set[str]) -> str:
+    lines = (" ".join(line.split()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _duplicates(text: str, seen: set[str]) -> str:
+    # `seen` spans every opinion of a case, so a caption repeated at the top of
+    # a concurrence or dissent is dropped there too.
+    kept = []
+    for paragraph in text.split("\n"):
+        key = paragraph.strip().lower()
+        if key and len(key) <= DUPLICATE_MAX_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(paragraph)
+    return "\n".join(kept)
+
+
+def _citations(text: str, seen: set[str]) -> str:
+    pieces = text.split("; ")
+    kept: list[str] = []
+    run: list[str] = []
+
+    def flush() -> None:
+        if len(run) >= CITATION_RUN_MIN:
+            kept.extend([run[0], f"[{len(run) - 2} citations omitted]", run[-1]])
+        else:
+            kept.extend(run)
+        run.clear()
+
+    for piece in pieces:
+        # Only the middle of a run is dropped, so prose before the first cite
+        # and after the last one always survives.
+        if len(piece) <= CITATION_MAX_CHARS and _CITATION.search(piece):
+            run.append(piece)
+        else:
+            flush()
+            kept.append(piece)
+    flush()
+    return "; ".join(kept)
+
+
+def _referenced(marker: str, body: str) -> bool:
+    """Whether `body` cites footnote `marker` the way CAP marks it in the text.
+
+    Numbered footnotes are referenced as "[3]", "fn. 3" or a number set right
+    after a word or punctuation ("the search.3"); a trailing numbered list
+    whose numbers the body never cites is not footnotes.
+    """
+    number = re.sub(r"\D", "", marker)
+    if not number:
+        return True
+    return bool(
+        re.search(
+            rf"\[{number}\]|\bfn\.\s?{number}\b|[A-Za-z.,;:)\"”’]{number}(?![\dA-Za-z])",
+            body,
+        )
+    )
+
+
+def _footnotes(text: str, seen: set[str]) -> str:
+    """Drop the trailing block of footnote paragraphs CAP appends to an opinion."""
+    paragraphs = text.split("\n")
+    start = len(paragraphs)
+    markers = []
+    while start > 1:
+        match = _FOOTNOTE.match(paragraphs[start - 1].lstrip())
+        if not match:
+            break
+        markers.append(match.group(1))
+        start -= 1
+    body = "\n".join(paragraphs[:start])
+    cut = len(paragraphs)
+    for marker in markers:
+        if not _referenced(marker, body):
+            break
+        cut -= 1
+    if cut == len(paragraphs):
+        return text
+    kept = "\n".join(paragraphs[:cut])
+    if len(kept) < len(text) * (1 - FOOTNOTE_MAX_SHARE):
+        return text
+    return kept
+
+
+_STEP_FUNCTIONS = {
+    "page_markers": _page_markers,
+    "whitespace": _whitespace,
+    "duplicates": _duplicates,
+    "citations": _citations,
+    "footnotes": _footnotes,
+}
+
+
+def preprocess_opinions(
+    opinions: list[dict], steps: tuple[str, ...] | None = None
+) -> tuple[list[dict], PreprocessStats]:
+    """Copies of `opinions` with boilerplate stripped, and the tokens each step removed."""
+    steps = enabled_steps() if steps is None else steps
+    stats = PreprocessStats()
+    seen: set[str] = set()
+    cleaned = []
+    for opinion in opinions:
+        text = opinion.get("text", "")
+        stats.tokens_before += estimate_tokens(text)
+        for step in steps:
+            before = estimate_tokens(text)
+            text = _STEP_FUNCTIONS[step](text, seen)
+            stats.removed[step] += before - estimate_tokens(text)
+        stats.tokens_after += estimate_tokens(text)
+        cleaned.append({**opinion, "text": text})
+    return cleaned, stats
@@ -0,0 +1,324 @@
+import asyncio
+import os
+import time
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+from dotenv import load_dotenv
+from loguru import logger
+from ollama import AsyncClient
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+T = TypeVar("T")
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+# Comma-separated Ollama servers to spread requests over, each optionally
+# suffixed with "=N" to cap its concurrent requests, e.g.
+# "http://box1:11434=4,http://box2:11434". Defaults to OLLAMA_HOST alone.
+OLLAMA_HOSTS = os.getenv("OLLAMA_HOSTS", OLLAMA_HOST)
+# Requests in flight per host unless the host sets its own cap; match the
+# server's OLLAMA_NUM_PARALLEL.
+OLLAMA_HOST_CONCURRENCY = int(os.getenv("OLLAMA_HOST_CONCURRENCY", "2"))
+OPENROUTER_URL = os.getenv(
+    "OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions"
+)
+# How long a successful Ollama health check is trusted before pinging again.
+HEALTH_CHECK_TTL = float(os.getenv("OLLAMA_HEALTH_TTL", "30"))
+# A failed host is re-probed after this delay, doubling per consecutive failure.
+HOST_RETRY_BASE = 5.0
+HOST_RETRY_MAX = 300.0
+
+HTTP_LIMITS = httpx.Limits(
+    max_connections=64, max_keepalive_connections=32, keepalive_expiry=120
+)
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+
+class OllamaNotRunningError(Exception):
+    pass
+
+
+# Errors that mean the host itself is unreachable, not that the request was bad;
+# the ollama client re-raises httpx.ConnectError as ConnectionError.
+HOST_DOWN_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, ConnectionError)
+
+
+def parse_ollama_hosts(value: str) -> list[tuple[str, int]]:
+    """(url, max concurrent requests) for each entry of OLLAMA_HOSTS."""
+    hosts = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, cap = entry.rpartition("=")
+        if url and cap.isdigit():
+            hosts.append((url.rstrip("/"), max(1, int(cap))))
+        else:
+            hosts.append((entry.rstrip("/"), OLLAMA_HOST_CONCURRENCY))
+    return hosts
+
+
+class OllamaHost:
+    """One Ollama server: its client, requests in flight and health."""
+
+    def __init__(self, url: str, max_outstanding: int):
+        self.url = url
+        self.max_outstanding = max_outstanding
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.checked_at = 0.0
+        self.retry_at = 0.0
+        self.completed = 0
+        self._client: AsyncClient | None = None
+        self._transport: httpx.AsyncHTTPTransport | None = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None:
+            # ollama builds its own httpx client from a class, so the host owns
+            # the transport (and its connection pool) and closes that instead.
+            self._transport = httpx.AsyncHTTPTransport(limits=HTTP_LIMITS)
+            self._client = AsyncClient(host=self.url, transport=self._transport)
+        return self._client
+
+    def available(self) -> bool:
+        return self.healthy and self.outstanding < self.max_outstanding
+
+    def mark_down(self) -> None:
+        self.failures += 1
+        self.retry_at = time.monotonic() + min(
+            HOST_RETRY_MAX, HOST_RETRY_BASE * 2 ** (self.failures - 1)
+        )
+        if self.healthy:
+            logger.warning(f"Ollama host {self.url} is down; removed from the pool")
+        self.healthy = False
+
+    def mark_up(self) -> None:
+        if not self.healthy:
+            logger.info(f"Ollama host {self.url} is back; re-added to the pool")
+        self.healthy = True
+        self.failures = 0
+        self.checked_at = time.monotonic()
+
+    async def probe(self) -> bool:
+        try:
+            await http_client().get(f"{self.url}/api/tags", timeout=2.0)
+        except (httpx.TransportError, OSError):
+            self.mark_down()
+            return False
+        self.mark_up()
+        return True
+
+    async def close(self) -> None:
+        if self._transport is not None:
+            await self._transport.aclose()
+        self._client = None
+        self._transport = None
+
+
+class OllamaPool:
+    """Routes each request to the healthy host with the fewest requests in flight.
+
+    Hosts never get more than their own cap of concurrent requests. A host
+    that refuses connections is taken out of rotation and its request is
+    retried on another host; it is re-probed after an exponential backoff and
+    rejoins once it answers.
+    """
+
+    def __init__(self, hosts: list[tuple[str, int]]):
+        if not hosts:
+            raise ValueError("OLLAMA_HOSTS lists no hosts")
+        self.hosts = [OllamaHost(url, cap) for url, cap in hosts]
+        self._cond = asyncio.Condition()
+
+    def capacity(self) -> int:
+        """Concurrent requests the pool accepts when every host is healthy."""
+        return sum(host.max_outstanding for host in self.hosts)
+
+    async def _revive(self) -> None:
+        now = time.monotonic()
+        due = [h for h in self.hosts if not h.healthy and h.retry_at <= now]
+        if due and any(await asyncio.gather(*(h.probe() for h in due))):
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def check(self) -> None:
+        """Probe hosts whose last check is stale; raise if none is reachable."""
+        now = time.monotonic()
+        stale = [
+            h for h in self.hosts if h.healthy and now - h.checked_at >= HEALTH_CHECK_TTL
+        ]
+        await asyncio.gather(*(h.probe() for h in stale))
+        await self._revive()
+        if not any(h.healthy for h in self.hosts):
+            raise OllamaNotRunningError(
+                "Ollama server not running. Start it with 'ollama serve' or open the Ollama app."
+                if len(self.hosts) == 1
+                else f"None of the {len(self.hosts)} Ollama hosts in OLLAMA_HOSTS is reachable."
+            )
+
+    async def _acquire(self) -> OllamaHost:
+        while True:
+            await self._revive()
+            async with self._cond:
+                ready = [h for h in self.hosts if h.available()]
+                if ready:
+                    host = min(ready, key=lambda h: (h.outstanding, -h.max_outstanding))
+                    host.outstanding += 1
+                    return host
+                any_healthy = any(h.healthy for h in self.hosts)
+                if any_healthy:
+                    try:
+                        # Wake up now and then so downed hosts get re-probed.
+                        await asyncio.wait_for(self._cond.wait(), HOST_RETRY_BASE)
+                    except asyncio.TimeoutError:
+                        pass
+            if not any_healthy:
+                await self.check()
+
+    async def _release(self, host: OllamaHost, completed: bool) -> None:
+        async with self._cond:
+            host.outstanding -= 1
+            host.completed += completed
+            self._cond.notify_all()
+
+    async def run(
+        self,
+        call: Callable[[AsyncClient], Awaitable[T]],
+        on_retry: Callable[[], None] | None = None,
+    ) -> T:
+        """Await `call(client)` on a pooled host, failing over if the host is down."""
+        attempt = 0
+        while True:
+            host = await self._acquire()
+            completed = False
+            try:
+                result = await call(host.client)
+                completed = True
+                return result
+            except HOST_DOWN_ERRORS:
+                host.mark_down()
+                if attempt >= len(self.hosts):
+                    raise
+                if on_retry:
+                    on_retry()
+            finally:
+                await self._release(host, completed)
+            attempt += 1
+
+    async def stream(
+        self,
+        open_stream: Callable[[AsyncClient], Awaitable[AsyncIterator[T]]],
+        on_retry: Callable[[], None] | None = None,
+    ) -> AsyncGenerator[T, None]:
+        """Like `run` for a streamed response; fails over only before the first item."""
+        attempt = 0
+        while True:
+            host = await self._acquire()
+            started = False
+            completed = False
+            try:
+                async for item in await open_stream(host.client):
+                    started = True
+                    yield item
+                completed = True
+                return
+            except HOST_DOWN_ERRORS:
+                host.mark_down()
+                if started or attempt >= len(self.hosts):
+                    raise
+                if on_retry:
+                    on_retry()
+            finally:
+                await self._release(host, completed)
+            attempt += 1
+
+    async def close(self) -> None:
+        for host in self.hosts:
+            await host.close()
+
+    def status(self) -> list[dict]:
+        return [
+            {
+                "url": h.url,
+                "healthy": h.healthy,
+                "outstanding": h.outstanding,
+                "max_outstanding": h.max_outstanding,
+                "completed": h.completed,
+            }
+            for h in self.hosts
+        ]
+
+
+class _Clients:
+    """Process-wide provider clients, rebuilt if the event loop changes."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.http: httpx.AsyncClient | None = None
+        self.ollama: OllamaPool | None = None
+        self.openai: AsyncOpenAI | None = None
+
+    def ensure_loop(self) -> None:
+        # httpx connection pools are bound to the loop they were opened on, so
+        # a second asyncio.run() in the same process needs fresh clients.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.reset()
+            self.loop = loop
+
+
+_clients = _Clients()
+
+
+def http_client() -> httpx.AsyncClient:
+    _clients.ensure_loop()
+    if _clients.http is None:
+        _clients.http = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _clients.http
+
+
+def ollama_pool() -> OllamaPool:
+    _clients.ensure_loop()
+    if _clients.ollama is None:
+        _clients.ollama = OllamaPool(parse_ollama_hosts(OLLAMA_HOSTS))
+    return _clients.ollama
+
+
+def ollama_capacity() -> int:
+    """Concurrent Ollama requests the configured hosts accept, without a running loop."""
+    return sum(cap for _, cap in parse_ollama_hosts(OLLAMA_HOSTS))
+
+
+def openai_client() -> AsyncOpenAI:
+    _clients.ensure_loop()
+    if _clients.openai is None:
+        # Retries are left to the scheduler, which shares rate limits across workers.
+        _clients.openai = AsyncOpenAI(
+            http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+            max_retries=0,
+        )
+    return _clients.openai
+
+
+async def check_ollama() -> None:
+    await ollama_pool().check()
+
+
+async def close_providers() -> None:
+    if _clients.loop is not asyncio.get_running_loop():
+        return
+    if _clients.ollama is not None:
+        await _clients.ollama.close()
+    if _clients.openai is not None:
+        await _clients.openai.close()
+    if _clients.http is not None:
+        await _clients.http.aclose()
+    logger.info("Closed LLM provider clients")
+    _clients.reset()
@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import torch
+from ingest import Corpus
+from loguru import logger
+from store import OutputStore
+
+# Auth(p): binding power by court level, matched against the CAP court name.
+# Checked in order, so intermediate appellate courts are matched before the
+# generic "court" fallbacks.
+AUTHORITY_LEVELS = [
+    ("supreme court", 1.0),
+    ("court of appeal", 0.75),
+    ("appellate", 0.75),
+    ("superior court", 0.5),
+    ("district court", 0.5),
+]
+DEFAULT_AUTHORITY = 0.5
+
+# Outcome labels M_p derived from the stage 1 outcome text. Reversal language
+# is checked first so "reversed and remanded" is not read as an affirmance.
+OUTCOME_LABELS = ["affirmed", "reversed", "dismissed", "settled"]
+OUTCOME_PATTERNS = [
+    ("reversed", re.compile(r"\b(revers|vacat|overturn|overrul)")),
+    ("affirmed", re.compile(r"\b(affirm|uph[eo]ld)")),
+    ("dismissed", re.compile(r"\bdismiss")),
+]
+NO_OUTCOME = -1
+
+DEFAULT_WEIGHTS = {"sim": 1.0, "auth": 0.25, "align": 0.5}
+REFRESH_INTERVAL = 2.0
+CANDIDATE_CACHE_SIZE = 32
+
+
+def court_authority(court_name: str | None) -> float:
+    name = (court_name or "").lower()
+    for marker, authority in AUTHORITY_LEVELS:
+        if marker in name:
+            return authority
+    return DEFAULT_AUTHORITY
+
+
+def outcome_label(outcomes: str, is_settlement: bool = False) -> str | None:
+    if is_settlement:
+        return "settled"
+    text = outcomes.lower()
+    for label, pattern in OUTCOME_PATTERNS:
+        if pattern.search(text):
+            return label
+    return None
+
+
+@dataclass(frozen=True)
+class Columns:
+    """One build of the authority and outcome columns; replaced whole, never mutated."""
+
+    filenames: list[str]
+    rows: dict[str, int]
+    authority: torch.Tensor
+    outcome: torch.Tensor
+
+
+EMPTY_COLUMNS = Columns([], {}, torch.zeros(0), torch.zeros(0, dtype=torch.long))
+
+
+@dataclass
+class CandidateSet:
+    """Candidate set D for one target: precedent rows and their Sim(F_p, F_target)."""
+
+    rows: torch.Tensor
+    sim: torch.Tensor
+    # The build `rows` index into, so a rebuild in another thread cannot shift them.
+    columns: Columns = EMPTY_COLUMNS
+
+
+class PrecedentIndex:
+    """Authority and outcome columns for every case with a stage 1 output.
+
+    Columns are torch tensors indexed by row, so scoring a candidate set is a
+    gather plus a few elementwise ops regardless of its size. Outputs are
+    re-read only when their update time changes, each case's court comes from
+    `Corpus.case_fields` once, and candidate sets are cached per query so
+    re-ranking with new weights skips retrieval entirely. `refresh` reads from
+    disk, so callers on the event loop run it in a worker thread.
+    """
+
+    def __init__(self, corpus: Corpus, store: OutputStore):
+        self.corpus = corpus
+        self.store = store
+        self._cases: dict[str, tuple[tuple[int, int], float, int]] = {}
+        # Court authority per case; the court of a case never changes.
+        self._authority: dict[str, float] = {}
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self.columns = EMPTY_COLUMNS
+        self._candidates: OrderedDict[tuple, CandidateSet] = OrderedDict()
+        # Candidate sets are cached and read from several worker threads.
+        self._candidates_lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self._refreshed_at = 0.0
+        with self._candidates_lock:
+            self._candidates.clear()
+
+    def _court_authority(self, filename: str) -> float:
+        authority = self._authority.get(filename)
+        if authority is None:
+            fields = self.corpus.case_fields(filename)
+            court_name = fields[1] if fields is not None else None
+            authority = self._authority[filename] = court_authority(court_name)
+        return authority
+
+    def _read_case(self, filename: str) -> tuple[float, int]:
+        analysis = self.store.get_analysis(filename)
+        stage2 = self.store.get_atomized(filename) or {}
+        is_settlement = bool((stage2.get("civil") or {}).get("is_settlement"))
+        label = outcome_label(analysis.outcomes, is_settlement)
+        return (
+            self._court_authority(filename),
+            OUTCOME_LABELS.index(label) if label else NO_OUTCOME,
+        )
+
+    def refresh(self) -> None:
+        # One refresh at a time; others wait and then find nothing left to do.
+        with self._refresh_lock:
+            if time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+                return
+            self._refreshed_at = time.monotonic()
+
+            changed = False
+            stage1 = self.store.versions(1)
+            stage2 = self.store.versions(2)
+            for filename, updated_at in stage1.items():
+                versions = (updated_at, stage2.get(filename, 0))
+                cached = self._cases.get(filename)
+                if cached and cached[0] == versions:
+                    continue
+                try:
+                    authority, outcome = self._read_case(filename)
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable case {filename} for ranking: {e}")
+                    continue
+                self._cases[filename] = (versions, authority, outcome)
+                changed = True
+
+            for filename in set(self._cases) - stage1.keys():
+                del self._cases[filename]
+                self._authority.pop(filename, None)
+                changed = True
+
+            if changed:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        filenames = sorted(self._cases)
+        self.columns = Columns(
+            filenames,
+            {filename: row for row, filename in enumerate(filenames)},
+            torch.tensor([self._cases[f][1] for f in filenames], dtype=torch.float32),
+            torch.tensor([self._cases[f][2] for f in filenames], dtype=torch.long),
+        )
+        with self._candidates_lock:
+            self._candidates.clear()
+
+    def candidate_set(self, key: tuple, scores: list[tuple[str, float]]) -> CandidateSet:
+        """Cache the retrieval result `scores` for `key` as row and similarity tensors."""
+        columns = self.columns
+        pairs = [(columns.rows[name], sim) for name, sim in scores if name in columns.rows]
+        candidates = CandidateSet(
+            rows=torch.tensor([row for row, _ in pairs], dtype=torch.long),
+            sim=torch.tensor([sim for _, sim in pairs], dtype=torch.float32),
+            columns=columns,
+        )
+        with self._candidates_lock:
+            self._candidates[key] = candidates
+            while len(self._candidates) > CANDIDATE_CACHE_SIZE:
+                self._candidates.popitem(last=False)
+        return candidates
+
+    def cached_candidates(self, key: tuple) -> CandidateSet | None:
+        with self._candidates_lock:
+            candidates = self._candidates.get(key)
+            if candidates is not None:
+                self._candidates.move_to_end(key)
+            return candidates
+
+    def rank(
+        self,
+        candidates: CandidateSet,
+        weights: dict[str, float],
+        desired_outcome: str | None = None,
+        top: int = 20,
+    ) -> list[dict]:
+        """S(p) = w1·Sim + w2·Auth + w3·Align over all candidates, best `top` by partial sort."""
+        if not len(candidates.rows):
+            return []
+        columns = candidates.columns
+        authority = columns.authority[candidates.rows]
+        outcome = columns.outcome[candidates.rows]
+        if desired_outcome in OUTCOME_LABELS:
+            desired = OUTCOME_LABELS.index(desired_outcome)
+            # +1 for a matching outcome, -1 for an adverse one, 0 when unknown.
+            align = (outcome == desired).float() * 2 - 1
+            align[outcome == NO_OUTCOME] = 0.0
+        else:
+            align = torch.zeros_like(authority)
+
+        score = (
+            weights["sim"] * candidates.sim
+            + weights["auth"] * authority
+            + weights["align"] * align
+        )
+        values, indices = torch.topk(score, min(top, len(score)))
+        results = []
+        for value, index in zip(values.tolist(), indices.tolist()):
+            label = outcome[index].item()
+            results.append(
+                {
+                    "filename": columns.filenames[candidates.rows[index].item()],
+                    "score": round(value, 4),
+                    "sim": round(candidates.sim[index].item(), 4),
+                    "auth": authority[index].item(),
+                    "align": align[index].item(),
+                    "outcome": OUTCOME_LABELS[label] if label != NO_OUTCOME else None,
+                }
+            )
+        return results
@@ -0,0 +1,262 @@
+import json
+import os
+import re
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+from telemetry import stage_for, telemetry
+
+M = TypeVar("M", bound=BaseModel)
+
+# LLM repair rounds after the deterministic fixes fail; 0 disables them.
+REPAIR_ATTEMPTS = int(os.getenv("REPAIR_ATTEMPTS", "1"))
+# Broken output longer than this is cut before it goes into a repair prompt.
+REPAIR_MAX_CHARS = 20_000
+REPAIR_MAX_ERRORS = 20
+# How many commas back to cut when closing truncated JSON does not parse.
+TRUNCATION_CUTS = 4
+
+REPAIR_PROMPT_TEMPLATE = """
+The JSON below failed validation against the required schema.
+Fix only what the errors point to and keep every other value unchanged.
+Respond with the corrected JSON only.
+
+Validation errors:
+{errors}
+
+JSON:
+{json}
+"""
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def _closers(stack: list[str]) -> str:
+    return "".join(reversed(stack))
+
+
+def close_truncated(text: str) -> list[str]:
+    """Candidate completions of JSON cut off mid-generation, most complete first."""
+    stack: list[str] = []
+    commas: list[tuple[int, list[str]]] = []
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+        elif ch == ",":
+            commas.append((i, list(stack)))
+
+    tail = text + ('"' if in_string else "")
+    tail = tail.rstrip().rstrip(",")
+    if tail.endswith(":"):
+        tail += " null"
+    candidates = [tail + _closers(stack)]
+    # A dangling key or half-written literal cannot be closed; drop back to
+    # the last complete member instead.
+    for position, comma_stack in reversed(commas[-TRUNCATION_CUTS:]):
+        candidates.append(text[:position] + _closers(comma_stack))
+    return candidates
+
+
+def _load(text: str):
+    text = _FENCE.sub("", text.strip())
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=0)
+    text = text[start:]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    for candidate in close_truncated(text):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _number(value, maximum: float | None = None):
+    percent = isinstance(value, str) and value.strip().endswith("%")
+    if isinstance(value, str):
+        try:
+            value = float(re.sub(r"[,$%\s]", "", value))
+        except ValueError:
+            return value
+    # Scores bounded to [0, 1] are often written as percentages ("85", "85%").
+    whole = isinstance(value, (int, float)) and float(value).is_integer() and 1 < value <= 100
+    if maximum == 1 and isinstance(value, (int, float)) and (percent or whole):
+        value = value / 100
+    return value
+
+
+def coerce(value, schema: dict, root: dict):
+    """Bend `value` toward `schema`: clamp ranges, fix scalar types, match enums."""
+    if "$ref" in schema:
+        return coerce(value, root["$defs"][schema["$ref"].split("/")[-1]], root)
+    if "anyOf" in schema:
+        options = [o for o in schema["anyOf"] if o.get("type") != "null"]
+        if value is None or not options:
+            return value
+        return coerce(value, options[0], root)
+    if "enum" in schema:
+        if value in schema["enum"] or not isinstance(value, str):
+            return value
+        matches = [e for e in schema["enum"] if str(e).lower() == value.strip().lower()]
+        return matches[0] if matches else value
+
+    kind = schema.get("type")
+    if kind == "object" and isinstance(value, dict):
+        properties = schema.get("properties", {})
+        fixed = {
+            key: coerce(item, properties[key], root) if key in properties else item
+            for key, item in value.items()
+        }
+        for key in schema.get("required", []):
+            if key not in fixed and properties.get(key, {}).get("type") == "array":
+                fixed[key] = []
+        return fixed
+    if kind == "array":
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        return [coerce(item, schema.get("items", {}), root) for item in value]
+    if kind in ("number", "integer"):
+        value = _number(value, schema.get("maximum"))
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value
+        if "minimum" in schema:
+            value = max(value, schema["minimum"])
+        if "maximum" in schema:
+            value = min(value, schema["maximum"])
+        return int(round(value)) if kind == "integer" else value
+    if kind == "string":
+        if isinstance(value, list):
+            return "; ".join(str(item) for item in value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return value
+    if kind == "boolean" and isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "yes", "1"):
+            return True
+        if lowered in ("false", "no", "0"):
+            return False
+    return value
+
+
+def _nest_case_data(data, schema: dict, root: dict):
+    """Put case-type details back under `criminal`/`civil` when the model misplaced them.
+
+    Small models often flatten the nested object into the top level or name it
+    "criminal_details"; both trip `validate_case_data` although nothing is missing.
+    Details for the other case type are dropped, as `FusedCaseOutput.split` would.
+    """
+    if not isinstance(data, dict):
+        return data
+    case_type = data.get("case_type")
+    properties = schema.get("properties", {})
+    if case_type not in properties:
+        return data
+    for other in ("criminal", "civil"):
+        if other != case_type and other in properties:
+            data[other] = None
+    if data.get(case_type) is not None:
+        return data
+    for key in list(data):
+        if key not in properties and key.startswith(case_type) and isinstance(data[key], dict):
+            return {**data, case_type: data.pop(key)}
+    refs = [o["$ref"] for o in properties[case_type].get("anyOf", []) if "$ref" in o]
+    if not refs:
+        return data
+    nested = root["$defs"][refs[0].split("/")[-1]]
+    moved = {
+        key: data[key]
+        for key in nested.get("properties", {})
+        if key in data and key not in properties
+    }
+    if moved:
+        data = {key: value for key, value in data.items() if key not in moved}
+        data[case_type] = moved
+    return data
+
+
+def deterministic_fix(text: str, output_type: type[M]) -> tuple[M | None, str, str]:
+    """Try to validate `text` after cheap fixes.
+
+    Returns the model (or None), the best JSON found for a repair prompt, and
+    the validation errors that remain.
+    """
+    data = _load(text)
+    if data is None:
+        return None, text, "Response is not parseable JSON."
+    schema = output_type.model_json_schema()
+    data = coerce(_nest_case_data(data, schema, schema), schema, schema)
+    fixed = json.dumps(data, ensure_ascii=False)
+    try:
+        return output_type.model_validate(data), fixed, ""
+    except ValidationError as e:
+        return None, fixed, format_errors(e)
+
+
+def format_errors(error: ValidationError) -> str:
+    lines = [
+        f"- {'.'.join(str(part) for part in item['loc']) or '(root)'}: {item['msg']}"
+        for item in error.errors()[:REPAIR_MAX_ERRORS]
+    ]
+    return "\n".join(lines)
+
+
+async def validate_or_repair(
+    text: str,
+    output_type: type[M],
+    complete: Callable[[str], Awaitable[str]] | None = None,
+    attempts: int = REPAIR_ATTEMPTS,
+) -> M:
+    """Validate an LLM response, repairing it rather than discarding the generation.
+
+    Deterministic fixes come first (truncated JSON closed, numbers clamped,
+    scalars coerced, enums matched). Anything still invalid is sent back via
+    `complete` with only the errors and the broken JSON, never the opinion.
+    """
+    try:
+        return output_type.model_validate_json(text)
+    except ValidationError as e:
+        original_error = e
+
+    stage = stage_for(output_type.model_json_schema())
+    model, broken, errors = deterministic_fix(text, output_type)
+    if model is not None:
+        logger.info(f"Repaired {output_type.__name__} output without another LLM call")
+        telemetry.record_repair(stage, "deterministic", True)
+        return model
+    telemetry.record_repair(stage, "deterministic", False)
+
+    for attempt in range(attempts if complete else 0):
+        logger.info(
+            f"Asking for a repair of {output_type.__name__} ({attempt + 1}/{attempts}): "
+            f"{errors.splitlines()[0] if errors else ''}"
+        )
+        prompt = REPAIR_PROMPT_TEMPLATE.format(
+            errors=errors, json=broken[:REPAIR_MAX_CHARS]
+        )
+        repaired = await complete(prompt)
+        model, broken, errors = deterministic_fix(repaired, output_type)
+        if model is not None:
+            telemetry.record_repair(stage, "llm", True)
+            return model
+        telemetry.record_repair(stage, "llm", False)
+
+    raise original_error
@@ -0,0 +1,265 @@
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from loguru import logger
+from model import Analysis
+from store import OutputStore
+
+STOPWORDS = {
+    "a", "about", "after", "against", "all", "also", "an", "and", "any", "are",
+    "as", "at", "be", "been", "before", "being", "between", "both", "but", "by",
+    "can", "could", "did", "do", "does", "during", "each", "for", "from", "had",
+    "has", "have", "he", "her", "hers", "him", "his", "i", "if", "in", "into",
+    "is", "it", "its", "may", "might", "more", "most", "must", "of", "on", "one",
+    "or", "other", "our", "over", "she", "should", "so", "some", "such", "than",
+    "that", "the", "their", "them", "then", "there", "these", "they", "this",
+    "those", "through", "to", "under", "until", "upon", "was", "we", "were",
+    "what", "when", "where", "which", "while", "who", "whom", "whose", "will",
+    "with", "would", "you", "your",
+}
+# Words that flip the meaning of the next content word ("not consensual",
+# "without a warrant", "non-consensual"); kept as a "not_" prefix on it.
+NEGATORS = {"not", "no", "non", "un", "without", "never", "lack", "lacked", "absent", "neither", "nor"}
+NEGATION_PREFIX = "not_"
+
+# Terms in more than this share of cases ("defendant", "court") say nothing
+# about material similarity and would make every query touch every case.
+MAX_DOCUMENT_FREQUENCY = 0.2
+# Below this many other cases every shared term counts; a small corpus has too
+# few cases for document frequency to mean anything.
+MIN_FREQUENCY_CUTOFF_CASES = 50
+REFRESH_INTERVAL = 2.0
+
+
+def _stem(word: str) -> str:
+    if word.endswith("ss"):
+        return word
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)]
+    return word
+
+
+def fact_terms(fact: str) -> list[str]:
+    """Normalize one fact into content-word terms, with negations folded into the term."""
+    text = re.sub(r"\b(non|un)-", r"\1 ", fact.lower()).replace("n't", " not")
+    terms = []
+    negate = False
+    for token in re.findall(r"[a-z0-9]+", text):
+        if token in NEGATORS:
+            negate = True
+            continue
+        if token in STOPWORDS:
+            continue
+        term = _stem(token)
+        terms.append(NEGATION_PREFIX + term if negate else term)
+        negate = False
+    return terms
+
+
+def analysis_terms(analysis: Analysis) -> frozenset[str]:
+    """F_p: the set of unigram and adjacent-bigram terms across all facts of a case."""
+    terms: set[str] = set()
+    for fact in analysis.facts:
+        words = fact_terms(fact)
+        terms.update(words)
+        terms.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return frozenset(terms)
+
+
+class FactIndex:
+    """Inverted index from fact terms to the stage 1 outputs that contain them.
+
+    Persisted as an append-only JSONL log next to the outputs, so adding a
+    case is one appended line and startup replays the log instead of
+    re-reading every output. Outputs written outside this process (e.g. by
+    batch_process.py) are picked up by comparing store update times on the
+    next query.
+
+    Queries and refreshes run in worker threads while new outputs are added
+    from the event loop, so every read and write of the index holds `lock`;
+    a refresh reads outputs without it, so adds never wait on the disk.
+    """
+
+    def __init__(self, store: OutputStore, log_path: Path):
+        self.store = store
+        self.log_path = log_path
+        self.doc_ids: dict[str, int] = {}
+        self.filenames: list[str | None] = []
+        self.doc_terms: list[frozenset[str]] = []
+        self.mtimes: dict[str, int] = {}
+        self.postings: dict[str, set[int]] = {}
+        self._log_lines = 0
+        self._refreshed_at = 0.0
+        self.lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _load(self) -> None:
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, encoding="utf-8") as f:
+            for line in f:
+                self._log_lines += 1
+                entry = json.loads(line)
+                if entry.get("deleted"):
+                    self._remove(entry["filename"])
+                else:
+                    self._add(entry["filename"], frozenset(entry["terms"]), entry["mtime"])
+        if self._log_lines > 2 * len(self) + 100:
+            self._compact()
+
+    def _append(self, entry: dict) -> None:
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._log_lines += 1
+
+    def _compact(self) -> None:
+        tmp_path = self.log_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for filename, doc in self.doc_ids.items():
+                entry = {
+                    "filename": filename,
+                    "mtime": self.mtimes[filename],
+                    "terms": sorted(self.doc_terms[doc]),
+                }
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.log_path)
+        self._log_lines = len(self)
+
+    def _add(self, filename: str, terms: frozenset[str], mtime: int) -> None:
+        self._remove(filename)
+        doc = len(self.filenames)
+        self.doc_ids[filename] = doc
+        self.filenames.append(filename)
+        self.doc_terms.append(terms)
+        self.mtimes[filename] = mtime
+        for term in terms:
+            self.postings.setdefault(term, set()).add(doc)
+
+    def _remove(self, filename: str) -> None:
+        doc = self.doc_ids.pop(filename, None)
+        if doc is None:
+            return
+        for term in self.doc_terms[doc]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.discard(doc)
+                if not posting:
+                    del self.postings[term]
+        # Slots are tombstoned rather than reused so doc ids stay stable.
+        self.filenames[doc] = None
+        self.doc_terms[doc] = frozenset()
+        self.mtimes.pop(filename, None)
+
+    def add(self, filename: str, analysis: Analysis, mtime: int | None = None) -> None:
+        terms = analysis_terms(analysis)
+        with self.lock:
+            mtime = mtime if mtime is not None else time.time_ns()
+            self._add(filename, terms, mtime)
+            self._append({"filename": filename, "mtime": mtime, "terms": sorted(terms)})
+
+    def remove(self, filename: str) -> None:
+        with self.lock:
+            if filename in self.doc_ids:
+                self._remove(filename)
+                self._append({"filename": filename, "deleted": True})
+
+    def refresh(self, force: bool = False) -> None:
+        """Index outputs that are new or changed in the store and drop deleted ones."""
+        with self._refresh_lock:
+            if not force and time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+                return
+            self._refreshed_at = time.monotonic()
+
+            listed_at = time.time_ns()
+            versions = self.store.versions(1)
+            with self.lock:
+                stale = [
+                    (filename, updated_at)
+                    for filename, updated_at in versions.items()
+                    if self.mtimes.get(filename, -1) < updated_at
+                ]
+            for filename, updated_at in stale:
+                try:
+                    analysis = self.store.get_analysis(filename)
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable stage 1 output {filename}: {e}")
+                    continue
+                if analysis is not None:
+                    with self.lock:
+                        # Skip it if the event loop indexed a newer version meanwhile.
+                        if self.mtimes.get(filename, -1) < updated_at:
+                            self.add(filename, analysis, updated_at)
+
+            with self.lock:
+                # Cases added after the listing was taken are not deletions.
+                deleted = [
+                    filename
+                    for filename in set(self.doc_ids) - versions.keys()
+                    if self.mtimes[filename] < listed_at
+                ]
+                for filename in deleted:
+                    self.remove(filename)
+
+    def terms_for(self, filename: str) -> frozenset[str] | None:
+        with self.lock:
+            doc = self.doc_ids.get(filename)
+            return None if doc is None else self.doc_terms[doc]
+
+    def candidates(self, target: frozenset[str], exclude: str | None = None) -> Counter:
+        """Shared-term counts |F_p ∩ F_target| for every case sharing at least one term."""
+        with self.lock:
+            excluded = self.doc_ids.get(exclude) if exclude else None
+            # The target case is in every posting of its own terms; it does not
+            # count towards their document frequency.
+            others = len(self) - (excluded is not None)
+            max_df = (
+                max(1, int(others * MAX_DOCUMENT_FREQUENCY))
+                if others >= MIN_FREQUENCY_CUTOFF_CASES
+                else None
+            )
+            counts: Counter = Counter()
+            for term in target:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                if max_df is not None and len(posting) - (excluded in posting) > max_df:
+                    continue
+                counts.update(posting)
+        counts.pop(excluded, None)
+        return counts
+
+    def query(
+        self,
+        target: frozenset[str],
+        k: int = 1,
+        top: int = 20,
+        order: str = "jaccard",
+        exclude: str | None = None,
+    ) -> list[dict]:
+        """Cases sharing at least `k` fact terms with `target`, best `top` by Jaccard or overlap."""
+        self.refresh()
+        with self.lock:
+            results = []
+            for doc, shared in self.candidates(target, exclude).items():
+                if shared < k:
+                    continue
+                union = len(target) + len(self.doc_terms[doc]) - shared
+                results.append((shared, shared / union if union else 0.0, doc))
+
+            rank = (lambda r: (r[1], r[0])) if order == "jaccard" else (lambda r: (r[0], r[1]))
+            return [
+                {"filename": self.filenames[doc], "shared": shared, "jaccard": round(jaccard, 4)}
+                for shared, jaccard, doc in heapq.nlargest(top, results, key=rank)
+            ]
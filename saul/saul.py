@@ -1,38 +1,125 @@
+import asyncio
 import json
 import sys
+from contextlib import asynccontextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import AsyncGenerator, Iterator, Literal, Optional
 
 sys.path.append(str(Path(__file__).resolve().parent))
 
+from atlas import GROUP_FIELDS, AtlasIndex
+from batch import BatchStats, run_batch, run_pipeline, sse
+from case_index import MAX_PAGE_SIZE, PAGE_SIZE, CaseIndex
+from config import CORPUS, DATA_DIR, state_path
+from distinction import Distinction, DistinctionIndex
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+from embeddings import EMBED_ON_SAVE, VectorStore, embed_analysis
+from http_cache import StreamingAwareGZipMiddleware, Validators
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
+from ingest import CaseDocument, Corpus, list_corpora
+from jobs import Job, JobManager, JobStore
 from llm import (
-    OllamaNotRunningError,
+    PIPELINE_MODE,
+    analyze_case as analyze_case_file,
+    analyze_case_fused,
     atomize_analysis,
     format_analysis_html,
     get_case_analysis_stream,
+    stage1_listeners,
 )
-from model import Analysis
-from pydantic import BaseModel
+from loguru import logger
+from model import Analysis, AtomizedCaseOutput
+from providers import OllamaNotRunningError, close_providers, ollama_pool
+from pydantic import BaseModel, Field
+from ranking import DEFAULT_WEIGHTS, CandidateSet, PrecedentIndex
+from retrieval import FactIndex
+from status import STATUS_WATCH_INTERVAL, StatusTracker
+from store import output_store
+from telemetry import telemetry
 
 load_dotenv()
 
-app = FastAPI()
 
-# Data directories
-BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data" / "1"
-JSON_DIR = DATA_DIR / "json"
-HTML_DIR = DATA_DIR / "html"
-OUTPUT_STAGE1_DIR = DATA_DIR / "output_stage1"
-OUTPUT_STAGE2_DIR = DATA_DIR / "output_stage2"
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.loop = asyncio.get_running_loop()
+    retrieval_index.refresh(force=True)
+    status_tracker.seed()
+    job_manager.start()
+    # The first build reads every case's name; let the server come up meanwhile.
+    index_warmup = asyncio.create_task(asyncio.to_thread(_warm_case_index))
+    watcher = None
+    if STATUS_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(status_tracker.watch(STATUS_WATCH_INTERVAL))
+    yield
+    if watcher:
+        watcher.cancel()
+    index_warmup.cancel()
+    await asyncio.gather(index_warmup, return_exceptions=True)
+    await job_manager.stop()
+    await close_providers()
+
+
+app = FastAPI(lifespan=lifespan)
+# Stage 1 analysis streams HTML fragment by fragment; compression would hold them back.
+app.add_middleware(StreamingAwareGZipMiddleware, exclude_prefixes=("/api/analyze/",))
+
+corpus = Corpus(CORPUS, DATA_DIR)
+case_index = CaseIndex(corpus, state_path("case_index.jsonl"))
+
+atlas_index = AtlasIndex(output_store)
+retrieval_index = FactIndex(output_store, state_path("retrieval_index.jsonl"))
+vector_store = VectorStore(DATA_DIR / "embeddings")
+status_tracker = StatusTracker(corpus, output_store)
+distinction_index = DistinctionIndex(retrieval_index)
+precedent_index = PrecedentIndex(corpus, output_store)
+job_manager = JobManager(JobStore(DATA_DIR / "jobs.sqlite"))
+_embedding_tasks: set[asyncio.Task] = set()
+
+
+def _warm_case_index() -> None:
+    try:
+        case_index.refresh()
+    except Exception as e:
+        logger.warning(f"Failed to build the case index: {e}")
+
+
+def _index_stage1_output(filename: str, analysis: Analysis) -> None:
+    retrieval_index.add(filename, analysis)
+    precedent_index.invalidate()
+
+
+async def _embed_case(filename: str, analysis: Analysis) -> None:
+    try:
+        await embed_analysis(vector_store, filename, analysis)
+        precedent_index.invalidate()
+    except Exception as e:
+        logger.warning(f"Failed to embed facts for {filename}: {e}")
+
+
+def _start_embedding(filename: str, analysis: Analysis) -> None:
+    task = asyncio.get_running_loop().create_task(_embed_case(filename, analysis))
+    _embedding_tasks.add(task)
+    task.add_done_callback(_embedding_tasks.discard)
+
+
+def _embed_stage1_output(filename: str, analysis: Analysis) -> None:
+    # Stage 1 listeners run in the worker thread that saved the output.
+    if EMBED_ON_SAVE:
+        app.state.loop.call_soon_threadsafe(_start_embedding, filename, analysis)
+
 
-# Ensure output directories exist
-OUTPUT_STAGE1_DIR.mkdir(parents=True, exist_ok=True)
-OUTPUT_STAGE2_DIR.mkdir(parents=True, exist_ok=True)
+stage1_listeners.append(_index_stage1_output)
+stage1_listeners.append(_embed_stage1_output)
 
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -43,124 +130,215 @@ async def read_index():
     return FileResponse("static/index.html")
 
 
+@app.get("/api/corpora")
+async def get_corpora():
+    return {"active": CORPUS, "corpora": await asyncio.to_thread(list_corpora)}
+
+
 @app.get("/api/files")
-async def list_files():
-    if not JSON_DIR.exists():
-        return []
-    files = sorted([f.name for f in JSON_DIR.glob("*.json")])
-    return files
+async def list_files(
+    status: bool = False,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    offset: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    prefix: bool = False,
+):
+    """Case filenames; with `status`, also whether each has stage 1 and stage 2 output.
+
+    Any of `q`, `cursor`, `offset` or `limit` returns one page of the case
+    index instead of the whole list: `items` (with case names), `offset`,
+    `total` matches and the `next_cursor` to pass for the following page.
+    `q` matches filenames and case names as a substring, or as a prefix with `prefix`.
+    """
+    # The status tracker already holds both stages' filename sets in memory.
+    done1, done2 = status_tracker.done[1], status_tracker.done[2]
+    if q is None and cursor is None and offset is None and limit is None:
+        names = await asyncio.to_thread(corpus.names)
+        if not status:
+            return names
+        return [
+            {"filename": name, "stage1": name in done1, "stage2": name in done2}
+            for name in names
+        ]
+
+    page = await asyncio.to_thread(
+        case_index.page, q or "", cursor, offset or 0, limit or PAGE_SIZE, prefix
+    )
+    if status:
+        for item in page["items"]:
+            item["stage1"] = item["filename"] in done1
+            item["stage2"] = item["filename"] in done2
+    return page
+
+
+# Disk and database reads below run in worker threads so a busy batch run
+# does not stall interactive requests on the event loop.
 
 
 @app.get("/api/html/{filename}")
-async def get_html(filename: str):
-    # Filename comes in as the JSON filename, we need to find the corresponding HTML
-    html_filename = filename.replace(".json", ".html")
-    html_file = HTML_DIR / html_filename
+async def get_html(filename: str, request: Request):
+    # Filename comes in as the case JSON filename; the corpus knows where its HTML lives
+    document = await asyncio.to_thread(corpus.get, filename)
+    version = await asyncio.to_thread(document.html_version) if document else None
+    if version is None:
+        raise HTTPException(status_code=404, detail="HTML file not found")
+
+    validators = Validators.for_version(version)
+    if validators.matches(request):
+        return validators.not_modified()
 
-    if not html_file.exists():
+    html = await asyncio.to_thread(document.read_html)
+    if html is None:
         raise HTTPException(status_code=404, detail="HTML file not found")
 
-    return FileResponse(html_file)
+    return validators.apply(Response(content=html, media_type="text/html"))
+
+
+def _case_versions(filename: str) -> tuple[CaseDocument | None, tuple[int | None, ...]]:
+    document = corpus.get(filename)
+    if document is None:
+        return None, ()
+    return document, (
+        document.html_version(),
+        output_store.version(1, filename),
+        output_store.version(2, filename),
+    )
+
+
+def _case_bundle(document: CaseDocument, filename: str) -> dict:
+    html = document.read_html()
+    analysis = output_store.get_analysis(filename)
+    atomized = output_store.get_atomized(filename)
+    return {
+        "filename": filename,
+        "html": html.decode("utf-8", errors="replace") if html is not None else None,
+        "stage1_exists": analysis is not None,
+        "stage1_html": format_analysis_html(analysis) if analysis is not None else None,
+        "stage2_exists": atomized is not None,
+        "stage2": atomized,
+    }
+
+
+@app.get("/api/cases/{filename}")
+async def get_case(filename: str, request: Request):
+    """Everything the case view shows in one response: case HTML, both stage outputs and flags."""
+    document, versions = await asyncio.to_thread(_case_versions, filename)
+    if document is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    validators = Validators.for_version(*versions)
+    if validators.matches(request):
+        return validators.not_modified()
+
+    bundle = await asyncio.to_thread(_case_bundle, document, filename)
+    return validators.apply(JSONResponse(bundle))
 
 
 @app.get("/api/output/{filename}")
-async def get_cached_output(filename: str):
-    if not OUTPUT_STAGE1_DIR.exists():
-        raise HTTPException(status_code=404, detail="Output directory not found")
-    output_file = OUTPUT_STAGE1_DIR / filename
-    if not output_file.exists():
+async def get_cached_output(filename: str, request: Request):
+    version = await asyncio.to_thread(output_store.version, 1, filename)
+    if version is None:
         raise HTTPException(status_code=404, detail="Cached output not found")
 
-    try:
-        with open(output_file, "r") as f:
-            data = json.load(f)
-        analysis = Analysis.model_validate(data)
-
-        from fastapi.responses import HTMLResponse
+    validators = Validators.for_version(version)
+    if validators.matches(request):
+        return validators.not_modified()
 
-        return HTMLResponse(content=format_analysis_html(analysis))
+    try:
+        analysis = await asyncio.to_thread(output_store.get_analysis, filename)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Cached output not found")
+
+    return validators.apply(HTMLResponse(content=format_analysis_html(analysis)))
 
 
 @app.get("/api/output/exists/{filename}")
 async def output_exists(filename: str):
-    if not OUTPUT_STAGE1_DIR.exists():
-        return {"exists": False}
-    output_file = OUTPUT_STAGE1_DIR / filename
-    return {"exists": output_file.exists()}
+    return {"exists": await asyncio.to_thread(output_store.exists, 1, filename)}
 
 
 @app.delete("/api/output/{filename}")
 async def delete_stage1_output(filename: str):
-    if not OUTPUT_STAGE1_DIR.exists():
-        return {"deleted": False}
-    output_file = OUTPUT_STAGE1_DIR / filename
-    if output_file.exists():
-        output_file.unlink()
+    if await asyncio.to_thread(output_store.delete, 1, filename):
+        await asyncio.to_thread(retrieval_index.remove, filename)
+        await asyncio.to_thread(vector_store.remove, filename)
+        precedent_index.invalidate()
         return {"deleted": True}
     return {"deleted": False}
 
 
-def _stage2_output_path(filename: str) -> Path:
-    return OUTPUT_STAGE2_DIR / f"{Path(filename).stem}.atomized.json"
+@app.get("/api/meta/{filename}")
+async def get_case_meta(filename: str):
+    """Per-case processing metadata: preprocessing stats and LLM call telemetry per stage."""
+    return await asyncio.to_thread(output_store.get_meta, filename)
 
 
 @app.get("/api/output_stage2/{filename}")
-async def get_stage2_output(filename: str):
-    if not OUTPUT_STAGE2_DIR.exists():
-        raise HTTPException(status_code=404, detail="Stage 2 output directory not found")
-    output_file = _stage2_output_path(filename)
-    if not output_file.exists():
+async def get_stage2_output(filename: str, request: Request):
+    version = await asyncio.to_thread(output_store.version, 2, filename)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Stage 2 output not found")
+
+    validators = Validators.for_version(version)
+    if validators.matches(request):
+        return validators.not_modified()
+
+    # Stored as validated JSON already; send it as is instead of re-serializing.
+    data = await asyncio.to_thread(output_store.get, 2, filename)
+    if data is None:
         raise HTTPException(status_code=404, detail="Stage 2 output not found")
-    return json.loads(output_file.read_text(encoding="utf-8"))
+    return validators.apply(Response(content=data, media_type="application/json"))
 
 
 @app.get("/api/output_stage2/exists/{filename}")
 async def output_stage2_exists(filename: str):
-    if not OUTPUT_STAGE2_DIR.exists():
-        return {"exists": False}
-    output_file = _stage2_output_path(filename)
-    return {"exists": output_file.exists()}
+    return {"exists": await asyncio.to_thread(output_store.exists, 2, filename)}
 
 
 @app.delete("/api/output_stage2/{filename}")
 async def delete_stage2_output(filename: str):
-    if not OUTPUT_STAGE2_DIR.exists():
-        return {"deleted": False}
-    output_file = _stage2_output_path(filename)
-    if output_file.exists():
-        output_file.unlink()
+    if await asyncio.to_thread(output_store.delete, 2, filename):
+        atlas_index.invalidate()
+        precedent_index.invalidate()
         return {"deleted": True}
     return {"deleted": False}
 
 
+async def _claimed(
+    stage: int, filename: str, stream: AsyncGenerator[str, None]
+) -> AsyncGenerator[str, None]:
+    with job_manager.claim(stage, filename):
+        async for chunk in stream:
+            yield chunk
+
+
 @app.post("/api/analyze/{filename}")
 async def analyze_case(filename: str):
-    json_file = JSON_DIR / filename
-    if not json_file.exists():
+    json_file = await asyncio.to_thread(corpus.get, filename)
+    if json_file is None:
         raise HTTPException(status_code=404, detail="File not found")
 
     # Check for cached output
-    if OUTPUT_STAGE1_DIR.exists():
-        output_file = OUTPUT_STAGE1_DIR / filename
-        if output_file.exists():
-            try:
-                with open(output_file, "r") as f:
-                    data = json.load(f)
-                analysis = Analysis.model_validate(data)
-
-                return format_analysis_html(analysis)
-            except Exception as e:
-                # If cache is invalid, ignore and re-analyze
-                print(f"Error reading cache: {e}")
+    try:
+        analysis = await asyncio.to_thread(output_store.get_analysis, filename)
+        if analysis is not None:
+            return format_analysis_html(analysis)
+    except Exception as e:
+        # If cache is invalid, ignore and re-analyze
+        print(f"Error reading cache: {e}")
+
+    if job_manager.busy(1, filename):
+        raise HTTPException(
+            status_code=409, detail="Stage 1 is already running for this case"
+        )
 
     try:
-        OUTPUT_STAGE1_DIR.mkdir(parents=True, exist_ok=True)
-        output_file = OUTPUT_STAGE1_DIR / filename
-        stream = await get_case_analysis_stream(json_file, output_file)
+        stream = await get_case_analysis_stream(json_file, filename)
         return StreamingResponse(
-            stream,
+            _claimed(1, filename, stream),
             media_type="text/html",
         )
 
@@ -170,109 +348,123 @@ async def analyze_case(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics")
+async def metrics():
+    """LLM call latency, time to first token, tokens and retries in Prometheus format."""
+    return Response(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/ollama/hosts")
+async def ollama_hosts():
+    """Health, load and completed requests of each host in OLLAMA_HOSTS."""
+    return ollama_pool().status()
+
+
 @app.get("/api/batch/status")
 async def batch_status():
-    total = len(list(JSON_DIR.glob("*.json"))) if JSON_DIR.exists() else 0
-    stage1_processed = (
-        len(list(OUTPUT_STAGE1_DIR.glob("*.json"))) if OUTPUT_STAGE1_DIR.exists() else 0
-    )
-    stage2_processed = (
-        len(list(OUTPUT_STAGE2_DIR.glob("*.atomized.json")))
-        if OUTPUT_STAGE2_DIR.exists()
-        else 0
-    )
-    stage1_complete = total > 0 and stage1_processed >= total
-    stage2_complete = total > 0 and stage2_processed >= total
-    return {
-        "total": total,
-        "stage1_processed": stage1_processed,
-        "stage2_processed": stage2_processed,
-        "stage1_complete": stage1_complete,
-        "stage2_complete": stage2_complete,
-    }
+    return status_tracker.snapshot()
+
+
+@app.get("/api/batch/status/stream")
+async def batch_status_stream():
+    """Push the batch status as an SSE event whenever it changes."""
+
+    async def stream_status():
+        async for snapshot in status_tracker.updates():
+            if snapshot is None:
+                yield ": keepalive\n\n"
+            else:
+                yield sse(json.dumps(snapshot))
+
+    return StreamingResponse(stream_status(), media_type="text/event-stream")
 
 
 class BatchRunRequest(BaseModel):
     limit: Optional[int] = None
+    concurrency: Optional[int] = None
+    # Pipeline only: overrides PIPELINE_MODE to compare the two modes.
+    mode: Optional[Literal["two-pass", "fused"]] = None
 
 
-@app.post("/api/batch/run")
-async def run_batch(request: BatchRunRequest):
-    async def stream_progress():
-        json_files = sorted(list(JSON_DIR.glob("*.json"))) if JSON_DIR.exists() else []
+def _batch_cases(limit: Optional[int]) -> tuple[int, int, Iterator[CaseDocument]]:
+    """Corpus size, number of cases to run and a stream of those cases."""
+    total = len(corpus)
+    count = min(limit, total) if limit else total
+    return total, count, islice(corpus.iter_cases(), count)
 
-        if not json_files:
-            yield f"data: No JSON files found in {JSON_DIR}\n\n"
-            return
 
-        to_process = json_files
-        if request.limit:
-            to_process = json_files[: request.limit]
+async def _skip_reason(stage: int, filename: str) -> str | None:
+    if await asyncio.to_thread(output_store.exists, stage, filename):
+        return "already processed"
+    # Checked last, on the loop, so no other run can claim the case before this one does.
+    if job_manager.busy(stage, filename):
+        return "already in progress"
+    return None
 
-        yield f"data: Found {len(json_files)} cases. Processing {len(to_process)}...\n\n"
 
-        processed_count = 0
-        skipped_count = 0
-        error_count = 0
+async def _stage2_skip_reason(json_file: CaseDocument) -> str | None:
+    # Also covers a pipeline whose stage 1 was skipped because another run has it.
+    if not await asyncio.to_thread(output_store.exists, 1, json_file.name):
+        return "stage 1 missing"
+    return await _skip_reason(2, json_file.name)
 
-        OUTPUT_STAGE1_DIR.mkdir(parents=True, exist_ok=True)
-        
-        for json_file in to_process:
-            filename = json_file.name
-            output_file = OUTPUT_STAGE1_DIR / filename
 
-            try:
-                stream = await get_case_analysis_stream(
-                    json_file, output_file, skip_if_exists=True
-                )
-                if stream is None:
-                    skipped_count += 1
-                    yield f"data: Skipped {filename} (already processed)\n\n"
-                    continue
+@job_manager.kind("stage1", stages={1})
+async def stage1_job(params: dict) -> AsyncGenerator[str, None]:
+    request = BatchRunRequest(**params)
 
-                yield f"data: Processing {filename}...\n\n"
+    async def process(json_file: CaseDocument):
+        with job_manager.claim(1, json_file.name):
+            stream = await get_case_analysis_stream(json_file, json_file.name)
+            async for _ in stream:
+                pass
 
-                async for _ in stream:
-                    pass
+    total, count, to_process = _batch_cases(request.limit)
 
-                processed_count += 1
-                yield f"data: Completed {filename}\n\n"
+    if not total:
+        yield f"No cases found in {corpus.directory}"
+        return
 
-            except Exception as e:
-                error_count += 1
-                yield f"data: Error processing {filename}: {e}\n\n"
+    yield f"Found {total} cases. Processing {count}..."
 
-        yield f"data: Done. Processed: {processed_count}, Skipped: {skipped_count}, Errors: {error_count}\n\n"
+    stats = BatchStats()
+    async for event in run_batch(
+        to_process,
+        process,
+        lambda json_file: _skip_reason(1, json_file.name),
+        concurrency=request.concurrency,
+    ):
+        stats.record(event)
+        yield event.message()
 
-    return StreamingResponse(stream_progress(), media_type="text/event-stream")
+    yield stats.summary()
 
 
 @app.post("/api/analyze_stage2/{filename}")
 async def analyze_case_stage2(filename: str):
-    json_file = JSON_DIR / filename
-    if not json_file.exists():
+    if await asyncio.to_thread(corpus.get, filename) is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    if not OUTPUT_STAGE1_DIR.exists():
-        raise HTTPException(
-            status_code=409, detail="Stage 1 output directory not found"
-        )
-    
-    stage1_file = OUTPUT_STAGE1_DIR / filename
-    if not stage1_file.exists():
+    analysis = await asyncio.to_thread(output_store.get_analysis, filename)
+    if analysis is None:
         raise HTTPException(
             status_code=409, detail="Stage 1 output not found for this case"
         )
 
-    OUTPUT_STAGE2_DIR.mkdir(parents=True, exist_ok=True)
-    output_file = _stage2_output_path(filename)
-    if output_file.exists():
-        return json.loads(output_file.read_text(encoding="utf-8"))
+    atomized = await asyncio.to_thread(output_store.get_atomized, filename)
+    if atomized is not None:
+        return atomized
+
+    if job_manager.busy(2, filename):
+        raise HTTPException(
+            status_code=409, detail="Stage 2 is already running for this case"
+        )
 
     try:
-        data = json.loads(stage1_file.read_text(encoding="utf-8"))
-        analysis = Analysis.model_validate(data)
-        atomized = await atomize_analysis(analysis, save_path=output_file)
+        with job_manager.claim(2, filename):
+            atomized = await atomize_analysis(analysis, output_name=filename)
+        atlas_index.invalidate()
+        precedent_index.invalidate()
         return atomized.model_dump()
     except OllamaNotRunningError as e:
         raise HTTPException(status_code=503, detail=str(e))
@@ -280,81 +472,397 @@ async def analyze_case_stage2(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _atlas_filters(filters: list[str]) -> dict[str, str]:
+    parsed = {}
+    for item in filters:
+        field, sep, label = item.partition(":")
+        if not sep or field not in GROUP_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Invalid atlas filter: {item}")
+        parsed[field] = label
+    return parsed
+
+
 @app.get("/api/atlas/cases")
-async def get_atlas_cases():
-    """Return all stage 2 outputs with filenames for the Case Atlas view."""
-    cases = []
-    if OUTPUT_STAGE2_DIR.exists():
-        for output_file in sorted(OUTPUT_STAGE2_DIR.glob("*.atomized.json")):
-            try:
-                data = json.loads(output_file.read_text(encoding="utf-8"))
-                # Reconstruct original filename from atomized filename
-                filename = output_file.stem.replace(".atomized", "") + ".json"
-                cases.append({"filename": filename, **data})
-            except Exception:
-                continue
-    return cases
+async def get_atlas_cases(
+    case_type: Optional[str] = None,
+    filter: list[str] = Query(default=[]),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    """Return one page of stage 2 outputs matching `case_type` and `field:label` filters."""
+    total, cases = await asyncio.to_thread(
+        atlas_index.query, case_type, _atlas_filters(filter), offset, limit
+    )
+    return {"total": total, "offset": offset, "limit": limit, "cases": cases}
+
+
+@app.get("/api/atlas/groups")
+async def get_atlas_groups(
+    group_by: list[str] = Query(default=["case_type"]),
+    case_type: Optional[str] = None,
+    filter: list[str] = Query(default=[]),
+):
+    """Return nested group labels and case counts for the Case Atlas view."""
+    unknown = [field for field in group_by if field not in GROUP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown atlas fields: {unknown}")
+    return await asyncio.to_thread(
+        atlas_index.groups, group_by, case_type, _atlas_filters(filter)
+    )
+
+
+@job_manager.kind("stage2", stages={2})
+async def stage2_job(params: dict) -> AsyncGenerator[str, None]:
+    request = BatchRunRequest(**params)
+
+    async def process(json_file: CaseDocument):
+        with job_manager.claim(2, json_file.name):
+            analysis = await asyncio.to_thread(output_store.get_analysis, json_file.name)
+            await atomize_analysis(analysis, output_name=json_file.name)
+
+    total, count, to_process = _batch_cases(request.limit)
+
+    if not total:
+        yield f"No cases found in {corpus.directory}"
+        return
+
+    yield f"Found {total} cases. Processing {count}..."
+
+    stats = BatchStats()
+    async for event in run_batch(
+        to_process, process, _stage2_skip_reason, concurrency=request.concurrency
+    ):
+        stats.record(event)
+        yield event.message()
+
+    yield stats.summary()
+
+
+@job_manager.kind("pipeline", stages={1, 2})
+async def pipeline_job(params: dict) -> AsyncGenerator[str, None]:
+    """Run stage 1 and stage 2 together, feeding each new Analysis straight into stage 2.
+
+    In fused mode stage 1 extracts both outputs in one call and stage 2 only stores its half.
+    """
+    request = BatchRunRequest(**params)
+    fused = (request.mode or PIPELINE_MODE) == "fused"
+
+    async def stage1(json_file: CaseDocument) -> tuple[Analysis, AtomizedCaseOutput | None]:
+        with job_manager.claim(1, json_file.name):
+            if fused:
+                return await analyze_case_fused(json_file, json_file.name)
+            return await analyze_case_file(json_file, json_file.name), None
+
+    async def stage2(
+        json_file: CaseDocument, result: tuple[Analysis, AtomizedCaseOutput | None]
+    ):
+        analysis, atomized = result
+        with job_manager.claim(2, json_file.name):
+            await atomize_analysis(analysis, output_name=json_file.name, atomized=atomized)
+
+    async def stage1_load(json_file: CaseDocument) -> tuple[Analysis, None]:
+        return await asyncio.to_thread(output_store.get_analysis, json_file.name), None
+
+    total, count, to_process = _batch_cases(request.limit)
+
+    if not total:
+        yield f"No cases found in {corpus.directory}"
+        return
+
+    yield (
+        f"Found {total} cases. Pipelining stages 1 and 2 "
+        f"({'fused' if fused else 'two-pass'}) for {count} cases. "
+        f"Processing {2 * count}..."
+    )
+
+    stats = {1: BatchStats(), 2: BatchStats()}
+    async for event in run_pipeline(
+        to_process,
+        stage1,
+        stage2,
+        lambda json_file: _skip_reason(1, json_file.name),
+        stage1_load,
+        _stage2_skip_reason,
+        concurrency=request.concurrency,
+    ):
+        stats[event.stage].record(event)
+        yield event.message()
+
+    yield f"Done. Stage 1: {stats[1].counts()}. Stage 2: {stats[2].counts()}"
+
+
+def _follow_job(job: Job) -> StreamingResponse:
+    """Stream a job's progress as SSE; disconnecting does not stop the job."""
+
+    async def stream_progress():
+        async for message in job_manager.events(job):
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield sse(message)
+
+    return StreamingResponse(
+        stream_progress(), media_type="text/event-stream", headers={"X-Job-Id": job.id}
+    )
+
+
+@app.post("/api/batch/run")
+async def run_batch_stage1(request: BatchRunRequest):
+    job, _ = job_manager.submit("stage1", request.model_dump())
+    return _follow_job(job)
 
 
 @app.post("/api/batch/run-stage2")
 async def run_batch_stage2(request: BatchRunRequest):
-    async def stream_progress():
-        json_files = sorted(list(JSON_DIR.glob("*.json"))) if JSON_DIR.exists() else []
-
-        if not json_files:
-            yield f"data: No JSON files found in {JSON_DIR}\n\n"
-            return
-
-        to_process = json_files
-        if request.limit:
-            to_process = json_files[: request.limit]
-
-        yield f"data: Found {len(json_files)} cases. Processing {len(to_process)}...\n\n"
-
-        processed_count = 0
-        skipped_count = 0
-        error_count = 0
-
-        if not OUTPUT_STAGE1_DIR.exists():
-            yield "data: Stage 1 output directory not found\n\n"
-            return
-        
-        OUTPUT_STAGE2_DIR.mkdir(parents=True, exist_ok=True)
-        
-        for json_file in to_process:
-            filename = json_file.name
-            stage1_file = OUTPUT_STAGE1_DIR / filename
-            output_file = _stage2_output_path(filename)
-
-            if not stage1_file.exists():
-                skipped_count += 1
-                yield f"data: Skipped {filename} (stage 1 missing)\n\n"
-                continue
-
-            if output_file.exists():
-                skipped_count += 1
-                yield f"data: Skipped {filename} (already processed)\n\n"
-                continue
-
-            try:
-                data = json.loads(stage1_file.read_text(encoding="utf-8"))
-                analysis = Analysis.model_validate(data)
-                yield f"data: Processing {filename}...\n\n"
-
-                await atomize_analysis(analysis, save_path=output_file)
-
-                processed_count += 1
-                yield f"data: Completed {filename}\n\n"
-            except Exception as e:
-                error_count += 1
-                yield f"data: Error processing {filename}: {e}\n\n"
-
-        yield (
-            f"data: Done. Processed: {processed_count}, Skipped: {skipped_count}, "
-            f"Errors: {error_count}\n\n"
+    job, _ = job_manager.submit("stage2", request.model_dump())
+    return _follow_job(job)
+
+
+@app.post("/api/batch/run-pipeline")
+async def run_batch_pipeline(request: BatchRunRequest):
+    job, _ = job_manager.submit("pipeline", request.model_dump())
+    return _follow_job(job)
+
+
+class JobRequest(BatchRunRequest):
+    kind: Literal["stage1", "stage2", "pipeline", "embeddings"]
+
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs")
+async def submit_job(request: JobRequest):
+    """Queue a batch run; an active run of the same kind and params is returned instead of a duplicate."""
+    job, created = job_manager.submit(request.kind, request.model_dump(exclude={"kind"}))
+    return {**job.as_dict(), "created": created}
+
+
+@app.get("/api/jobs")
+async def list_jobs(active: bool = False):
+    return [job.as_dict() for job in job_manager.list(active)]
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).as_dict()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """The job's progress so far, then live updates until it finishes."""
+    return _follow_job(_get_job(job_id))
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = _get_job(job_id)
+    job_manager.cancel(job)
+    return job.as_dict()
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(job_id: str):
+    """Queue a cancelled or failed job again; cases it already finished are skipped."""
+    job = _get_job(job_id)
+    job_manager.resume(job)
+    return job.as_dict()
+
+
+async def _target_terms(filename: str) -> frozenset[str]:
+    await asyncio.to_thread(retrieval_index.refresh)
+    target = retrieval_index.terms_for(filename)
+    if target is None:
+        raise HTTPException(
+            status_code=409, detail="Stage 1 output not found for this case"
         )
+    return target
+
+
+@app.get("/api/retrieve/{filename}")
+async def retrieve_similar_cases(
+    filename: str,
+    k: int = Query(default=2, ge=1),
+    top: int = Query(default=20, ge=1, le=500),
+    order: Literal["jaccard", "overlap"] = "jaccard",
+):
+    """Cases sharing at least `k` material fact terms with this case (README Step 3)."""
+    target = await _target_terms(filename)
+    results = await asyncio.to_thread(
+        retrieval_index.query, target, k=k, top=top, order=order, exclude=filename
+    )
+    return {"filename": filename, "k": k, "fact_terms": len(target), "results": results}
+
 
-    return StreamingResponse(stream_progress(), media_type="text/event-stream")
+async def _target_vectors(filename: str):
+    target = await asyncio.to_thread(vector_store.vectors_for, filename)
+    if target is not None:
+        return target
+    analysis = await asyncio.to_thread(output_store.get_analysis, filename)
+    if analysis is None:
+        raise HTTPException(
+            status_code=409, detail="Stage 1 output not found for this case"
+        )
+    await _embed_case(filename, analysis)
+    target = await asyncio.to_thread(vector_store.vectors_for, filename)
+    if target is None:
+        raise HTTPException(
+            status_code=503, detail="Could not embed the facts of this case"
+        )
+    return target
+
+
+@app.get("/api/similar/{filename}")
+async def similar_cases(
+    filename: str,
+    top: int = Query(default=20, ge=1, le=500),
+    threshold: float = Query(default=0.0, ge=-1.0, le=1.0),
+):
+    """Cases ranked by embedding similarity of their facts to this case's facts."""
+    target = await _target_vectors(filename)
+    matches = await asyncio.to_thread(vector_store.search, target, top=top, exclude=filename)
+    results = [
+        {"filename": name, "similarity": score}
+        for name, score in matches
+        if score >= threshold
+    ]
+    return {"filename": filename, "facts": target.shape[0], "results": results}
+
+
+@job_manager.kind("embeddings", stages={"embeddings"})
+async def embeddings_job(params: dict) -> AsyncGenerator[str, None]:
+    request = BatchRunRequest(**params)
+
+    async def process(filename: str):
+        analysis = await asyncio.to_thread(output_store.get_analysis, filename)
+        await embed_analysis(vector_store, filename, analysis)
+
+    outputs = await asyncio.to_thread(output_store.filenames, 1)
+    pending = [filename for filename in outputs if filename not in vector_store]
+    if request.limit:
+        pending = pending[: request.limit]
+
+    yield f"Found {len(outputs)} cases. Processing {len(pending)}..."
+
+    stats = BatchStats()
+    async for event in run_batch(
+        pending, process, concurrency=request.concurrency, name=lambda filename: filename
+    ):
+        stats.record(event)
+        yield event.message()
+
+    yield stats.summary()
+
+
+@app.post("/api/embeddings/sync")
+async def sync_embeddings(request: BatchRunRequest):
+    """Embed every stage 1 output that is not in the vector store yet."""
+    job, _ = job_manager.submit("embeddings", request.model_dump())
+    return _follow_job(job)
+
+
+@app.get("/api/distinguish/{filename}")
+async def distinguish_precedents(
+    filename: str,
+    k: int = Query(default=2, ge=1),
+    top: int = Query(default=200, ge=1, le=5000),
+):
+    """Split retrieved precedents into valid and hazardous ones (README Step 4)."""
+    target = await _target_terms(filename)
+
+    def analyze() -> list[Distinction]:
+        candidates = retrieval_index.query(target, k=k, top=top, exclude=filename)
+        return distinction_index.analyze(
+            filename, [candidate["filename"] for candidate in candidates]
+        )
+
+    distinctions = await asyncio.to_thread(analyze)
+    return {
+        "filename": filename,
+        "candidates": len(distinctions),
+        "hazardous": [
+            {"filename": d.filename, "delta": d.delta, "hazards": d.hazards}
+            for d in distinctions
+            if d.hazardous
+        ],
+        "valid": [
+            {"filename": d.filename, "delta": d.delta}
+            for d in distinctions
+            if not d.hazardous
+        ],
+    }
+
+
+class RankRequest(BaseModel):
+    w_sim: float = DEFAULT_WEIGHTS["sim"]
+    w_auth: float = DEFAULT_WEIGHTS["auth"]
+    w_align: float = DEFAULT_WEIGHTS["align"]
+    desired_outcome: Optional[Literal["affirmed", "reversed", "dismissed", "settled"]] = None
+    similarity: Literal["terms", "vector"] = "terms"
+    k: int = Field(default=2, ge=1)
+    threshold: float = 0.0
+    exclude_hazardous: bool = True
+    top: int = Field(default=20, ge=1, le=500)
+
+
+async def _candidate_set(filename: str, request: RankRequest) -> CandidateSet:
+    key = (
+        filename,
+        request.similarity,
+        request.k,
+        request.threshold,
+        request.exclude_hazardous,
+    )
+    candidates = precedent_index.cached_candidates(key)
+    if candidates is not None:
+        return candidates
+
+    if request.similarity == "vector":
+        target = await _target_vectors(filename)
+        matches = await asyncio.to_thread(
+            vector_store.search, target, top=len(vector_store.offsets), exclude=filename
+        )
+        scores = [(name, score) for name, score in matches if score >= request.threshold]
+    else:
+        terms = await _target_terms(filename)
+        results = await asyncio.to_thread(
+            retrieval_index.query,
+            terms,
+            k=request.k,
+            top=len(retrieval_index),
+            exclude=filename,
+        )
+        scores = [(result["filename"], result["jaccard"]) for result in results]
+
+    if request.exclude_hazardous and filename in retrieval_index.doc_ids:
+        distinctions = await asyncio.to_thread(
+            distinction_index.analyze, filename, [name for name, _ in scores]
+        )
+        hazardous = {d.filename for d in distinctions if d.hazardous}
+        scores = [(name, score) for name, score in scores if name not in hazardous]
+    return precedent_index.candidate_set(key, scores)
+
+
+@app.post("/api/rank/{filename}")
+async def rank_precedents(filename: str, request: RankRequest):
+    """Candidate precedents scored by S(p) = w1·Sim + w2·Auth + w3·Align (README Step 5)."""
+    # The first refresh reads every output and case file; keep it off the event loop.
+    await asyncio.to_thread(precedent_index.refresh)
+    candidates = await _candidate_set(filename, request)
+    weights = {"sim": request.w_sim, "auth": request.w_auth, "align": request.w_align}
+    results = precedent_index.rank(
+        candidates, weights, request.desired_outcome, request.top
+    )
+    return {
+        "filename": filename,
+        "candidates": len(candidates.rows),
+        "weights": weights,
+        "results": results,
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import AbstractAsyncContextManager
+from email.utils import parsedate_to_datetime
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+T = TypeVar("T")
+
+# Published limits of the default models: OpenRouter's free tier allows 20
+# requests a minute; OpenAI's tier 1 allows 500 RPM and 200k TPM for
+# gpt-4o-mini. Override per account with e.g. OPENROUTER_RPM / OPENAI_TPM;
+# 0 disables a limit.
+DEFAULT_LIMITS = {
+    "openrouter": {"rpm": 20, "tpm": 0},
+    "openai": {"rpm": 500, "tpm": 200_000},
+}
+# Completion tokens charged per request on top of the prompt estimate.
+OUTPUT_TOKEN_ESTIMATE = 1500
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def _limit(provider: str, name: str, default: int) -> int:
+    return int(os.getenv(f"{provider.upper()}_{name.upper()}", str(default)))
+
+
+class TokenBucket:
+    """Refills `per_minute` units a minute up to one minute's worth; waiters queue FIFO."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        # A request bigger than the whole bucket waits for a full one instead of forever.
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+    def drain(self) -> None:
+        """The provider says we are over its limit, whatever our own count says."""
+        self._refill()
+        self.available = 0.0
+
+
+class AdaptiveLimiter:
+    """Concurrency limit tuned by AIMD: +1 per window of successes, halved on throttling."""
+
+    def __init__(self, initial: int, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = float(min(max(1, initial), self.maximum))
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def increase(self) -> None:
+        # 1/limit per success adds one slot per full window of successful requests.
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def decrease(self, cooldown: float) -> bool:
+        # Requests already in flight when the limit was hit throttle together;
+        # count that burst as a single congestion signal.
+        now = time.monotonic()
+        if now - self._last_decrease < cooldown:
+            return False
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        return True
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), if any."""
+    response = getattr(error, "response", None)
+    if not isinstance(response, httpx.Response):
+        return None
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def status_code(error: Exception) -> int | None:
+    if isinstance(error, (httpx.HTTPStatusError, openai.APIStatusError)):
+        return error.response.status_code
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, openai.APIConnectionError)):
+        return True
+    return status_code(error) in RETRY_STATUSES
+
+
+class ProviderScheduler:
+    """Admits requests to one remote provider within its RPM, TPM and adaptive concurrency.
+
+    Throttled (429) and transient (5xx, network) failures are retried after the
+    provider's Retry-After, or a jittered exponential backoff, instead of
+    failing the case; a 429 also pauses the whole provider and halves its
+    concurrency.
+    """
+
+    def __init__(self, provider: str, rpm: int, tpm: int, max_concurrency: int):
+        self.provider = provider
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limiter = AdaptiveLimiter(min(4, max_concurrency), max_concurrency)
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.retried = 0
+
+    async def _admit(self, tokens: int) -> None:
+        while (wait := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(wait)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+        await self.limiter.acquire()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """Seconds to wait before retrying `error`, or None to give up."""
+        if attempt >= MAX_RETRIES or not is_retryable(error):
+            return None
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+        # Full jitter keeps retrying workers from stampeding back in lockstep.
+        delay = random.uniform(0, backoff)
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = server_delay + random.uniform(0, BACKOFF_BASE)
+        if status_code(error) == 429:
+            self.throttled += 1
+            self.requests.drain()
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            if self.limiter.decrease(cooldown=delay or BACKOFF_BASE):
+                logger.warning(
+                    f"{self.provider} throttled; concurrency limit now {int(self.limiter.limit)}"
+                )
+        self.retried += 1
+        logger.info(
+            f"{self.provider} request failed ({error!r}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s"
+        )
+        return delay
+
+    async def run(
+        self,
+        tokens: int,
+        call: Callable[[], Awaitable[T]],
+        on_retry: Callable[[], None] | None = None,
+    ) -> T:
+        attempt = 0
+        while True:
+            await self._admit(tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry()
+            else:
+                self.limiter.increase()
+                return result
+            finally:
+                await self.limiter.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(
+        self,
+        tokens: int,
+        open_stream: Callable[[], AbstractAsyncContextManager[AsyncIterator[T]]],
+        on_retry: Callable[[], None] | None = None,
+    ) -> AsyncGenerator[T, None]:
+        """Like `run` for a streamed response; only retried until the first item arrives."""
+        attempt = 0
+        while True:
+            await self._admit(tokens)
+            started = False
+            try:
+                async with open_stream() as items:
+                    async for item in items:
+                        started = True
+                        yield item
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if on_retry:
+                    on_retry()
+            else:
+                self.limiter.increase()
+                return
+            finally:
+                await self.limiter.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+class _Schedulers:
+    """One scheduler per provider, rebuilt if the event loop changes (see providers._Clients)."""
+
+    def __init__(self):
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.by_provider: dict[str, ProviderScheduler] = {}
+
+    def get(self, provider: str) -> ProviderScheduler:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.by_provider = {}
+        scheduler = self.by_provider.get(provider)
+        if scheduler is None:
+            defaults = DEFAULT_LIMITS.get(provider, {"rpm": 0, "tpm": 0})
+            scheduler = self.by_provider[provider] = ProviderScheduler(
+                provider,
+                rpm=_limit(provider, "rpm", defaults["rpm"]),
+                tpm=_limit(provider, "tpm", defaults["tpm"]),
+                max_concurrency=_limit(provider, "max_concurrency", 16),
+            )
+        return scheduler
+
+
+_schedulers = _Schedulers()
+
+
+def scheduler_for(provider: str) -> ProviderScheduler:
+    return _schedulers.get(provider)
@@ -0,0 +1,131 @@
+import asyncio
+import os
+from typing import AsyncGenerator
+
+from ingest import Corpus
+from loguru import logger
+from store import STAGES, OutputStore
+
+# Seconds between checks for changes made by other processes (e.g. a
+# concurrent batch_process.py run); 0 disables the watcher.
+STATUS_WATCH_INTERVAL = float(os.getenv("STATUS_WATCH_INTERVAL", "0"))
+# Idle SSE connections get a comment line this often so proxies keep them open.
+STATUS_KEEPALIVE = 15.0
+
+
+def _running_on(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class StatusTracker:
+    """In-memory manifest of which cases exist and which stages are done.
+
+    Seeded with one corpus listing and one store query at startup, then kept
+    current by output store listeners, so `snapshot` is O(1). The optional
+    watcher only rescans when the corpus or store revision token changes.
+    Outputs written from worker threads are applied on the event loop the
+    tracker was seeded on, which owns the manifest and the update events.
+    """
+
+    def __init__(self, corpus: Corpus, store: OutputStore):
+        self.corpus = corpus
+        self.store = store
+        self.cases: set[str] = set()
+        self.done: dict[int, set[str]] = {stage: set() for stage in STAGES}
+        self.version = 0
+        self._corpus_revision: object = None
+        self._store_revision: object = None
+        self._events: set[asyncio.Event] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        store.listeners.append(self.on_output)
+
+    def _scan_cases(self) -> None:
+        self._corpus_revision = self.corpus.revision()
+        self.cases = set(self.corpus.names())
+
+    def _scan_outputs(self) -> None:
+        self._store_revision = self.store.revision()
+        self.done = {stage: set(self.store.filenames(stage)) for stage in STAGES}
+
+    def seed(self) -> None:
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._scan_cases()
+        self._scan_outputs()
+        self._changed()
+
+    def on_output(self, stage: int, filename: str, exists: bool) -> None:
+        loop = self._loop
+        if loop is not None and not _running_on(loop):
+            loop.call_soon_threadsafe(self._apply_output, stage, filename, exists)
+            return
+        self._apply_output(stage, filename, exists)
+
+    def _apply_output(self, stage: int, filename: str, exists: bool) -> None:
+        done = self.done[stage]
+        if exists and filename not in done:
+            done.add(filename)
+            self._changed()
+        elif not exists and filename in done:
+            done.discard(filename)
+            self._changed()
+
+    def _changed(self) -> None:
+        self.version += 1
+        for event in self._events:
+            event.set()
+
+    def snapshot(self) -> dict:
+        total = len(self.cases)
+        stage1_processed = len(self.done[1])
+        stage2_processed = len(self.done[2])
+        return {
+            "total": total,
+            "stage1_processed": stage1_processed,
+            "stage2_processed": stage2_processed,
+            "stage1_complete": total > 0 and stage1_processed >= total,
+            "stage2_complete": total > 0 and stage2_processed >= total,
+            "version": self.version,
+        }
+
+    def check(self) -> None:
+        """Rescan whatever another process may have changed since the last check."""
+        changed = False
+        if self.corpus.revision() != self._corpus_revision:
+            self._scan_cases()
+            changed = True
+        if self.store.revision() != self._store_revision:
+            self._scan_outputs()
+            changed = True
+        if changed:
+            self._changed()
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"Batch status check failed: {e}")
+
+    async def updates(self) -> AsyncGenerator[dict | None, None]:
+        """Yield a snapshot now and after every change; None when idle for a keepalive."""
+        event = asyncio.Event()
+        event.set()
+        self._events.add(event)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(event.wait(), STATUS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                event.clear()
+                yield self.snapshot()
+        finally:
+            self._events.discard(event)
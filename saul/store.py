@@ -0,0 +1,424 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable
+
+from config import DATA_DIR
+from loguru import logger
+from model import Analysis, AtomizedCaseOutput
+from pydantic import BaseModel
+
+# Where per-case JSON outputs were written before the consolidated store.
+STAGE1_DIR = DATA_DIR / "output_stage1"
+STAGE2_DIR = DATA_DIR / "output_stage2"
+
+# "sqlite" (default) or "files" for the original one-JSON-file-per-case layout.
+OUTPUT_STORE = os.getenv("OUTPUT_STORE", "sqlite").strip().lower()
+OUTPUT_DB_PATH = Path(os.getenv("OUTPUT_DB_PATH", DATA_DIR / "outputs.sqlite"))
+
+STAGES = (1, 2)
+IMPORT_BATCH_SIZE = 500
+
+# Called with (stage, filename, exists) after every put or delete.
+OutputListener = Callable[[int, str, bool], None]
+
+
+class OutputStore(ABC):
+    """Stage 1 and stage 2 outputs keyed by case filename (the input JSON name).
+
+    Outputs are stored as validated JSON text; `versions` returns a cheap
+    filename -> update time map that in-memory indexes use to find what
+    changed without reading every output.
+    """
+
+    def __init__(self):
+        self.listeners: list[OutputListener] = []
+
+    def _notify(self, stage: int, filename: str, exists: bool) -> None:
+        for listener in self.listeners:
+            try:
+                listener(stage, filename, exists)
+            except Exception as e:
+                logger.warning(f"Output store listener failed for {filename}: {e}")
+
+    @abstractmethod
+    def put(
+        self, stage: int, filename: str, output: BaseModel, model: str | None = None
+    ) -> int:
+        """Store `output` and return its update time in nanoseconds."""
+
+    @abstractmethod
+    def get(self, stage: int, filename: str) -> str | None:
+        ...
+
+    @abstractmethod
+    def exists(self, stage: int, filename: str) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, stage: int, filename: str) -> bool:
+        ...
+
+    @abstractmethod
+    def versions(self, stage: int) -> dict[str, int]:
+        ...
+
+    @abstractmethod
+    def version(self, stage: int, filename: str) -> int | None:
+        """Update time in nanoseconds of one output, or None if it does not exist."""
+
+    @abstractmethod
+    def revision(self) -> object:
+        """A token that changes when another process writes to the store."""
+
+    @abstractmethod
+    def count(self, stage: int, case_type: str | None = None) -> int:
+        ...
+
+    @abstractmethod
+    def filenames(self, stage: int, case_type: str | None = None) -> list[str]:
+        ...
+
+    @abstractmethod
+    def set_meta(self, filename: str, key: str, value: dict) -> None:
+        """Record `value` under `key` in the case's metadata (preprocessing stats, ...)."""
+
+    @abstractmethod
+    def get_meta(self, filename: str) -> dict:
+        ...
+
+    def get_analysis(self, filename: str) -> Analysis | None:
+        data = self.get(1, filename)
+        return None if data is None else Analysis.model_validate_json(data)
+
+    def get_atomized(self, filename: str) -> dict | None:
+        data = self.get(2, filename)
+        return None if data is None else json.loads(data)
+
+
+class FileOutputStore(OutputStore):
+    """The original layout: `<filename>` in the stage 1 dir, `<stem>.atomized.json` in stage 2."""
+
+    def __init__(self, stage1_dir: Path, stage2_dir: Path):
+        super().__init__()
+        self.dirs = {1: stage1_dir, 2: stage2_dir}
+        self.suffixes = {1: ".json", 2: ".atomized.json"}
+        self.meta_dir = stage1_dir.parent / "output_meta"
+
+    def path(self, stage: int, filename: str) -> Path:
+        if stage == 1:
+            return self.dirs[1] / filename
+        return self.dirs[2] / f"{Path(filename).stem}.atomized.json"
+
+    def _filename(self, stage: int, name: str) -> str:
+        if stage == 1:
+            return name
+        return name[: -len(self.suffixes[2])] + ".json"
+
+    def put(
+        self, stage: int, filename: str, output: BaseModel, model: str | None = None
+    ) -> int:
+        path = self.path(stage, filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(output.model_dump_json(indent=2), encoding="utf-8")
+        self._notify(stage, filename, True)
+        return path.stat().st_mtime_ns
+
+    def get(self, stage: int, filename: str) -> str | None:
+        try:
+            return self.path(stage, filename).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def exists(self, stage: int, filename: str) -> bool:
+        return self.path(stage, filename).exists()
+
+    def delete(self, stage: int, filename: str) -> bool:
+        try:
+            self.path(stage, filename).unlink()
+        except FileNotFoundError:
+            return False
+        self._notify(stage, filename, False)
+        return True
+
+    def version(self, stage: int, filename: str) -> int | None:
+        try:
+            return self.path(stage, filename).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def versions(self, stage: int) -> dict[str, int]:
+        directory = self.dirs[stage]
+        if not directory.exists():
+            return {}
+        suffix = self.suffixes[stage]
+        with os.scandir(directory) as entries:
+            return {
+                self._filename(stage, entry.name): entry.stat().st_mtime_ns
+                for entry in entries
+                if entry.name.endswith(suffix)
+                and (stage == 2 or not entry.name.endswith(self.suffixes[2]))
+            }
+
+    def set_meta(self, filename: str, key: str, value: dict) -> None:
+        meta = self.get_meta(filename)
+        meta[key] = value
+        self.meta_dir.mkdir(parents=True, exist_ok=True)
+        (self.meta_dir / filename).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    def get_meta(self, filename: str) -> dict:
+        try:
+            return json.loads((self.meta_dir / filename).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def revision(self) -> object:
+        # Directory mtimes change whenever an output file is created or removed.
+        return tuple(
+            directory.stat().st_mtime_ns if directory.exists() else 0
+            for directory in self.dirs.values()
+        )
+
+    def count(self, stage: int, case_type: str | None = None) -> int:
+        return len(self.filenames(stage, case_type))
+
+    def filenames(self, stage: int, case_type: str | None = None) -> list[str]:
+        names = sorted(self.versions(stage))
+        if case_type is None:
+            return names
+        return [
+            name
+            for name in names
+            if json.loads(self.get(stage, name) or "{}").get("case_type") == case_type
+        ]
+
+
+class SqliteOutputStore(OutputStore):
+    """Both stages in one SQLite database, indexed by filename and case_type.
+
+    Writes are single transactions behind a lock, so concurrent batch workers
+    in this process never interleave; WAL mode and a busy timeout let a
+    separate batch_process.py run write to the same database.
+    """
+
+    def __init__(self, path: Path, import_dirs: tuple[Path, Path] | None = None):
+        super().__init__()
+        self.path = path
+        # Per-case output directories to bring along when the database is first created.
+        self.import_dirs = import_dirs
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                "filename TEXT NOT NULL, stage INTEGER NOT NULL, case_type TEXT, "
+                "data TEXT NOT NULL, model TEXT, "
+                "created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL, "
+                "PRIMARY KEY (stage, filename))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS outputs_case_type ON outputs(stage, case_type)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS case_meta ("
+                "filename TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            conn.commit()
+            if self.import_dirs and not conn.execute("SELECT 1 FROM outputs LIMIT 1").fetchone():
+                # First open against an existing data directory: bring the old files along.
+                self._import(conn, *self.import_dirs)
+            self._conn = conn
+        return self._conn
+
+    def put(
+        self, stage: int, filename: str, output: BaseModel, model: str | None = None
+    ) -> int:
+        now = time.time_ns()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO outputs "
+                    "(filename, stage, case_type, data, model, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(stage, filename) DO UPDATE SET "
+                    "case_type = excluded.case_type, data = excluded.data, "
+                    "model = excluded.model, updated_at = excluded.updated_at",
+                    (
+                        filename,
+                        stage,
+                        getattr(output, "case_type", None),
+                        output.model_dump_json(),
+                        model,
+                        now,
+                        now,
+                    ),
+                )
+        self._notify(stage, filename, True)
+        return now
+
+    def get(self, stage: int, filename: str) -> str | None:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM outputs WHERE stage = ? AND filename = ?",
+                (stage, filename),
+            ).fetchone()
+        return row[0] if row else None
+
+    def exists(self, stage: int, filename: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM outputs WHERE stage = ? AND filename = ?",
+                (stage, filename),
+            ).fetchone()
+        return row is not None
+
+    def delete(self, stage: int, filename: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM outputs WHERE stage = ? AND filename = ?",
+                    (stage, filename),
+                )
+        if cursor.rowcount == 0:
+            return False
+        self._notify(stage, filename, False)
+        return True
+
+    def versions(self, stage: int) -> dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT filename, updated_at FROM outputs WHERE stage = ?", (stage,)
+            ).fetchall()
+        return dict(rows)
+
+    def version(self, stage: int, filename: str) -> int | None:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT updated_at FROM outputs WHERE stage = ? AND filename = ?",
+                (stage, filename),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, filename: str, key: str, value: dict) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    "SELECT data FROM case_meta WHERE filename = ?", (filename,)
+                ).fetchone()
+                meta = json.loads(row[0]) if row else {}
+                meta[key] = value
+                conn.execute(
+                    "INSERT OR REPLACE INTO case_meta (filename, data) VALUES (?, ?)",
+                    (filename, json.dumps(meta)),
+                )
+
+    def get_meta(self, filename: str) -> dict:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data FROM case_meta WHERE filename = ?", (filename,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def revision(self) -> object:
+        # data_version only moves when a different connection commits.
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def _where(self, stage: int, case_type: str | None) -> tuple[str, tuple]:
+        if case_type is None:
+            return "stage = ?", (stage,)
+        return "stage = ? AND case_type = ?", (stage, case_type)
+
+    def count(self, stage: int, case_type: str | None = None) -> int:
+        where, params = self._where(stage, case_type)
+        with self._lock:
+            return self._connect().execute(
+                f"SELECT COUNT(*) FROM outputs WHERE {where}", params
+            ).fetchone()[0]
+
+    def filenames(self, stage: int, case_type: str | None = None) -> list[str]:
+        where, params = self._where(stage, case_type)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT filename FROM outputs WHERE {where} ORDER BY filename", params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def import_directories(self, stage1_dir: Path, stage2_dir: Path) -> int:
+        """Copy per-case JSON outputs into the database, keeping rows already present."""
+        with self._lock:
+            return self._import(self._connect(), stage1_dir, stage2_dir)
+
+    def _import(self, conn: sqlite3.Connection, stage1_dir: Path, stage2_dir: Path) -> int:
+        files = FileOutputStore(stage1_dir, stage2_dir)
+        schemas = {1: Analysis, 2: AtomizedCaseOutput}
+        imported = 0
+        for stage in STAGES:
+            existing = {
+                row[0]
+                for row in conn.execute("SELECT filename FROM outputs WHERE stage = ?", (stage,))
+            }
+            batch = []
+            for filename, mtime in sorted(files.versions(stage).items()):
+                if filename in existing:
+                    continue
+                try:
+                    output = schemas[stage].model_validate_json(files.get(stage, filename))
+                except Exception as e:
+                    logger.warning(f"Not importing unreadable stage {stage} output {filename}: {e}")
+                    continue
+                batch.append(
+                    (filename, stage, output.case_type, output.model_dump_json(), None, mtime, mtime)
+                )
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    imported += self._insert(conn, batch)
+                    batch = []
+            imported += self._insert(conn, batch)
+        if imported:
+            logger.info(f"Imported {imported} outputs from {stage1_dir.parent} into {self.path}")
+        return imported
+
+    def _insert(self, conn: sqlite3.Connection, rows: list[tuple]) -> int:
+        if not rows:
+            return 0
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO outputs "
+                "(filename, stage, case_type, data, model, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+
+def open_output_store() -> OutputStore:
+    """The configured store; nothing touches the disk until it is first used."""
+    if OUTPUT_STORE == "files":
+        return FileOutputStore(STAGE1_DIR, STAGE2_DIR)
+    if OUTPUT_STORE != "sqlite":
+        raise ValueError(f"Unknown OUTPUT_STORE: {OUTPUT_STORE}")
+    return SqliteOutputStore(OUTPUT_DB_PATH, import_dirs=(STAGE1_DIR, STAGE2_DIR))
+
+
+# Importing this module only builds the object; the database and directories
+# are created on first access, so tooling that never reads outputs leaves no trace.
+output_store = open_output_store()
+
+
+if __name__ == "__main__":
+    # Re-run the import, e.g. after copying in outputs produced elsewhere.
+    if isinstance(output_store, SqliteOutputStore):
+        output_store.import_directories(STAGE1_DIR, STAGE2_DIR)
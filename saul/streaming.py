@@ -0,0 +1,157 @@
+import html
+import json
+from dataclasses import dataclass
+
+# Section titles for the list fields of Analysis, in schema order.
+LIST_SECTIONS = {"facts": "Facts", "issues": "Legal Issues", "reasonings": "Reasonings"}
+
+CARD_OPEN = "<div class='stage1-card'>"
+CARD_CLOSE = "</div>"
+SECTION_CLOSE = "</ul></div>"
+# Precedes the validated HTML at the end of a stream; the client replaces the
+# incremental fragments with what follows it. Model text is HTML-escaped, so it
+# can never produce this comment.
+REPLACE_MARKER = "<!--stage1:final-->"
+
+
+def header_html(case_type: str) -> str:
+    return f"<div class='stage1-header'><span class='stage1-label'>Case Type</span><span class='stage1-badge'>{html.escape(case_type.upper())}</span></div>"
+
+
+def section_open_html(title: str) -> str:
+    return f"<div class='stage1-section'><div class='stage1-section-title'>{title}</div><ul class='stage1-list'>"
+
+
+def item_html(text: str) -> str:
+    return f"<li>{html.escape(text)}</li>"
+
+
+def outcome_html(outcome: str) -> str:
+    return f"<div class='stage1-section'><div class='stage1-section-title'>Outcome</div><p class='stage1-outcome'>{html.escape(outcome)}</p></div>"
+
+
+@dataclass
+class JsonEvent:
+    kind: str  # "value", "list_start", "item", "list_end" or "done"
+    key: str | None = None
+    value: str | None = None
+
+
+class IncrementalJsonParser:
+    """Character-level parser for a flat JSON object whose values are strings or string lists.
+
+    This is the shape of the structured output for Analysis. Events are
+    emitted as soon as each string is closed, well before the whole document
+    is available to `model_validate_json`.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.buffer: list[str] = []
+        self.expecting_key = False
+        self.key: str | None = None
+        self.list_key: str | None = None
+        self.scalar: list[str] = []
+        self.finished = False
+
+    def feed(self, text: str) -> list[JsonEvent]:
+        events: list[JsonEvent] = []
+        for char in text:
+            if self.finished:
+                break
+            if self.in_string:
+                self._feed_string(char, events)
+            elif char == '"':
+                self.in_string = True
+                self.buffer = []
+            elif char == "{":
+                self.depth += 1
+                if self.depth == 1:
+                    self.expecting_key = True
+            elif char == "}":
+                self._flush_scalar(events)
+                self.depth -= 1
+                if self.depth == 0:
+                    self.finished = True
+                    events.append(JsonEvent("done"))
+            elif char == "[":
+                self.depth += 1
+                if self.depth == 2:
+                    self.list_key = self.key
+                    events.append(JsonEvent("list_start", self.key))
+            elif char == "]":
+                if self.depth == 2 and self.list_key is not None:
+                    events.append(JsonEvent("list_end", self.list_key))
+                    self.list_key = None
+                self.depth -= 1
+            elif char == ":" and self.depth == 1:
+                self.expecting_key = False
+            elif char == "," and self.depth == 1:
+                self._flush_scalar(events)
+                self.expecting_key = True
+            elif self.depth == 1 and not self.expecting_key and not char.isspace():
+                # Bare scalar (number, true/false/null) for the current key.
+                self.scalar.append(char)
+        return events
+
+    def _feed_string(self, char: str, events: list[JsonEvent]) -> None:
+        if self.escaped:
+            self.buffer.append(char)
+            self.escaped = False
+            return
+        if char == "\\":
+            self.buffer.append(char)
+            self.escaped = True
+            return
+        if char != '"':
+            self.buffer.append(char)
+            return
+
+        self.in_string = False
+        # strict=False: small models often put raw newlines inside strings.
+        value = json.loads('"' + "".join(self.buffer) + '"', strict=False)
+        if self.depth == 1 and self.expecting_key:
+            self.key = value
+        elif self.depth == 1:
+            events.append(JsonEvent("value", self.key, value))
+        elif self.depth == 2 and self.list_key is not None:
+            events.append(JsonEvent("item", self.list_key, value))
+
+    def _flush_scalar(self, events: list[JsonEvent]) -> None:
+        if self.scalar and self.depth == 1:
+            events.append(JsonEvent("value", self.key, "".join(self.scalar)))
+        self.scalar = []
+
+
+class AnalysisHtmlStream:
+    """Turns streamed Analysis JSON into HTML fragments matching format_analysis_html."""
+
+    def __init__(self):
+        self.parser = IncrementalJsonParser()
+        self.opened = False
+
+    @property
+    def complete(self) -> bool:
+        return self.parser.finished
+
+    def feed(self, text: str) -> list[str]:
+        fragments = []
+        for event in self.parser.feed(text):
+            if not self.opened:
+                self.opened = True
+                fragments.append(CARD_OPEN)
+            if event.kind == "value" and event.key == "case_type":
+                fragments.append(header_html(event.value))
+            elif event.kind == "value" and event.key == "outcomes":
+                fragments.append(outcome_html(event.value))
+            elif event.kind == "list_start" and event.key in LIST_SECTIONS:
+                fragments.append(section_open_html(LIST_SECTIONS[event.key]))
+            elif event.kind == "item" and event.key in LIST_SECTIONS:
+                fragments.append(item_html(event.value))
+            elif event.kind == "list_end" and event.key in LIST_SECTIONS:
+                fragments.append(SECTION_CLOSE)
+            elif event.kind == "done":
+                fragments.append(CARD_CLOSE)
+        return fragments
@@ -0,0 +1,244 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from loguru import logger
+
+# Output schema title -> stage label on every metric and per-case summary.
+STAGE_BY_SCHEMA = {
+    "Analysis": "stage1",
+    "AtomizedCaseOutput": "stage2",
+    "FusedCaseOutput": "fused",
+}
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, math.inf)
+TPS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, math.inf)
+
+
+def stage_for(schema: dict) -> str:
+    return STAGE_BY_SCHEMA.get(schema.get("title", ""), "other")
+
+
+@dataclass
+class CallRecord:
+    """Timings and token counts of one LLM call (including its retries)."""
+
+    provider: str
+    stage: str
+    started: float = field(default_factory=time.perf_counter)
+    seconds: float = 0.0
+    ttft: float | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    # Seconds spent generating, when the provider reports it (Ollama's eval_duration).
+    eval_seconds: float | None = None
+    retries: int = 0
+    outcome: str = "ok"
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def retry(self) -> None:
+        self.retries += 1
+
+    def usage(
+        self,
+        prompt_tokens: int | None,
+        completion_tokens: int | None,
+        eval_seconds: float | None = None,
+    ) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        if eval_seconds:
+            self.eval_seconds = eval_seconds
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if not self.completion_tokens:
+            return None
+        seconds = self.eval_seconds or self.seconds - (self.ttft or 0.0)
+        return self.completion_tokens / seconds if seconds > 0 else None
+
+
+class _Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self, label_names: tuple[str, ...]) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{{{_labels(label_names, labels)}}} {value:g}")
+        return lines
+
+
+class _Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        # labels -> (per-bucket counts, sum, count)
+        self.series: dict[tuple, tuple[list[int], float, int]] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        counts, total, count = self.series.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.series[labels] = (counts, total + value, count + 1)
+
+    def render(self, label_names: tuple[str, ...]) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {bucket_count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:g}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Telemetry:
+    """Process-wide LLM call metrics, rendered in the Prometheus text format."""
+
+    LABELS = ("provider", "stage")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = _Counter("saul_llm_calls_total", "LLM calls by outcome.")
+        self.retries = _Counter("saul_llm_retries_total", "Retried LLM requests.")
+        self.prompt_tokens = _Counter("saul_llm_prompt_tokens_total", "Prompt tokens sent.")
+        self.completion_tokens = _Counter(
+            "saul_llm_completion_tokens_total", "Completion tokens received."
+        )
+        self.latency = _Histogram(
+            "saul_llm_call_seconds", "Wall time of LLM calls, retries included.", LATENCY_BUCKETS
+        )
+        self.ttft = _Histogram(
+            "saul_llm_time_to_first_token_seconds",
+            "Time to the first streamed token.",
+            LATENCY_BUCKETS,
+        )
+        self.tps = _Histogram(
+            "saul_llm_tokens_per_second", "Completion tokens generated per second.", TPS_BUCKETS
+        )
+        self.repairs = _Counter(
+            "saul_llm_repairs_total", "Invalid LLM outputs by repair method and outcome."
+        )
+
+    def observe(self, record: CallRecord) -> None:
+        labels = (record.provider, record.stage)
+        with self._lock:
+            self.calls.inc((*labels, record.outcome))
+            self.retries.inc(labels, record.retries)
+            self.latency.observe(labels, record.seconds)
+            if record.ttft is not None:
+                self.ttft.observe(labels, record.ttft)
+            if record.prompt_tokens:
+                self.prompt_tokens.inc(labels, record.prompt_tokens)
+            if record.completion_tokens:
+                self.completion_tokens.inc(labels, record.completion_tokens)
+            if (tps := record.tokens_per_second) is not None:
+                self.tps.observe(labels, tps)
+
+    def record_repair(self, stage: str, method: str, repaired: bool) -> None:
+        with self._lock:
+            self.repairs.inc((stage, method, "repaired" if repaired else "failed"))
+
+    def render(self) -> str:
+        with self._lock:
+            lines = self.calls.render((*self.LABELS, "outcome"))
+            lines += self.repairs.render(("stage", "method", "outcome"))
+            for metric in (self.retries, self.prompt_tokens, self.completion_tokens):
+                lines += metric.render(self.LABELS)
+            for histogram in (self.latency, self.ttft, self.tps):
+                lines += histogram.render(self.LABELS)
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
+
+# Calls made on behalf of the case currently being processed by this task.
+_case_calls: ContextVar[list[CallRecord] | None] = ContextVar("case_calls", default=None)
+
+
+def begin_case() -> None:
+    """Start collecting calls for a new case in the current task (and tasks it spawns)."""
+    _case_calls.set([])
+
+
+def case_summary() -> dict | None:
+    """Per-stage totals of the calls collected since `begin_case`."""
+    records = _case_calls.get()
+    if not records:
+        return None
+    summary: dict[str, dict] = {}
+    for record in records:
+        stage = summary.setdefault(
+            record.stage,
+            {
+                "provider": record.provider,
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "seconds": 0.0,
+                "ttft": None,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            },
+        )
+        stage["calls"] += 1
+        stage["errors"] += record.outcome != "ok"
+        stage["retries"] += record.retries
+        stage["seconds"] = round(stage["seconds"] + record.seconds, 3)
+        if record.ttft is not None and stage["ttft"] is None:
+            stage["ttft"] = round(record.ttft, 3)
+        stage["prompt_tokens"] += record.prompt_tokens or 0
+        stage["completion_tokens"] += record.completion_tokens or 0
+    for stage in summary.values():
+        generating = stage["seconds"] - (stage["ttft"] or 0.0)
+        stage["tokens_per_second"] = (
+            round(stage["completion_tokens"] / generating, 2)
+            if stage["completion_tokens"] and generating > 0
+            else None
+        )
+    return summary
+
+
+@contextmanager
+def track_call(provider: str, stage: str) -> Iterator[CallRecord]:
+    """Time one LLM call; the body fills in first token, usage and retries."""
+    record = CallRecord(provider, stage)
+    try:
+        yield record
+    except Exception:
+        record.outcome = "error"
+        raise
+    except BaseException:
+        record.outcome = "cancelled"
+        raise
+    finally:
+        record.seconds = time.perf_counter() - record.started
+        telemetry.observe(record)
+        records = _case_calls.get()
+        if records is not None:
+            records.append(record)
+        logger.debug(
+            f"{provider} {stage} call {record.outcome}: {record.seconds:.2f}s, "
+            f"ttft {record.ttft if record.ttft is None else round(record.ttft, 2)}s, "
+            f"tokens {record.prompt_tokens}/{record.completion_tokens}, "
+            f"retries {record.retries}"
+        )
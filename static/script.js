@@ -21,6 +21,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const limitInput = document.getElementById('limit-input');
     const batchRunBtn = document.getElementById('batch-run-btn');
     const batchRunStage2Btn = document.getElementById('batch-run-stage2-btn');
+    const batchRunPipelineBtn = document.getElementById('batch-run-pipeline-btn');
+    const batchButtons = [batchRunBtn, batchRunStage2Btn, batchRunPipelineBtn];
     const progressLog = document.getElementById('progress-log');
     const progressBarContainer = document.getElementById('progress-bar-container');
     const progressBar = document.getElementById('progress-bar');
@@ -28,8 +30,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let selectedFile = null;
     let abortController = null;
-    let batchAbortController = null;
-    let batchStage2AbortController = null;
     let statusAbortController = null;
     
     // Track stage completion for the selected file
@@ -156,7 +156,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const atlasFiltersContainer = document.getElementById('atlas-filters');
     const atlasAddFilterBtn = document.getElementById('atlas-add-filter');
     const atlasContent = document.getElementById('atlas-content');
-    let atlasCases = [];
+    let atlasHasCases = false;
     let atlasFilterCount = 0;
     
     const CRIMINAL_FIELDS = ['offense_severity', 'charges', 'weapon_type', 'victim_count', 'evidence_types', 'aggravating_factors', 'prior_record_severity'];
@@ -283,7 +283,7 @@ document.addEventListener('DOMContentLoaded', () => {
         updateFilterDropdowns();
         const filters = getActiveFilters();
         const allFiltersValid = filters.length > 0 && filters.every(f => f !== '');
-        if (atlasCases.length && allFiltersValid) {
+        if (atlasHasCases && allFiltersValid) {
             atlasContent.innerHTML = '';
             setTimeout(() => renderAtlasGrid(filters), 50);
         }
@@ -317,6 +317,7 @@ document.addEventListener('DOMContentLoaded', () => {
             // Load batch status when switching to extraction view
             if (viewId === 'case-extraction') {
                 loadBatchStatus();
+                attachActiveBatchJob();
             }
             // Load atlas when switching to atlas view
             if (viewId === 'case-atlas') {
@@ -325,30 +326,143 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    // Fetch and display file list
-    fetch('/api/files')
-        .then(response => response.json())
-        .then(files => {
-            files.forEach(file => {
-                const div = document.createElement('div');
-                div.className = 'file-item';
-                div.textContent = file;
-                div.onclick = () => selectFile(file, div);
-                fileList.appendChild(div);
-            });
-            if (files.length) {
-                const firstItem = fileList.querySelector('.file-item');
-                if (firstItem) {
-                    selectFile(files[0], firstItem);
+    // Case list: a virtualized view over the server's case index. Only the
+    // rows in view exist in the DOM, and pages are fetched as they scroll in.
+    const FILE_ROW_HEIGHT = 40;
+    const FILE_PAGE_SIZE = 200;
+    const FILE_OVERSCAN = 10;
+    const fileSearch = document.getElementById('file-search');
+    const fileListSpacer = document.createElement('div');
+    fileListSpacer.className = 'file-list-spacer';
+    fileList.appendChild(fileListSpacer);
+
+    let fileQuery = '';
+    let fileTotal = 0;
+    // Page number -> loaded items, or null while its request is in flight
+    let filePages = new Map();
+    // Bumped on every new search so late responses for an old query are dropped
+    let fileListGeneration = 0;
+    // Rows currently in the DOM, and status changes seen since pages loaded
+    const fileItems = new Map();
+    const fileStatus = new Map();
+
+    function setFileStatus(filename, stage, done) {
+        const status = fileStatus.get(filename) ?? {};
+        status[`stage${stage}`] = done;
+        fileStatus.set(filename, status);
+        const item = fileItems.get(filename);
+        if (item) {
+            item.classList.toggle(`stage${stage}-done`, done);
+        }
+    }
+
+    function loadFilePage(page) {
+        if (filePages.has(page)) return;
+        filePages.set(page, null);
+        const generation = fileListGeneration;
+        const params = new URLSearchParams({
+            status: 'true',
+            offset: page * FILE_PAGE_SIZE,
+            limit: FILE_PAGE_SIZE,
+        });
+        if (fileQuery) params.set('q', fileQuery);
+        fetch(`/api/files?${params}`)
+            .then(response => response.json())
+            .then(result => {
+                if (generation !== fileListGeneration) return;
+                result.items.forEach(file => {
+                    fileStatus.set(file.filename, { stage1: file.stage1, stage2: file.stage2 });
+                });
+                filePages.set(page, result.items);
+                if (result.total !== fileTotal) {
+                    // The corpus changed; pages already loaded may have shifted.
+                    fileTotal = result.total;
+                    filePages = new Map([[page, result.items]]);
+                }
+                renderFileRows();
+                if (!selectedFile && !fileQuery && page === 0 && result.items.length) {
+                    selectFile(result.items[0].filename);
                 }
+            })
+            .catch(err => {
+                filePages.delete(page);
+                console.error('Error fetching files:', err);
+            });
+    }
+
+    function renderFileRows() {
+        fileListSpacer.style.height = `${fileTotal * FILE_ROW_HEIGHT}px`;
+        const first = Math.max(0, Math.floor(fileList.scrollTop / FILE_ROW_HEIGHT) - FILE_OVERSCAN);
+        const last = Math.min(
+            fileTotal,
+            Math.ceil((fileList.scrollTop + fileList.clientHeight) / FILE_ROW_HEIGHT) + FILE_OVERSCAN
+        );
+
+        fileItems.clear();
+        const rows = document.createDocumentFragment();
+        for (let index = first; index < last; index++) {
+            const page = Math.floor(index / FILE_PAGE_SIZE);
+            const items = filePages.get(page);
+            const div = document.createElement('div');
+            div.className = 'file-item';
+            div.style.top = `${index * FILE_ROW_HEIGHT}px`;
+            const file = items?.[index - page * FILE_PAGE_SIZE];
+            if (!file) {
+                loadFilePage(page);
+                div.classList.add('loading');
+                div.textContent = 'Loading...';
+            } else {
+                const status = fileStatus.get(file.filename) ?? {};
+                div.textContent = file.filename;
+                div.title = file.name ? `${file.name} (${file.filename})` : file.filename;
+                div.classList.toggle('stage1-done', status.stage1 === true);
+                div.classList.toggle('stage2-done', status.stage2 === true);
+                div.classList.toggle('selected', file.filename === selectedFile);
+                div.onclick = () => selectFile(file.filename);
+                fileItems.set(file.filename, div);
             }
-        })
-        .catch(err => console.error('Error fetching files:', err));
+            rows.appendChild(div);
+        }
+        fileListSpacer.replaceChildren(rows);
+    }
+
+    function resetFileList() {
+        fileListGeneration++;
+        filePages = new Map();
+        fileTotal = 0;
+        fileList.scrollTop = 0;
+        fileListSpacer.replaceChildren();
+        loadFilePage(0);
+    }
+
+    let fileScrollFrame = null;
+    fileList.addEventListener('scroll', () => {
+        if (fileScrollFrame === null) {
+            fileScrollFrame = requestAnimationFrame(() => {
+                fileScrollFrame = null;
+                renderFileRows();
+            });
+        }
+    });
+    window.addEventListener('resize', renderFileRows);
+
+    let fileSearchTimer = null;
+    fileSearch.addEventListener('input', () => {
+        clearTimeout(fileSearchTimer);
+        fileSearchTimer = setTimeout(() => {
+            const query = fileSearch.value.trim();
+            if (query !== fileQuery) {
+                fileQuery = query;
+                resetFileList();
+            }
+        }, 250);
+    });
 
-    function selectFile(filename, element) {
+    resetFileList();
+
+    function selectFile(filename) {
         // Update UI selection
-        document.querySelectorAll('.file-item').forEach(el => el.classList.remove('selected'));
-        element.classList.add('selected');
+        fileItems.forEach((item, name) => item.classList.toggle('selected', name === filename));
         
         selectedFile = filename;
         stage1Complete = false;
@@ -361,10 +475,8 @@ document.addEventListener('DOMContentLoaded', () => {
         tabStage2.disabled = true;
         setActiveTab('stage1');
         
-        // Load HTML content
-        caseFrame.src = `/api/html/${filename}`;
-        
-        // Clear previous analysis
+        // Clear previous case and analysis
+        caseFrame.srcdoc = '';
         stage1Output.innerHTML = '';
         stage2Output.innerHTML = '';
         if (abortController) {
@@ -377,30 +489,27 @@ document.addEventListener('DOMContentLoaded', () => {
             statusAbortController = null;
         }
 
-        // Check stage 1 + stage 2 outputs before enabling run
+        // One request for the case HTML, both stage outputs and their flags;
+        // revisits are answered with 304 from the browser cache.
         const currentFile = filename;
         statusAbortController = new AbortController();
         const { signal } = statusAbortController;
-        Promise.all([
-            fetch(`/api/output/exists/${filename}`, { signal }).then(response => {
-                if (response.ok) {
-                    return response.json();
+        fetch(`/api/cases/${filename}`, { signal })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Request failed (${response.status})`);
                 }
-                return { exists: false };
-            }),
-            fetch(`/api/output_stage2/exists/${filename}`, { signal }).then(response => {
-                if (response.ok) {
-                    return response.json();
-                }
-                return { exists: false };
+                return response.json();
             })
-        ])
-            .then(([stage1Status, stage2Status]) => {
+            .then(bundle => {
                 if (signal.aborted || selectedFile !== currentFile) {
-                    return null;
+                    return;
                 }
-                stage1Complete = stage1Status.exists === true;
-                stage2Complete = stage2Status.exists === true;
+                caseFrame.srcdoc = bundle.html ?? '<p>HTML file not found</p>';
+                stage1Complete = bundle.stage1_exists === true;
+                stage2Complete = bundle.stage2_exists === true;
+                setFileStatus(filename, 1, stage1Complete);
+                setFileStatus(filename, 2, stage2Complete);
 
                 tabStage1.disabled = !stage1Complete;
                 tabStage2.disabled = !stage2Complete;
@@ -408,42 +517,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 updateRunButton();
                 updateRepeatButtonVisibility();
 
-                const stage1Fetch = stage1Complete
-                    ? fetch(`/api/output/${filename}`, { signal }).then(response => {
-                          if (response.ok) {
-                              return response.text();
-                          }
-                          return null;
-                      })
-                    : Promise.resolve(null);
-
-                const stage2Fetch = stage2Complete
-                    ? fetch(`/api/output_stage2/${filename}`, { signal }).then(response => {
-                          if (response.ok) {
-                              return response.json();
-                          }
-                          return null;
-                      })
-                    : Promise.resolve(null);
-
-                return Promise.all([stage1Fetch, stage2Fetch]).then(([html, stage2]) => {
-                    if (signal.aborted || selectedFile !== currentFile) {
-                        return null;
-                    }
-                    return { html, stage2 };
-                });
-            })
-            .then(result => {
-                if (!result) {
-                    return;
+                if (bundle.stage1_html) {
+                    stage1Output.innerHTML = bundle.stage1_html;
                 }
-
-                const { html, stage2 } = result;
-                if (html) {
-                    stage1Output.innerHTML = html;
-                }
-                if (stage2) {
-                    stage2Output.innerHTML = formatStage2Output(stage2);
+                if (bundle.stage2) {
+                    stage2Output.innerHTML = formatStage2Output(bundle.stage2);
                 }
 
                 if (stage2Complete) {
@@ -484,6 +562,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // The server ends a streamed analysis with this marker and the validated
+    // HTML, which replaces the fragments shown while it was generated.
+    const STAGE1_REPLACE_MARKER = '<!--stage1:final-->';
+
+    function stage1Display(html) {
+        const marker = html.lastIndexOf(STAGE1_REPLACE_MARKER);
+        return marker >= 0 ? html.slice(marker + STAGE1_REPLACE_MARKER.length) : html;
+    }
+
     async function runStage1() {
         stage1Output.innerHTML = '<p>Thinking...</p>';
         runBtn.textContent = 'Stop';
@@ -509,11 +596,14 @@ document.addEventListener('DOMContentLoaded', () => {
                 const { done, value } = await reader.read();
                 if (done) break;
                 
+                // Fragments arrive as each fact, issue and reasoning is generated;
+                // the browser closes any still-open tags while rendering.
                 const chunk = decoder.decode(value, { stream: true });
                 html += chunk;
+                stage1Output.innerHTML = stage1Display(html);
             }
             
-            stage1Output.innerHTML = html;
+            stage1Output.innerHTML = stage1Display(html);
             const outputContainer = document.getElementById('analysis-output');
             outputContainer.scrollTop = outputContainer.scrollHeight;
             analysisSucceeded = true;
@@ -526,6 +616,7 @@ document.addEventListener('DOMContentLoaded', () => {
         } finally {
             if (analysisSucceeded) {
                 stage1Complete = true;
+                setFileStatus(selectedFile, 1, true);
                 tabStage1.disabled = false;
                 setActiveTab('stage1');
             }
@@ -557,6 +648,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const outputContainer = document.getElementById('analysis-output');
             outputContainer.scrollTop = outputContainer.scrollHeight;
             stage2Complete = true;
+            setFileStatus(selectedFile, 2, true);
             tabStage2.disabled = false;
             setActiveTab('stage2');
         } catch (err) {
@@ -587,6 +679,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             }
             stage2Complete = false;
+            setFileStatus(selectedFile, 2, false);
             stage2Output.innerHTML = '';
             updateRunButton();
             updateRepeatButtonVisibility();
@@ -607,10 +700,12 @@ document.addEventListener('DOMContentLoaded', () => {
                     console.error('Failed to delete stage 2 output:', err);
                 }
                 stage2Complete = false;
+                setFileStatus(selectedFile, 2, false);
                 stage2Output.innerHTML = '';
                 tabStage2.disabled = true;
             }
             stage1Complete = false;
+            setFileStatus(selectedFile, 1, false);
             stage1Output.innerHTML = '';
             updateRunButton();
             updateRepeatButtonVisibility();
@@ -619,51 +714,113 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     // Batch processing functions
-    async function loadBatchStatus() {
-        try {
-            const response = await fetch('/api/batch/status');
-            const data = await response.json();
-            totalCasesEl.textContent = data.total;
-            processedCasesEl.textContent = data.stage1_processed;
-            const stage1Complete = data.stage1_complete === true;
-            const stage2Complete = data.stage2_complete === true;
-            batchRunBtn.disabled = stage1Complete;
-            batchRunStage2Btn.disabled = !stage1Complete || stage2Complete;
-        } catch (err) {
-            console.error('Error loading batch status:', err);
+    // The server pushes the batch status whenever an output is written or
+    // deleted, so one EventSource replaces polling /api/batch/status.
+    let batchStatus = null;
+    let batchStatusSource = null;
+
+    function renderBatchStatus() {
+        if (!batchStatus) {
+            return;
+        }
+        totalCasesEl.textContent = batchStatus.total;
+        processedCasesEl.textContent = batchStatus.stage1_processed;
+        const stage1Complete = batchStatus.stage1_complete === true;
+        const stage2Complete = batchStatus.stage2_complete === true;
+        if (batchRuns.size) {
+            return;
+        }
+        batchRunBtn.disabled = stage1Complete;
+        batchRunStage2Btn.disabled = !stage1Complete || stage2Complete;
+        batchRunPipelineBtn.disabled = stage1Complete && stage2Complete;
+    }
+
+    function loadBatchStatus() {
+        if (batchStatusSource) {
+            renderBatchStatus();
+            return;
+        }
+        batchStatusSource = new EventSource('/api/batch/status/stream');
+        batchStatusSource.onmessage = event => {
+            batchStatus = JSON.parse(event.data);
+            renderBatchStatus();
+        };
+        batchStatusSource.onerror = () => {
+            // EventSource reconnects on its own; show the status as unknown meanwhile.
+            console.error('Batch status stream interrupted');
             totalCasesEl.textContent = '--';
             processedCasesEl.textContent = '--';
-        }
+        };
+    }
+
+    function appendLogEntry(message, className) {
+        const p = document.createElement('p');
+        p.className = `log-entry ${className}`;
+        p.textContent = message;
+        progressLog.appendChild(p);
+        progressLog.scrollTop = progressLog.scrollHeight;
+    }
+
+    // Batch runs are server-side jobs: a button queues one (or gets the run
+    // already active for it) and follows its progress log. Closing the tab
+    // leaves the job running; reopening the view reattaches to it.
+    const batchJobKinds = new Map([
+        [batchRunBtn, 'stage1'],
+        [batchRunStage2Btn, 'stage2'],
+        [batchRunPipelineBtn, 'pipeline'],
+    ]);
+    const batchRuns = new Map();
+
+    function buttonForJob(job) {
+        return batchButtons.find(button => batchJobKinds.get(button) === job.kind);
     }
 
-    batchRunBtn.onclick = async () => {
-        if (batchAbortController) {
-            batchAbortController.abort();
-            batchAbortController = null;
-            batchRunBtn.textContent = 'Run stage 1 batch extraction';
+    async function runBatchJob(button) {
+        if (batchRuns.has(button)) {
+            const { job } = batchRuns.get(button);
+            button.disabled = true;
+            await fetch(`/api/jobs/${job.id}/cancel`, { method: 'POST' });
             return;
         }
 
+        const limit = limitInput.value ? parseInt(limitInput.value) : null;
+        try {
+            const response = await fetch('/api/jobs', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ kind: batchJobKinds.get(button), limit })
+            });
+            if (!response.ok) {
+                throw new Error(`Could not start the batch run (${response.status})`);
+            }
+            followBatchJob(button, await response.json());
+        } catch (err) {
+            appendLogEntry(`Error: ${err.message}`, 'error');
+        }
+    }
+
+    async function followBatchJob(button, job) {
+        const idleLabel = button.dataset.label;
         progressLog.innerHTML = '';
         progressBar.style.width = '0%';
-        progressStats.textContent = 'Starting...';
-        batchRunBtn.textContent = 'Stop';
-        batchRunStage2Btn.disabled = true;
-        batchAbortController = new AbortController();
+        progressStats.textContent = job.state === 'queued' ? 'Queued...' : 'Starting...';
+        button.textContent = 'Stop';
+        button.disabled = false;
+        batchButtons.filter(other => other !== button).forEach(other => {
+            other.disabled = true;
+        });
+        const controller = new AbortController();
+        batchRuns.set(button, { job, controller });
 
-        const limit = limitInput.value ? parseInt(limitInput.value) : null;
-        
         let totalToProcess = 0;
         let currentProgress = 0;
 
         try {
-            const response = await fetch('/api/batch/run', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ limit }),
-                signal: batchAbortController.signal
+            // Replays the whole log first, so a late subscriber sees the same progress.
+            const response = await fetch(`/api/jobs/${job.id}/events`, {
+                signal: controller.signal
             });
 
             const reader = response.body.getReader();
@@ -680,8 +837,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     if (line.startsWith('data: ')) {
                         const message = line.substring(6);
                         if (message) {
-                            const p = document.createElement('p');
-                            p.className = 'log-entry';
+                            let className = '';
                             
                             // Parse total from "Found X cases. Processing Y..." message
                             const foundMatch = message.match(/Processing (\d+)\.\.\./);
@@ -689,8 +845,12 @@ document.addEventListener('DOMContentLoaded', () => {
                                 totalToProcess = parseInt(foundMatch[1]);
                             }
                             
-                            // Update progress on Completed or Skipped
-                            if (message.includes('Completed') || message.includes('Skipped')) {
+                            // Update progress on Completed, Skipped or Error
+                            if (
+                                message.includes('Completed') ||
+                                message.includes('Skipped') ||
+                                message.includes('Error processing')
+                            ) {
                                 currentProgress++;
                                 if (totalToProcess > 0) {
                                     const percent = Math.round((currentProgress / totalToProcess) * 100);
@@ -700,168 +860,78 @@ document.addEventListener('DOMContentLoaded', () => {
                             }
                             
                             if (message.includes('Completed') || message.includes('Done.')) {
-                                p.classList.add('success');
-                            } else if (message.includes('Error')) {
-                                p.classList.add('error');
+                                className = 'success';
+                            } else if (
+                                message.includes('Error') ||
+                                message.startsWith('Cancelled') ||
+                                message.startsWith('Job failed')
+                            ) {
+                                className = 'error';
                             } else if (message.includes('Skipped')) {
-                                p.classList.add('skip');
+                                className = 'skip';
                             } else if (message.includes('Found') || message.includes('Processing')) {
-                                p.classList.add('info');
+                                className = 'info';
                             }
                             
                             // Mark completion
                             if (message.includes('Done.')) {
                                 progressBar.style.width = '100%';
                                 progressStats.textContent = 'Complete!';
+                            } else if (message.startsWith('Cancelled')) {
+                                progressStats.textContent = 'Stopped';
                             }
                             
-                            p.textContent = message;
-                            progressLog.appendChild(p);
-                            progressLog.scrollTop = progressLog.scrollHeight;
+                            appendLogEntry(message, className);
                         }
                     }
                 });
             }
-            
-            // Refresh stats after completion
-            loadBatchStatus();
         } catch (err) {
-            if (err.name === 'AbortError') {
-                const p = document.createElement('p');
-                p.className = 'log-entry error';
-                p.textContent = '[Batch processing stopped]';
-                progressLog.appendChild(p);
-                progressStats.textContent = 'Stopped';
-            } else {
-                const p = document.createElement('p');
-                p.className = 'log-entry error';
-                p.textContent = `Error: ${err.message}`;
-                progressLog.appendChild(p);
+            if (err.name !== 'AbortError') {
+                appendLogEntry(`Error: ${err.message}`, 'error');
                 progressStats.textContent = 'Error';
             }
         } finally {
-            batchRunBtn.textContent = 'Run stage 1 batch extraction';
-            batchAbortController = null;
+            button.textContent = idleLabel;
+            batchRuns.delete(button);
             loadBatchStatus();
         }
-    };
+    }
 
-    batchRunStage2Btn.onclick = async () => {
-        if (batchStage2AbortController) {
-            batchStage2AbortController.abort();
-            batchStage2AbortController = null;
-            batchRunStage2Btn.textContent = 'Run stage 2 batch extraction';
+    // Reattach to a batch job started earlier, e.g. in a tab that has since closed.
+    async function attachActiveBatchJob() {
+        if (batchRuns.size) {
             return;
         }
-
-        progressLog.innerHTML = '';
-        progressBar.style.width = '0%';
-        progressStats.textContent = 'Starting...';
-        batchRunStage2Btn.textContent = 'Stop';
-        batchRunBtn.disabled = true;
-        batchStage2AbortController = new AbortController();
-
-        const limit = limitInput.value ? parseInt(limitInput.value) : null;
-
-        let totalToProcess = 0;
-        let currentProgress = 0;
-
         try {
-            const response = await fetch('/api/batch/run-stage2', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ limit }),
-                signal: batchStage2AbortController.signal
-            });
-
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-
-            while (true) {
-                const { done, value } = await reader.read();
-                if (done) break;
-
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n');
-
-                lines.forEach(line => {
-                    if (line.startsWith('data: ')) {
-                        const message = line.substring(6);
-                        if (message) {
-                            const p = document.createElement('p');
-                            p.className = 'log-entry';
-
-                            const foundMatch = message.match(/Processing (\d+)\.\.\./);
-                            if (foundMatch) {
-                                totalToProcess = parseInt(foundMatch[1]);
-                            }
-
-                            if (message.includes('Completed') || message.includes('Skipped')) {
-                                currentProgress++;
-                                if (totalToProcess > 0) {
-                                    const percent = Math.round((currentProgress / totalToProcess) * 100);
-                                    progressBar.style.width = `${percent}%`;
-                                    progressStats.textContent = `${currentProgress} of ${totalToProcess} (${percent}%)`;
-                                }
-                            }
-
-                            if (message.includes('Completed') || message.includes('Done.')) {
-                                p.classList.add('success');
-                            } else if (message.includes('Error')) {
-                                p.classList.add('error');
-                            } else if (message.includes('Skipped')) {
-                                p.classList.add('skip');
-                            } else if (message.includes('Found') || message.includes('Processing')) {
-                                p.classList.add('info');
-                            }
-
-                            if (message.includes('Done.')) {
-                                progressBar.style.width = '100%';
-                                progressStats.textContent = 'Complete!';
-                            }
-
-                            p.textContent = message;
-                            progressLog.appendChild(p);
-                            progressLog.scrollTop = progressLog.scrollHeight;
-                        }
-                    }
-                });
+            const response = await fetch('/api/jobs?active=true');
+            const jobs = await response.json();
+            const job = jobs.find(job => buttonForJob(job));
+            if (job) {
+                followBatchJob(buttonForJob(job), job);
             }
-
-            loadBatchStatus();
         } catch (err) {
-            if (err.name === 'AbortError') {
-                const p = document.createElement('p');
-                p.className = 'log-entry error';
-                p.textContent = '[Batch processing stopped]';
-                progressLog.appendChild(p);
-                progressStats.textContent = 'Stopped';
-            } else {
-                const p = document.createElement('p');
-                p.className = 'log-entry error';
-                p.textContent = `Error: ${err.message}`;
-                progressLog.appendChild(p);
-                progressStats.textContent = 'Error';
-            }
-        } finally {
-            batchRunStage2Btn.textContent = 'Run stage 2 batch extraction';
-            batchStage2AbortController = null;
-            loadBatchStatus();
+            console.error('Error loading batch jobs:', err);
         }
-    };
+    }
+
+    batchButtons.forEach(button => {
+        button.onclick = () => runBatchJob(button);
+    });
 
     // Case Atlas functions
+    const ATLAS_PAGE_SIZE = 24;
+
     async function loadAtlasCases() {
         atlasContent.innerHTML = '<p class="atlas-placeholder">Loading cases...</p>';
         try {
-            const response = await fetch('/api/atlas/cases');
+            const response = await fetch('/api/atlas/cases?limit=1');
             if (!response.ok) {
                 throw new Error('Failed to load cases');
             }
-            atlasCases = await response.json();
-            if (atlasCases.length === 0) {
+            const page = await response.json();
+            atlasHasCases = page.total > 0;
+            if (!atlasHasCases) {
                 atlasContent.innerHTML = '<p class="atlas-placeholder">No stage 2 outputs found. Run stage 2 extraction first.</p>';
                 return;
             }
@@ -871,159 +941,61 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function getFieldValue(caseData, field) {
-        if (field === 'case_type') {
-            return caseData.case_type || 'Unknown';
-        }
-        if (caseData.criminal && field in caseData.criminal) {
-            return caseData.criminal[field];
-        }
-        if (caseData.civil && field in caseData.civil) {
-            return caseData.civil[field];
-        }
-        return null;
-    }
-
-    function formatFieldValue(value, field) {
-        if (value === null || value === undefined) {
-            return 'N/A';
-        }
-        if (typeof value === 'boolean') {
-            return value ? 'Yes' : 'No';
-        }
-        if (Array.isArray(value)) {
-            return value.length ? value.join(', ') : 'None';
-        }
-        // Bucket numeric fields
-        if (field === 'victim_count') {
-            const n = Number(value);
-            if (n === 0) return '0 victims';
-            if (n === 1) return '1 victim';
-            if (n <= 5) return '2-5 victims';
-            return '6+ victims';
-        }
-        if (field === 'proximate_causation_score') {
-            const n = Number(value);
-            if (n <= 0.25) return 'Low (0-25%)';
-            if (n <= 0.5) return 'Medium (26-50%)';
-            if (n <= 0.75) return 'High (51-75%)';
-            return 'Very High (76-100%)';
-        }
-        if (field === 'damages_claimed') {
-            const n = Number(value);
-            if (n < 10000) return 'Under $10K';
-            if (n < 100000) return '$10K - $100K';
-            if (n < 1000000) return '$100K - $1M';
-            return 'Over $1M';
-        }
-        return String(value);
-    }
+    // Leaf groups fetch their cards page by page once they scroll into view.
+    const atlasGridObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                atlasGridObserver.unobserve(entry.target);
+                loadAtlasPage(entry.target);
+            }
+        });
+    }, { rootMargin: '200px' });
 
-    function hasValidValue(value) {
-        if (value === null || value === undefined) return false;
-        if (Array.isArray(value)) return value.length > 0;
-        if (typeof value === 'string') return value.trim() !== '';
-        return true;
-    }
+    async function renderAtlasGrid(filters) {
+        // Grouping and counting happen server-side; cases lacking a value
+        // for any of the grouping fields are left out.
+        const params = new URLSearchParams();
+        filters.forEach(field => params.append('group_by', field));
 
-    function renderAtlasGrid(filters) {
-        // Filter cases based on case type
-        let filteredCases = atlasCases;
-        
-        const hasCriminalFilter = filters.some(f => CRIMINAL_FIELDS.includes(f));
-        const hasCivilFilter = filters.some(f => CIVIL_FIELDS.includes(f));
-        
-        if (hasCriminalFilter && !hasCivilFilter) {
-            filteredCases = filteredCases.filter(c => c.case_type === 'criminal');
-        } else if (hasCivilFilter && !hasCriminalFilter) {
-            filteredCases = filteredCases.filter(c => c.case_type === 'civil');
-        } else if (hasCriminalFilter && hasCivilFilter) {
-            filteredCases = [];
+        let groups;
+        try {
+            const response = await fetch(`/api/atlas/groups?${params}`);
+            if (!response.ok) {
+                throw new Error('Failed to load groups');
+            }
+            groups = await response.json();
+        } catch (err) {
+            atlasContent.innerHTML = `<p class="atlas-placeholder">Error loading cases: ${escapeHtml(err.message)}</p>`;
+            return;
         }
-        
-        // Filter out cases that don't have valid values for ALL filter fields
-        filteredCases = filteredCases.filter(caseData => {
-            return filters.every(field => hasValidValue(getFieldValue(caseData, field)));
-        });
-        
-        if (filteredCases.length === 0) {
+
+        if (groups.length === 0) {
             atlasContent.innerHTML = '<p class="atlas-placeholder">No cases match the selected grouping criteria.</p>';
             return;
         }
 
-        // Build nested group structure
-        function buildGroups(cases, filterIndex) {
-            if (filterIndex >= filters.length) {
-                return cases;
-            }
-            
-            const field = filters[filterIndex];
-            const groups = {};
-            
-            cases.forEach(caseData => {
-                let value = getFieldValue(caseData, field);
-                
-                if (Array.isArray(value) && value.length > 0) {
-                    value.forEach(v => {
-                        const groupKey = formatFieldValue(v, field);
-                        if (!groups[groupKey]) groups[groupKey] = [];
-                        if (!groups[groupKey].includes(caseData)) {
-                            groups[groupKey].push(caseData);
-                        }
-                    });
-                } else {
-                    const groupKey = formatFieldValue(value, field);
-                    if (!groups[groupKey]) groups[groupKey] = [];
-                    groups[groupKey].push(caseData);
-                }
-            });
-            
-            // Recursively build subgroups
-            const result = {};
-            Object.keys(groups).forEach(key => {
-                result[key] = buildGroups(groups[key], filterIndex + 1);
-            });
-            return result;
-        }
-        
-        const nestedGroups = buildGroups(filteredCases, 0);
-        
-        function sortKeys(keys) {
-            return keys.sort((a, b) => {
-                if (a === 'N/A') return 1;
-                if (b === 'N/A') return -1;
-                return a.localeCompare(b);
-            });
-        }
-        
-        function countCases(group) {
-            if (Array.isArray(group)) return group.length;
-            return Object.values(group).reduce((sum, sub) => sum + countCases(sub), 0);
-        }
-        
-        function renderGroup(group, level, parentIdx) {
-            if (Array.isArray(group)) {
-                return `<div class="atlas-grid">${group.map(c => renderAtlasCard(c)).join('')}</div>`;
-            }
-            
-            const sortedKeys = sortKeys(Object.keys(group));
+        function renderGroup(groups, level, parentIdx, path) {
             let html = '';
             
-            sortedKeys.forEach((key, idx) => {
-                const subgroup = group[key];
-                const caseCount = countCases(subgroup);
+            groups.forEach((group, idx) => {
+                const groupPath = [...path, `${group.field}:${group.label}`];
+                const caseCount = group.count;
                 const animDelay = (parentIdx * 0.02) + (idx * 0.03);
                 const levelClass = level === 0 ? 'atlas-group' : 'atlas-subgroup';
                 const titleTag = level === 0 ? 'h3' : 'h4';
+                const content = group.groups.length
+                    ? renderGroup(group.groups, level + 1, idx, groupPath)
+                    : `<div class="atlas-grid" data-filters="${escapeHtml(JSON.stringify(groupPath))}" data-total="${caseCount}"></div>
+                       <button class="atlas-load-more" hidden>Show more</button>`;
                 
                 html += `
                     <div class="${levelClass}" style="animation-delay: ${animDelay}s" data-level="${level}">
                         <div class="atlas-group-header">
-                            <${titleTag} class="atlas-group-title">${escapeHtml(key)}</${titleTag}>
+                            <${titleTag} class="atlas-group-title">${escapeHtml(group.label)}</${titleTag}>
                             <span class="atlas-group-count">${caseCount} case${caseCount !== 1 ? 's' : ''}</span>
                         </div>
                         <div class="atlas-group-content">
-                            ${renderGroup(subgroup, level + 1, idx)}
+                            ${content}
                         </div>
                     </div>
                 `;
@@ -1032,23 +1004,58 @@ document.addEventListener('DOMContentLoaded', () => {
             return html;
         }
         
-        atlasContent.innerHTML = renderGroup(nestedGroups, 0, 0);
+        atlasContent.innerHTML = renderGroup(groups, 0, 0, []);
+        atlasContent.querySelectorAll('.atlas-grid').forEach(grid => atlasGridObserver.observe(grid));
+    }
 
-        // Add click handlers to cards
-        atlasContent.querySelectorAll('.atlas-card').forEach(card => {
-            card.addEventListener('click', (e) => {
-                if (e.target.closest('.atlas-card-close')) {
-                    card.classList.remove('expanded');
-                    return;
-                }
-                if (!card.classList.contains('expanded')) {
-                    atlasContent.querySelectorAll('.atlas-card.expanded').forEach(c => c.classList.remove('expanded'));
-                    card.classList.add('expanded');
-                }
-            });
-        });
+    async function loadAtlasPage(grid) {
+        if (grid.dataset.loading) {
+            return;
+        }
+        grid.dataset.loading = 'true';
+        const params = new URLSearchParams();
+        JSON.parse(grid.dataset.filters).forEach(filter => params.append('filter', filter));
+        params.set('offset', grid.children.length);
+        params.set('limit', ATLAS_PAGE_SIZE);
+
+        try {
+            const response = await fetch(`/api/atlas/cases?${params}`);
+            if (!response.ok) {
+                throw new Error('Failed to load cases');
+            }
+            const page = await response.json();
+            grid.insertAdjacentHTML('beforeend', page.cases.map(c => renderAtlasCard(c)).join(''));
+            const moreBtn = grid.nextElementSibling;
+            if (moreBtn) {
+                moreBtn.hidden = grid.children.length >= page.total;
+            }
+        } catch (err) {
+            console.error('Error loading atlas cases:', err);
+        } finally {
+            delete grid.dataset.loading;
+        }
     }
 
+    atlasContent.addEventListener('click', (e) => {
+        const moreBtn = e.target.closest('.atlas-load-more');
+        if (moreBtn) {
+            loadAtlasPage(moreBtn.previousElementSibling);
+            return;
+        }
+        const card = e.target.closest('.atlas-card');
+        if (!card) {
+            return;
+        }
+        if (e.target.closest('.atlas-card-close')) {
+            card.classList.remove('expanded');
+            return;
+        }
+        if (!card.classList.contains('expanded')) {
+            atlasContent.querySelectorAll('.atlas-card.expanded').forEach(c => c.classList.remove('expanded'));
+            card.classList.add('expanded');
+        }
+    });
+
     function renderAtlasCard(caseData) {
         const caseType = caseData.case_type ? caseData.case_type.toUpperCase() : 'UNKNOWN';
         const filename = caseData.filename || 'Unknown';